@@ -0,0 +1,62 @@
+# benchmarks/excel_write.py
+"""Benchmark de serialización del roster a xlsx por modo de escritura.
+
+Cada modo corre en un subproceso propio para medir su RSS máximo.
+Uso (desde backend/):  python -m benchmarks.excel_write [filas]
+"""
+import io
+import sys
+import json
+import time
+import resource
+import subprocess
+import pandas as pd
+
+from benchmarks.roster_load import generar_roster
+from services.excel_writer import WRITER_MODES, to_xlsx_bytes
+from services.roster_schema import REQUIRED_COLUMNS, normalizar_roster
+
+
+def _rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa KiB, macOS bytes
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def medir_modo(mode: str, filas: int) -> dict:
+    df = normalizar_roster(generar_roster(filas))
+    df = df[REQUIRED_COLUMNS]
+    rss_base = _rss_mb()
+    t0 = time.perf_counter()
+    data = to_xlsx_bytes(df, mode=mode)
+    segundos = time.perf_counter() - t0
+    # El orden de columnas de REQUIRED_COLUMNS debe sobrevivir
+    assert list(pd.read_excel(io.BytesIO(data), nrows=0).columns) == REQUIRED_COLUMNS
+    return {
+        "mode": mode,
+        "seconds": round(segundos, 2),
+        "bytes": len(data),
+        "mb_per_s": round(len(data) / segundos / 1e6, 2),
+        "peak_rss_mb": round(_rss_mb(), 1),
+        "rss_delta_mb": round(_rss_mb() - rss_base, 1),
+    }
+
+
+def main(filas: int = 50_000):
+    print(f"Serializando {filas} filas por modo...")
+    print(f"  {'modo':<11} {'segundos':>9} {'MB/s':>7} {'RSS máx':>9} {'Δ RSS':>8}")
+    for mode in WRITER_MODES:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.excel_write", "--modo", mode, str(filas)],
+            capture_output=True, text=True, check=True,
+        )
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"  {r['mode']:<11} {r['seconds']:>9.2f} {r['mb_per_s']:>7.2f} {r['peak_rss_mb']:>7.1f}MB {r['rss_delta_mb']:>6.1f}MB")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args[:1] == ["--modo"]:
+        print(json.dumps(medir_modo(args[1], int(args[2]))))
+    else:
+        main(int(args[0]) if args else 50_000)
@@ -0,0 +1,103 @@
+# benchmarks/fake_blob.py
+"""Sustituto en memoria de BlobServiceClient/ContainerClient/BlobClient (sync).
+
+Implementa solo lo que usa el backend: propiedades con ETag y metadatos,
+descarga completa o por rango (readall/chunks), subida con If-Match (412
+como ResourceModifiedError) y latencia de red simulada opcional.
+"""
+import itertools
+import threading
+import time
+from types import SimpleNamespace
+
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceModifiedError, ResourceNotFoundError
+
+_etags = itertools.count(1)
+# Subidas atómicas respecto de la comparación de ETag, como en Azure
+_upload_lock = threading.Lock()
+
+
+class _Downloader:
+    def __init__(self, data: bytes, properties, chunk_size: int):
+        self._data = data
+        self.properties = properties
+        self.size = len(data)
+        self._chunk_size = chunk_size
+
+    def readall(self) -> bytes:
+        return self._data
+
+    def chunks(self):
+        for i in range(0, len(self._data), self._chunk_size):
+            yield self._data[i:i + self._chunk_size]
+
+
+class FakeBlobClient:
+    def __init__(self, store: dict, container: str, blob_name: str, latency: float = 0.0):
+        self._store = store
+        self.container_name = container
+        self.blob_name = blob_name
+        self.latency = latency
+
+    def _get(self):
+        if self.latency:
+            time.sleep(self.latency)
+        blob = self._store.get((self.container_name, self.blob_name))
+        if blob is None:
+            raise ResourceNotFoundError(f"{self.blob_name} no existe")
+        return blob
+
+    def get_blob_properties(self):
+        blob = self._get()
+        return SimpleNamespace(etag=blob["etag"], size=len(blob["data"]), metadata=dict(blob["metadata"]))
+
+    def download_blob(self, offset=None, length=None, etag=None, match_condition=None, max_concurrency=1):
+        blob = self._get()
+        if etag and match_condition == MatchConditions.IfNotModified and etag != blob["etag"]:
+            raise ResourceModifiedError("El blob cambió (412)")
+        data = blob["data"]
+        if offset is not None:
+            data = data[offset: offset + length if length is not None else None]
+        props = SimpleNamespace(etag=blob["etag"], size=len(blob["data"]), metadata=dict(blob["metadata"]))
+        return _Downloader(data, props, chunk_size=4 * 1024 * 1024)
+
+    def upload_blob(self, data, overwrite=False, etag=None, match_condition=None, metadata=None):
+        if self.latency:
+            time.sleep(self.latency)
+        key = (self.container_name, self.blob_name)
+        with _upload_lock:
+            current = self._store.get(key)
+            if current is not None and not overwrite:
+                raise ResourceModifiedError("El blob ya existe")
+            if etag and match_condition == MatchConditions.IfNotModified and (current is None or current["etag"] != etag):
+                raise ResourceModifiedError("El blob cambió (412)")
+            return {"etag": put_blob(self._store, self.container_name, self.blob_name, bytes(data), metadata)}
+
+
+class FakeContainerClient:
+    def __init__(self, store: dict, container: str, latency: float = 0.0):
+        self._store = store
+        self.container_name = container
+        self.latency = latency
+
+    def get_blob_client(self, blob: str) -> FakeBlobClient:
+        return FakeBlobClient(self._store, self.container_name, blob, latency=self.latency)
+
+
+class FakeBlobServiceClient:
+    # Compartido entre instancias: el backend crea su propio cliente al importarse
+    store = {}
+    latency = 0.0
+
+    def __init__(self, account_url=None, credential=None, **kwargs):
+        self.account_url = account_url
+
+    def get_container_client(self, container: str) -> FakeContainerClient:
+        return FakeContainerClient(self.store, container, latency=self.latency)
+
+
+def put_blob(store: dict, container: str, blob: str, data: bytes, metadata=None) -> str:
+    etag = f'"0x{next(_etags):016X}"'
+    store[(container, blob)] = {"data": data, "etag": etag, "metadata": dict(metadata or {})}
+    return etag
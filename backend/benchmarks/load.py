@@ -0,0 +1,232 @@
+# benchmarks/load.py
+"""Prueba de carga del backend contra un Azure Blob en memoria.
+
+Levanta `main.app` con uvicorn sobre FakeBlobServiceClient, con data.xlsx y
+usuarios.xlsx sintéticos, y golpea /login, /alumnos, /entregar y
+/dashboard/stats en paralelo. Informa p50/p95/p99 y throughput por endpoint.
+Cada tamaño de roster corre en un subproceso propio (estado limpio).
+
+Uso (desde backend/):
+    python -m benchmarks.load                       # 1k, 10k y 100k filas
+    python -m benchmarks.load --filas 1000 10000 --concurrencia 32 --segundos 20
+    python -m benchmarks.load --latencia 0.03       # simula RTT a Azure
+    python -m benchmarks.load --storage local       # STORAGE_BACKEND=local
+    python -m benchmarks.load --roster sqlite       # ROSTER_STORE=sqlite
+    ENTREGAS_WRITE_BEHIND=1 python -m benchmarks.load   # entregas por journal
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+from benchmarks.fake_blob import FakeBlobServiceClient
+from benchmarks.roster_load import generar_roster
+
+CONTAINER = "bench"
+ADMINS = [f"admin{i}@tne.cl" for i in range(5)]
+TUTORES = [f"tutor{i}@tne.cl" for i in range(200)]
+
+# (nombre, peso, método, ruta)
+MEZCLA = [
+    ("login", 10, "POST", "/login"),
+    ("alumnos_pagina", 25, "GET", "/alumnos"),
+    ("alumnos_completo", 5, "GET", "/alumnos"),
+    ("entregar", 20, "POST", "/entregar"),
+    ("dashboard_stats", 40, "GET", "/dashboard/stats"),
+]
+
+
+def xlsx(df: pd.DataFrame, **hojas) -> bytes:
+    bio = io.BytesIO()
+    with pd.ExcelWriter(bio, engine="openpyxl") as writer:
+        for nombre, hoja in (hojas or {"Sheet1": df}).items():
+            hoja.to_excel(writer, sheet_name=nombre, index=False)
+    return bio.getvalue()
+
+
+def usuarios_xlsx() -> bytes:
+    return xlsx(None, Admins=pd.DataFrame({"CORREO": ADMINS}), Tutores=pd.DataFrame({"CORREO": TUTORES}))
+
+
+def percentil(valores: list, p: float) -> float:
+    if not valores:
+        return 0.0
+    orden = sorted(valores)
+    return orden[min(len(orden) - 1, int(round(p / 100 * (len(orden) - 1))))]
+
+
+def _puerto_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def preparar_backend(filas: int, latencia: float, tmp: str, storage: str = "azure", roster: str = "excel"):
+    os.environ.update({
+        "STORAGE_BACKEND": storage,
+        "ROSTER_STORE": roster,
+        "SQLITE_PATH": os.path.join(tmp, "roster.db"),
+        "LOCAL_STORAGE_DIR": os.path.join(tmp, "storage"),
+        "AZURE_ACCOUNT_NAME": "bench",
+        "AZURE_CONTAINER_NAME": CONTAINER,
+        "AZURE_SAS_TOKEN": "bench",
+        "AZURE_ASYNC": "0",
+        "JOURNAL_PATH": os.path.join(tmp, "entregas_journal.jsonl"),
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+    })
+    # main crea su BlobServiceClient en el primer uso: se reemplaza antes
+    import azure.storage.blob
+    azure.storage.blob.BlobServiceClient = FakeBlobServiceClient
+    FakeBlobServiceClient.latency = latencia
+
+    import main
+    main.storage.file(main.EXCEL_BLOB_NAME).upload(xlsx(generar_roster(filas)))
+    main.storage.file(main.AUTH_BLOB_NAME).upload(usuarios_xlsx())
+    return main
+
+
+def levantar(app) -> str:
+    import uvicorn
+    port = _puerto_libre()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+async def correr_carga(base: str, filas: int, concurrencia: int, segundos: float, seed: int = 7) -> dict:
+    import aiohttp
+
+    rnd = random.Random(seed)
+    nombres = [m[0] for m in MEZCLA]
+    pesos = [m[1] for m in MEZCLA]
+    rutas = {m[0]: m[2:] for m in MEZCLA}
+    latencias = {n: [] for n in nombres}
+    errores = {n: 0 for n in nombres}
+
+    def armar(nombre):
+        metodo, ruta = rutas[nombre]
+        if nombre == "login":
+            return metodo, ruta, {"json": {"email": rnd.choice(TUTORES + ADMINS)}}
+        if nombre == "alumnos_pagina":
+            return metodo, ruta, {"params": {"limit": 200, "offset": rnd.randrange(max(1, filas - 200))}}
+        if nombre == "entregar":
+            return metodo, ruta, {"json": {"folio": str(100000 + rnd.randrange(filas)), "responsable": "BENCH"}}
+        return metodo, ruta, {}
+
+    fin = time.perf_counter() + segundos
+
+    async def trabajador(session):
+        while time.perf_counter() < fin:
+            nombre = rnd.choices(nombres, pesos)[0]
+            metodo, ruta, kwargs = armar(nombre)
+            t0 = time.perf_counter()
+            try:
+                async with session.request(metodo, base + ruta, **kwargs) as resp:
+                    await resp.read()
+                    ok = resp.status < 500
+            except aiohttp.ClientError:
+                ok = False
+            latencias[nombre].append(time.perf_counter() - t0)
+            if not ok:
+                errores[nombre] += 1
+
+    t0 = time.perf_counter()
+    connector = aiohttp.TCPConnector(limit=concurrencia)
+    async with aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=300)) as session:
+        await asyncio.gather(*(trabajador(session) for _ in range(concurrencia)))
+    total = time.perf_counter() - t0
+
+    return {
+        "segundos": round(total, 2),
+        "endpoints": {
+            n: {
+                "requests": len(v),
+                "errores": errores[n],
+                "rps": round(len(v) / total, 1),
+                "p50_ms": round(percentil(v, 50) * 1000, 1),
+                "p95_ms": round(percentil(v, 95) * 1000, 1),
+                "p99_ms": round(percentil(v, 99) * 1000, 1),
+            }
+            for n, v in latencias.items()
+        },
+        "total_rps": round(sum(len(v) for v in latencias.values()) / total, 1),
+    }
+
+
+def medir_tamano(filas: int, concurrencia: int, segundos: float, latencia: float, storage: str, roster: str) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        main = preparar_backend(filas, latencia, tmp, storage, roster)
+        base = levantar(main.app)
+
+        import urllib.request
+        t0 = time.perf_counter()
+        urllib.request.urlopen(base + "/alumnos?limit=1").read()
+        carga_inicial = time.perf_counter() - t0
+
+        resultado = asyncio.run(correr_carga(base, filas, concurrencia, segundos))
+        resultado.update(filas=filas, concurrencia=concurrencia, storage=storage, roster=roster, carga_inicial_s=round(carga_inicial, 2))
+        resultado["uploads"] = main.get_upload_stats()
+        return resultado
+
+
+def imprimir(r: dict):
+    print(f"\n== {r['storage']}/{r['roster']} · {r['filas']} filas · {r['concurrencia']} clientes · {r['segundos']}s · "
+          f"carga inicial {r['carga_inicial_s']}s · {r['total_rps']} req/s")
+    print(f"  {'endpoint':<18} {'req':>7} {'err':>5} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for nombre, e in r["endpoints"].items():
+        print(f"  {nombre:<18} {e['requests']:>7} {e['errores']:>5} {e['rps']:>8} "
+              f"{e['p50_ms']:>9} {e['p95_ms']:>9} {e['p99_ms']:>9}")
+    u = r["uploads"]
+    print(f"  uploads {u['uploads']} · conflictos {u['conflicts']} · fallidos {u['failures']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--concurrencia", type=int, default=16)
+    parser.add_argument("--segundos", type=float, default=15.0)
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos de latencia simulada por llamada a Azure")
+    parser.add_argument("--storage", choices=("azure", "local"), default="azure",
+                        help="azure = Blob en memoria (FakeBlobServiceClient), local = disco en un directorio temporal")
+    parser.add_argument("--roster", choices=("excel", "sqlite"), default="excel", help="ROSTER_STORE del backend")
+    parser.add_argument("--json", help="guardar resultados en este archivo")
+    parser.add_argument("--_uno", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args._uno:
+        print(json.dumps(medir_tamano(args._uno, args.concurrencia, args.segundos, args.latencia, args.storage, args.roster)))
+        return
+
+    resultados = []
+    for filas in args.filas:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.load", "--_uno", str(filas),
+             "--concurrencia", str(args.concurrencia), "--segundos", str(args.segundos),
+             "--latencia", str(args.latencia), "--storage", args.storage, "--roster", args.roster],
+            capture_output=True, text=True,
+        )
+        if out.returncode != 0:
+            print(out.stderr, file=sys.stderr)
+            raise SystemExit(f"Falló la corrida de {filas} filas")
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        imprimir(r)
+        resultados.append(r)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(resultados, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+# benchmarks/multi_campus.py
+"""Carga de varias sedes: parseo serial vs ProcessPoolExecutor.
+
+Genera un xlsx por sede en un almacenamiento local temporal y mide
+RosterSet.load() con distintos ROSTER_PARSE_WORKERS. La primera carga con
+procesos incluye el arranque de los workers (spawn); se informa aparte.
+
+Uso (desde backend/):
+    python -m benchmarks.multi_campus
+    python -m benchmarks.multi_campus --sedes 6 --filas 20000 --workers 0 2 4
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.load import xlsx
+from benchmarks.roster_load import generar_roster
+from services.roster_sources import RosterSet, RosterSource
+from services.storage import LocalStorage
+
+
+def preparar(tmp: str, sedes: int, filas: int):
+    storage = LocalStorage(tmp)
+    sources = []
+    for i in range(sedes):
+        df = generar_roster(filas, seed=i)
+        df['N° DE FOLIO'] = [str((i + 1) * 1_000_000 + j) for j in range(filas)]
+        nombre = f"sedes/sede{i}.xlsx"
+        storage.file(nombre).upload(xlsx(df))
+        sources.append(RosterSource(f"Sede {i}", nombre))
+    return storage, sources
+
+
+def medir(storage, sources, workers: int, repeticiones: int) -> dict:
+    roster_set = RosterSet(
+        storage, sources,
+        download=lambda f: f.download(),
+        upload=lambda f, data, etag=None: f.upload(data, etag=etag),
+        serialize=None,
+        parse_workers=workers,
+    )
+    try:
+        t0 = time.perf_counter()
+        df, _ = roster_set.load()
+        primera = time.perf_counter() - t0
+        tiempos = []
+        for _ in range(repeticiones):
+            t0 = time.perf_counter()
+            roster_set.load()
+            tiempos.append(time.perf_counter() - t0)
+        return {"workers": workers, "filas": len(df), "primera_s": primera, "mejor_s": min(tiempos)}
+    finally:
+        roster_set.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sedes", type=int, default=4)
+    parser.add_argument("--filas", type=int, default=10_000, help="filas por sede")
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, min(4, os.cpu_count() or 1)])
+    parser.add_argument("--repeticiones", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage, sources = preparar(tmp, args.sedes, args.filas)
+        print(f"{args.sedes} sedes × {args.filas} filas · {os.cpu_count()} CPU")
+        print(f"  {'workers':>7} {'filas':>8} {'primera s':>10} {'mejor s':>9}")
+        for workers in args.workers:
+            r = medir(storage, sources, workers, args.repeticiones)
+            print(f"  {r['workers']:>7} {r['filas']:>8} {r['primera_s']:>10.2f} {r['mejor_s']:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/roster_load.py
+"""Micro-benchmark de carga del roster: normalización anterior vs normalizar_roster.
+
+Uso (desde backend/):  python -m benchmarks.roster_load [filas]
+"""
+import io
+import sys
+import time
+import random
+import pandas as pd
+
+from services.roster_schema import COLUMN_MAPPING, REQUIRED_COLUMNS, normalizar_roster
+
+ESTADOS = ['ENTREGADA', 'PENDIENTE DE ENTREGA', 'SI', 'NO', 'X', '', None, 'true']
+RESPONSABLES = [f'TUTOR {i}' for i in range(40)] + [None]
+
+
+def generar_roster(filas: int, seed: int = 7) -> pd.DataFrame:
+    rnd = random.Random(seed)
+    return pd.DataFrame({
+        'N° DE FOLIO': [str(100000 + i) for i in range(filas)],
+        'RUT': [f'{rnd.randint(5_000_000, 26_000_000)}' for _ in range(filas)],
+        'DV': [rnd.choice('0123456789K') for _ in range(filas)],
+        'NOMBRE COMPLETO': [f'ALUMNO {i} APELLIDO {i % 997}' for i in range(filas)],
+        'MAIL': [f'alumno{i}@correo.cl' for i in range(filas)],
+        'ESTADO DE ENTREGA': [rnd.choice(ESTADOS) for _ in range(filas)],
+        'RESPONSABLE': [rnd.choice(RESPONSABLES) for _ in range(filas)],
+        'FECHA DE ENTREGA': [f'2025-03-{rnd.randint(1, 28):02d} 10:00:00' if rnd.random() < 0.5 else None for _ in range(filas)],
+    })
+
+
+def normalizar_anterior(df: pd.DataFrame) -> pd.DataFrame:
+    # Copia de la normalización previa de read_excel_from_bytes
+    df.columns = [str(c).strip() for c in df.columns]
+    renames = {old.strip(): new for old, new in COLUMN_MAPPING.items() if old.strip() in df.columns}
+    df.rename(columns=renames, inplace=True)
+    df['EntregadoStatus'] = df['EntregadoStatus'].astype(str).str.upper().str.strip()
+    df['EntregadoStatus'] = df['EntregadoStatus'].replace(['TRUE', 'SI', 'X', '1', 'ENTREGADA'], 'ENTREGADA')
+    df['EntregadoStatus'] = df['EntregadoStatus'].replace(['FALSE', 'NO', '0', '', 'NAN', 'nan'], 'PENDIENTE DE ENTREGA')
+    df['EntregadoStatus'] = df['EntregadoStatus'].fillna('PENDIENTE DE ENTREGA')
+    for col in REQUIRED_COLUMNS:
+        if col not in df.columns: df[col] = ''
+    return df
+
+
+def medir(nombre: str, fn, crudo: pd.DataFrame, repeticiones: int = 5):
+    tiempos = []
+    for _ in range(repeticiones):
+        df = crudo.copy()
+        t0 = time.perf_counter()
+        df = fn(df)
+        tiempos.append(time.perf_counter() - t0)
+    bytes_fila = df.memory_usage(deep=True).sum() / len(df)
+    print(f"  {nombre:<22} {min(tiempos) * 1000:8.1f} ms   {bytes_fila:7.1f} B/fila")
+    return df
+
+
+def main(filas: int = 50_000):
+    print(f"Generando workbook de {filas} filas...")
+    bio = io.BytesIO()
+    generar_roster(filas).to_excel(bio, index=False)
+    data = bio.getvalue()
+
+    t0 = time.perf_counter()
+    crudo = pd.read_excel(io.BytesIO(data), dtype=str, engine="openpyxl")
+    print(f"  read_excel (común)     {(time.perf_counter() - t0) * 1000:8.1f} ms   {len(data) / 1024:.0f} KiB xlsx")
+
+    anterior = medir("normalización anterior", normalizar_anterior, crudo)
+    nueva = medir("normalizar_roster", normalizar_roster, crudo)
+
+    # Mismo contenido visible
+    assert (anterior['EntregadoStatus'] == nueva['EntregadoStatus'].astype(str)).all()
+    assert (anterior['Folio'].fillna('') == nueva['Folio'].astype(str)).all()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50_000)
@@ -0,0 +1,78 @@
+# benchmarks/search.py
+"""Búsqueda del mesón: RosterSearch vs filtro pandas de /alumnos?q=.
+
+Construye el índice sobre un roster sintético y mide, para consultas típicas
+(RUT parcial, RUT con DV, Folio, apellido, nombre con error de tipeo), la
+latencia de RosterSearch.search() frente a `str.contains` sobre el DataFrame
+(lo que hace /alumnos?q= y, con todo el roster descargado, los front-ends).
+
+Uso (desde backend/):
+    python -m benchmarks.search
+    python -m benchmarks.search --filas 10000 100000 --repeticiones 50
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from benchmarks.roster_load import generar_roster
+from services.roster_schema import normalizar_roster
+from services.roster_search import RosterSearch
+
+
+def filtro_pandas(df: pd.DataFrame, q: str) -> pd.DataFrame:
+    # Igual que el filtro `q` de filtrar_alumnos
+    term = q.strip().lower()
+    rut_term = term.replace(".", "").replace(" ", "")
+    return df[
+        df['NOMBRE COMPLETO'].astype(str).str.lower().str.contains(term, regex=False)
+        | df['Folio'].astype(str).str.lower().str.contains(term, regex=False)
+        | df['RUT'].astype(str).str.replace(".", "", regex=False).str.lower().str.contains(rut_term, regex=False)
+    ]
+
+
+def consultas(df: pd.DataFrame) -> dict:
+    fila = df.iloc[len(df) // 2]
+    rut = str(fila['RUT'])
+    return {
+        "rut parcial": f"{rut[:2]}.{rut[2:5]}",
+        "rut con dv": f"{rut}-{fila['DigitoVerificador']}",
+        "folio": str(fila['Folio']),
+        "apellido": f"apellido {len(df) // 3 % 997}",
+        "typo": "alumnno 12",
+    }
+
+
+def medir(fn, repeticiones: int) -> float:
+    tiempos = []
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - t0)
+    return sorted(tiempos)[len(tiempos) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    for filas in args.filas:
+        df = normalizar_roster(generar_roster(filas))
+        indice = RosterSearch()
+        t0 = time.perf_counter()
+        indice.rebuild(df)
+        construccion = time.perf_counter() - t0
+        print(f"\n{filas} filas · índice construido en {construccion:.2f}s · {indice.stats()['tokens']} tokens")
+        print(f"  {'consulta':<12} {'q':<22} {'índice ms':>10} {'pandas ms':>10} {'hits':>6}")
+        for nombre, q in consultas(df).items():
+            hits = indice.search(q, args.limit)
+            ms_indice = medir(lambda: indice.search(q, args.limit), args.repeticiones)
+            ms_pandas = medir(lambda: filtro_pandas(df, q), max(1, args.repeticiones // 5))
+            print(f"  {nombre:<12} {q:<22} {ms_indice:>10.2f} {ms_pandas:>10.1f} {len(hits):>6}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+# benchmarks/startup.py
+"""Arranque en frío del backend: import de main, /ready y primeros requests.
+
+Lanza `python server.py` (lo mismo que ejecuta el build de PyInstaller) con
+STORAGE_BACKEND=local sobre un roster sintético y mide, desde el lanzamiento:
+puerto abierto, /ready en 200 y la latencia del primer /login y /alumnos.
+Compara WARMUP=1 (precarga en segundo plano) con WARMUP=0 (todo en el
+primer request). Antes muestra los imports más pesados (-X importtime).
+
+Uso (desde backend/):
+    python -m benchmarks.startup
+    python -m benchmarks.startup --filas 50000 --corridas 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.load import TUTORES, _puerto_libre, usuarios_xlsx, xlsx
+from benchmarks.roster_load import generar_roster
+from services.storage import LocalStorage
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXCEL_BLOB_NAME = "1.0 pre_alpha tne/data.xlsx"
+AUTH_BLOB_NAME = "1.0 pre_alpha tne/usuarios.xlsx"
+
+
+def entorno(tmp: str, warmup: bool, port: int = 0) -> dict:
+    env = dict(os.environ)
+    env.update({
+        "STORAGE_BACKEND": "local",
+        "LOCAL_STORAGE_DIR": os.path.join(tmp, "storage"),
+        "JOURNAL_PATH": os.path.join(tmp, "entregas_journal.jsonl"),
+        "SQLITE_PATH": os.path.join(tmp, "roster.db"),
+        "EXCEL_BLOB_NAME": EXCEL_BLOB_NAME,
+        "WARMUP": "1" if warmup else "0",
+        "HOST": "127.0.0.1",
+        "PORT": str(port),
+        "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+    })
+    return env
+
+
+def imports_pesados(tmp: str, top: int) -> list:
+    """(módulo, ms acumulados) de los imports directos de main, de mayor a menor."""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND, env=entorno(tmp, warmup=False), capture_output=True, text=True,
+    )
+    filas = []
+    for linea in out.stderr.splitlines():
+        if not linea.startswith("import time:") or "|" not in linea:
+            continue
+        _, acumulado, nombre = linea.split("|")
+        # Dos espacios de sangría = import directo de main
+        if nombre.startswith("   ") and not nombre.startswith("    ") or nombre.strip() == "main":
+            try:
+                filas.append((nombre.strip(), int(acumulado) / 1000))
+            except ValueError:
+                continue
+    return sorted(filas, key=lambda f: -f[1])[:top]
+
+
+def pedir(url: str, data: dict | None = None, timeout: float = 300):
+    req = urllib.request.Request(url, json.dumps(data).encode() if data is not None else None,
+                                 {"Content-Type": "application/json"} if data is not None else {})
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    return status, time.perf_counter() - t0
+
+
+def corrida(tmp: str, warmup: bool) -> dict:
+    port = _puerto_libre()
+    base = f"http://127.0.0.1:{port}"
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "server.py"], cwd=BACKEND, env=entorno(tmp, warmup, port),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        puerto = ready = None
+        while ready is None:
+            if proc.poll() is not None:
+                raise SystemExit("El backend terminó antes de quedar listo")
+            try:
+                status, _ = pedir(base + "/ready", timeout=5)
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.02)
+                continue
+            puerto = puerto or time.perf_counter() - t0
+            if status == 200:
+                ready = time.perf_counter() - t0
+            else:
+                time.sleep(0.05)
+        _, login = pedir(base + "/login", {"email": TUTORES[0]})
+        _, alumnos = pedir(base + "/alumnos?limit=200")
+        return {
+            "warmup": warmup,
+            "puerto_s": round(puerto, 2),
+            "ready_s": round(ready, 2),
+            "login_ms": round(login * 1000, 1),
+            "alumnos_ms": round(alumnos * 1000, 1),
+            "utilizable_s": round(ready + login + alumnos, 2),
+        }
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=10_000)
+    parser.add_argument("--corridas", type=int, default=3, help="arranques por modo (el primero parsea el Excel)")
+    parser.add_argument("--top", type=int, default=12, help="imports a listar")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = LocalStorage(os.path.join(tmp, "storage"))
+        storage.file(EXCEL_BLOB_NAME).upload(xlsx(generar_roster(args.filas)))
+        storage.file(AUTH_BLOB_NAME).upload(usuarios_xlsx())
+
+        print("Imports directos de main (-X importtime, acumulado):")
+        for nombre, ms in imports_pesados(tmp, args.top):
+            print(f"  {nombre:<32} {ms:>8.1f} ms")
+
+        print(f"\n{args.filas} filas · arranques de `python server.py` (tiempos desde el lanzamiento)")
+        print(f"  {'warmup':>6} {'puerto s':>9} {'ready s':>8} {'login ms':>9} {'alumnos ms':>11} {'utilizable s':>13}")
+        for warmup in (False, True):
+            for _ in range(args.corridas):
+                r = corrida(tmp, warmup)
+                print(f"  {str(r['warmup']):>6} {r['puerto_s']:>9} {r['ready_s']:>8} {r['login_ms']:>9} "
+                      f"{r['alumnos_ms']:>11} {r['utilizable_s']:>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+# conftest.py
+# test_sharepoint.py es un script manual contra el Azure real (descarga el
+# Excel al importarse), no una prueba: pytest no debe recolectarlo.
+collect_ignore = ["test_sharepoint.py"]
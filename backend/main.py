@@ -1,28 +1,62 @@
 import sys
+import time
+# Arranque: cuánto tarda importar main con sus dependencias (ver /ready)
+_T_IMPORT = time.perf_counter()
 import os
 import io
+import random
+import asyncio
+import functools
+import threading
+import multiprocessing
 import pandas as pd
-from datetime import datetime, timedelta
-from fastapi import FastAPI, HTTPException
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse  # <--- NUEVA IMPORTACIÓN
+from fastapi.responses import JSONResponse, Response, StreamingResponse  # <--- NUEVA IMPORTACIÓN
 from pydantic import BaseModel
 from dotenv import load_dotenv
-from azure.storage.blob import BlobServiceClient
-import uvicorn
-import pytz 
+from services.roster_cache import RosterCache
+from services.delivery_journal import DeliveryJournal
+from services.group_commit import GroupCommit
+from services.roster_index import RosterIndex, DuplicateKeyError
+from services.roster_search import RosterSearch
+from services.excel_writer import sheets_to_xlsx_bytes, to_xlsx_bytes
+from services.roster_schema import REQUIRED_COLUMNS, ENTREGADA, normalizar_roster, asignar, leer_roster
+from services.roster_snapshot import ParquetSnapshot
+from services.roster_db import RosterDB, ExportScheduler
+from services.roster_sources import CAMPUS_COLUMN, RosterSet, parse_sources
+from services.dashboard_stats import DashboardAggregates, delta_fila
+from services.live_events import EventBroadcaster
+from services.roster_versions import RosterVersions
+from services.role_cache import RoleCache, Roles
+from services.azure_async import AsyncBlobStore
+from services.blob_stream import RangeNotSatisfiable, etag_matches, parse_range
+from services.metrics import Metrics
+from services.storage import StorageConflictError, UnavailableStorage, crear_storage
+from services.logs import configurar_logging
+from services.warmup import Warmup
 
 # ---------------------------
 # Configuración de Rutas y Entorno
 # ---------------------------
 if getattr(sys, 'frozen', False):
     app_path = sys._MEIPASS
+    # _MEIPASS es temporal: los datos persistentes van junto al ejecutable
+    data_path = os.path.dirname(sys.executable)
 else:
     app_path = os.path.dirname(os.path.abspath(__file__))
+    data_path = app_path
 
 dotenv_path = os.path.join(app_path, '.env')
 load_dotenv(dotenv_path)
 
+# Logs estructurados: LOG_LEVEL=WARNING en producción, LOG_FORMAT=json para recolectores
+log = configurar_logging(os.getenv("LOG_LEVEL", "INFO"), os.getenv("LOG_FORMAT", "text"))
+
 AZURE_ACCOUNT_NAME = os.getenv("AZURE_ACCOUNT_NAME")
 AZURE_CONTAINER_NAME = os.getenv("AZURE_CONTAINER_NAME")
 AZURE_SAS_TOKEN = os.getenv("AZURE_SAS_TOKEN")
@@ -32,10 +66,111 @@ EXCEL_BLOB_NAME = os.getenv("EXCEL_BLOB_NAME", "1.0 pre_alpha tne/data.xlsx")
 AUTH_BLOB_NAME = "1.0 pre_alpha tne/usuarios.xlsx" 
 LOCAL_AUTH_FILE = "usuarios.xlsx"
 
+# Segundos antes de revalidar (en segundo plano) el ETag de usuarios.xlsx
+ROLES_CACHE_TTL = float(os.getenv("ROLES_CACHE_TTL", "60"))
+
+# Almacenamiento: azure (Blob), sharepoint (Graph) o local (disco, p. ej. build de escritorio)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "azure")
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", os.path.join(data_path, "storage"))
+SHAREPOINT_BASE_PATH = os.getenv("SHAREPOINT_BASE_PATH", "")
+
+# Varias sedes: "Sede=ruta/archivo.xlsx#Hoja; Otra=ruta/otro.xlsx" (vacío = solo EXCEL_BLOB_NAME)
+ROSTER_SOURCES = os.getenv("ROSTER_SOURCES", "")
+# Procesos para parsear las hojas de las sedes en paralelo (0 o 1 = en el hilo que carga)
+ROSTER_PARSE_WORKERS = int(os.getenv("ROSTER_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Snapshot Parquet del roster junto al Excel (lecturas rápidas)
+ROSTER_SNAPSHOT = os.getenv("ROSTER_SNAPSHOT", "1") == "1"
+SNAPSHOT_BLOB_NAME = os.getenv("SNAPSHOT_BLOB_NAME", os.path.splitext(EXCEL_BLOB_NAME)[0] + ".parquet")
+
+# Serialización del Excel: xlsxwriter (streaming), write_only (openpyxl) u openpyxl
+EXCEL_WRITER = os.getenv("EXCEL_WRITER", "xlsxwriter")
+
+# Segundos durante los que el roster en memoria se sirve sin validar el ETag
+ROSTER_CACHE_TTL = float(os.getenv("ROSTER_CACHE_TTL", "10"))
+
+# Entregas write-behind: se anotan en un journal local y se suben en lotes.
+# Opcional: la entrega se confirma cuando está en el disco de la instancia,
+# que en un hosting efímero puede perderse al reiniciar antes de subirla
+ENTREGAS_WRITE_BEHIND = os.getenv("ENTREGAS_WRITE_BEHIND", "0") == "1"
+JOURNAL_PATH = os.getenv("JOURNAL_PATH", os.path.join(data_path, "entregas_journal.jsonl"))
+JOURNAL_FLUSH_SECONDS = float(os.getenv("JOURNAL_FLUSH_SECONDS", "5"))
+JOURNAL_FLUSH_MAX = int(os.getenv("JOURNAL_FLUSH_MAX", "50"))
+# Máximo de entregas por POST /entregar/batch
+ENTREGAS_BATCH_MAX = int(os.getenv("ENTREGAS_BATCH_MAX", "1000"))
+
+# Roster de trabajo: excel (DataFrame sobre el Excel) o sqlite (base local en
+# modo WAL como fuente de verdad; el Excel se regenera periódicamente y al descargarlo)
+ROSTER_STORE = os.getenv("ROSTER_STORE", "excel")
+SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join(data_path, "roster.db"))
+SQLITE_EXPORT_SECONDS = float(os.getenv("SQLITE_EXPORT_SECONDS", "30"))
+
+# Subidas con control optimista (If-Match) y reintentos ante conflicto (412)
+UPLOAD_MAX_RETRIES = int(os.getenv("UPLOAD_MAX_RETRIES", "5"))
+UPLOAD_RETRY_BASE = float(os.getenv("UPLOAD_RETRY_BASE", "0.2"))
+
+# Lecturas del roster con azure.storage.blob.aio (requiere aiohttp)
+AZURE_ASYNC = os.getenv("AZURE_ASYNC", "0") == "1"
+AZURE_POOL_SIZE = int(os.getenv("AZURE_POOL_SIZE", "20"))
+# Hilos para parseo de Excel/Parquet y armado de respuestas con pandas
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Precarga de roster y roles en segundo plano al arrancar (estado en /ready)
+WARMUP = os.getenv("WARMUP", "1") == "1"
+
+# Con `python main.py`, el pool de sedes (spawn) re-ejecuta este archivo como
+# __mp_main__ en cada worker: ahí no se conecta el almacenamiento ni se abren
+# el journal y SQLite, que pertenecen al proceso del servidor
+SPAWN_WORKER = __name__ == "__mp_main__"
+
 # ---------------------------
 # Inicialización de APP
 # ---------------------------
-app = FastAPI(title="TNE Backend (Simple Auth)")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await azure_aio.start()
+    if roster_db and not warmup.enabled:
+        await run_in_threadpool(iniciar_roster_db)
+        db_exporter.start()
+    elif not roster_db and ENTREGAS_WRITE_BEHIND:
+        delivery_journal.start()
+    # Con la precarga, SQLite se importa (y arranca su exportador) en segundo plano
+    warmup.start()
+    yield
+    await warmup.stop()
+    if roster_db:
+        await run_in_threadpool(db_exporter.stop)
+    elif ENTREGAS_WRITE_BEHIND:
+        delivery_journal.stop()
+    await azure_aio.close()
+    if roster_set:
+        roster_set.close()
+    cpu_executor.shutdown(wait=False)
+
+app = FastAPI(title="TNE Backend (Simple Auth)", lifespan=lifespan)
+
+# ---------------------------
+# Métricas
+# ---------------------------
+metrics = Metrics()
+metrics.histogram("http_request_duration_seconds", "Latencia por ruta, método y código de respuesta")
+metrics.histogram("stage_seconds", "Duración de etapas: download, parse, serialize, upload, roles")
+metrics.counter("blob_bytes_total", "Bytes transferidos con Azure Blob por blob y dirección")
+
+@app.middleware("http")
+async def medir_request(request: Request, call_next):
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        segundos = time.perf_counter() - t0
+        # Plantilla de la ruta ("/alumnos"), no la URL concreta, para acotar las series
+        route = getattr(request.scope.get("route"), "path", "sin_ruta")
+        metrics.observe("http_request_duration_seconds", segundos, method=request.method, route=route, status=status)
+        log.debug("request", extra={"ctx": {"method": request.method, "route": route, "status": status, "ms": round(segundos * 1000, 1)}})
 
 origins = [
     "https://tne-registro.vercel.app",
@@ -59,157 +194,570 @@ class EntregaRequest(BaseModel):
     rut: str | None = None
     responsable: str | None = None
 
+class EntregaBatchRequest(BaseModel):
+    entregas: list[EntregaRequest]
+
 class LoginRequest(BaseModel):
     email: str
 
 # ---------------------------
-# Conexión Azure Blob Storage
+# Conexión al Almacenamiento
 # ---------------------------
-try:
-    blob_service_client = BlobServiceClient(
-        account_url=f"https://{AZURE_ACCOUNT_NAME}.blob.core.windows.net",
-        credential=AZURE_SAS_TOKEN
-    )
-    container_client = blob_service_client.get_container_client(AZURE_CONTAINER_NAME)
-    blob_client_data = container_client.get_blob_client(EXCEL_BLOB_NAME)
-    # Cliente para Auth
-    blob_client_auth = container_client.get_blob_client(AUTH_BLOB_NAME)
-    
-    print(f"✅ [Azure] Conectado a: {AZURE_CONTAINER_NAME}")
+if SPAWN_WORKER:
+    # Los workers solo parsean hojas que reciben como bytes
+    storage = UnavailableStorage(STORAGE_BACKEND, RuntimeError("worker de parseo sin almacenamiento"))
+else:
+    try:
+        storage = crear_storage(
+            STORAGE_BACKEND,
+            account_name=AZURE_ACCOUNT_NAME,
+            container=AZURE_CONTAINER_NAME,
+            credential=AZURE_SAS_TOKEN,
+            root=LOCAL_STORAGE_DIR,
+            base_path=SHAREPOINT_BASE_PATH,
+        )
+        log.info(f"✅ [Storage] Conectado a: {storage.description}")
+    except Exception as e:
+        log.error(f"❌ [Storage] Error crítico: {e}")
+        # El servidor igual arranca: cada acceso a un archivo lanza este mismo
+        # error, que /ready y los endpoints informan
+        storage = UnavailableStorage(STORAGE_BACKEND, e)
+
+roster_file = storage.file(EXCEL_BLOB_NAME)
+snapshot_file = storage.file(SNAPSHOT_BLOB_NAME)
+# Archivo para Auth
+auth_file = storage.file(AUTH_BLOB_NAME)
+
+azure_aio = AsyncBlobStore(
+    f"https://{AZURE_ACCOUNT_NAME}.blob.core.windows.net",
+    AZURE_SAS_TOKEN,
+    AZURE_CONTAINER_NAME,
+    # El camino aio existe solo para Azure Blob y un único Excel
+    enabled=AZURE_ASYNC and STORAGE_BACKEND == "azure" and not ROSTER_SOURCES.strip(),
+    pool_size=AZURE_POOL_SIZE,
+)
+if AZURE_ASYNC and STORAGE_BACKEND == "azure" and not azure_aio.enabled:
+    log.warning("⚠️ [Azure aio] aiohttp no disponible, se usa el cliente sync")
+
+cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="tne-cpu")
 
-except Exception as e:
-    print(f"❌ [Azure] Error crítico: {e}")
+async def run_cpu(fn, *args, **kwargs):
+    """Trabajo de pandas/openpyxl en el executor acotado, fuera del event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_executor, functools.partial(fn, *args, **kwargs))
 
 # ---------------------------
 # Utilidades y Mapeo de Excel
 # ---------------------------
-COLUMN_MAPPING = {
-    'RUT': 'RUT', 'N° DE FOLIO': 'Folio', 'FOLIO': 'Folio', 'Folio': 'Folio',
-    'NOMBRE': 'NOMBRE COMPLETO', 'NOMBRE COMPLETO': 'NOMBRE COMPLETO',
-    'MAIL': 'Mail', 'Mail': 'Mail',
-    'ESTADO DE ENTREGA': 'EntregadoStatus', 'ENTREGADO': 'EntregadoStatus', 'EntregadoStatus': 'EntregadoStatus',
-    'FECHA DE ENTREGA': 'FechaEntrega', 'FechaEntrega': 'FechaEntrega',
-    'RESPONSABLE': 'Responsable', 'Responsable': 'Responsable',
-    'DV': 'DigitoVerificador', 'DigitoVerificador': 'DigitoVerificador',
-    'N° DE GUIA DESPACHO': 'GuiaDespacho', 'GuiaDespacho': 'GuiaDespacho',
-    'N° DE GUIA': 'NumeroGuia', 'NumeroGuia': 'NumeroGuia'
-}
-
-REQUIRED_COLUMNS = [
-    'Folio', 'RUT', 'DigitoVerificador', 'GuiaDespacho', 'NumeroGuia', 
-    'NOMBRE COMPLETO', 'Mail', 'Responsable', 'FechaEntrega', 'EntregadoStatus'
-]
+def _blob(file) -> str:
+    return os.path.basename(file.name) or "desconocido"
 
-def download_excel_bytes(client) -> bytes:
-    return client.download_blob().readall()
+def download_excel_bytes(file) -> bytes:
+    return download_excel_with_etag(file)[0]
 
-def upload_excel_bytes(client, data: bytes):
-    client.upload_blob(data, overwrite=True)
+def download_excel_with_etag(file):
+    with metrics.span("download", blob=_blob(file)):
+        data, etag = file.download()
+    metrics.inc("blob_bytes_total", len(data), blob=_blob(file), direction="download")
+    return data, etag
 
-def read_excel_from_bytes(data: bytes) -> pd.DataFrame:
-    try:
-        df = pd.read_excel(io.BytesIO(data), dtype=str, engine="openpyxl")
-    except:
-        try:
-            df = pd.read_csv(io.BytesIO(data), sep=',', encoding='utf-8', dtype=str)
-        except:
-            df = pd.read_csv(io.BytesIO(data), sep=';', encoding='latin1', dtype=str)
+def get_blob_etag(file) -> str:
+    return file.stat().etag
 
-    df.columns = [str(c).strip() for c in df.columns]
-    renames = {old.strip(): new for old, new in COLUMN_MAPPING.items() if old.strip() in df.columns}
-    df.rename(columns=renames, inplace=True)
-    
-    if 'EntregadoStatus' in df.columns:
-        df['EntregadoStatus'] = df['EntregadoStatus'].astype(str).str.upper().str.strip()
-        df['EntregadoStatus'] = df['EntregadoStatus'].replace(['TRUE', 'SI', 'X', '1', 'ENTREGADA'], 'ENTREGADA')
-        df['EntregadoStatus'] = df['EntregadoStatus'].replace(['FALSE', 'NO', '0', '', 'NAN', 'nan'], 'PENDIENTE DE ENTREGA')
-        df['EntregadoStatus'] = df['EntregadoStatus'].fillna('PENDIENTE DE ENTREGA')
-    else:
-        df['EntregadoStatus'] = 'PENDIENTE DE ENTREGA'
+def upload_excel_bytes(file, data: bytes, etag: str | None = None):
+    """Sube el archivo. Con `etag` solo escribe si no cambió (If-Match)."""
+    with metrics.span("upload", blob=_blob(file)):
+        new_etag = file.upload(data, etag=etag)
+    metrics.inc("blob_bytes_total", len(data), blob=_blob(file), direction="upload")
+    return new_etag
 
-    for col in REQUIRED_COLUMNS:
-        if col not in df.columns: df[col] = ''
-    return df
+def read_excel_from_bytes(data: bytes) -> pd.DataFrame:
+    with metrics.span("parse"):
+        return leer_roster(data)
 
-def df_to_excel_bytes(df: pd.DataFrame) -> bytes:
-    bio = io.BytesIO()
+def _columnas_excel(df: pd.DataFrame) -> list:
     all_cols = [c for c in df.columns if c not in REQUIRED_COLUMNS]
     final_cols = list(dict.fromkeys(REQUIRED_COLUMNS + all_cols))
-    with pd.ExcelWriter(bio, engine="openpyxl") as writer:
-        cols_to_write = [col for col in final_cols if col in df.columns]
-        df[cols_to_write].to_excel(writer, index=False)
-    bio.seek(0)
-    return bio.read()
-
-def find_row_index(df: pd.DataFrame, folio=None, rut=None):
-    if folio:
-        idx = df.index[df['Folio'].astype(str).str.strip() == str(folio).strip()]
-        if not idx.empty: return idx[0]
-    if rut:
-        idx = df.index[df['RUT'].astype(str).str.strip() == str(rut).strip()]
-        if not idx.empty: return idx[0]
-    return None
+    return [col for col in final_cols if col in df.columns]
+
+def df_to_excel_bytes(df: pd.DataFrame) -> bytes:
+    with metrics.span("serialize", writer=EXCEL_WRITER):
+        return to_xlsx_bytes(df[_columnas_excel(df)], mode=EXCEL_WRITER)
+
+def libro_to_excel_bytes(hojas: dict) -> bytes:
+    """Libro con una hoja por sede (nombre de hoja -> DataFrame)."""
+    with metrics.span("serialize", writer=EXCEL_WRITER):
+        return sheets_to_xlsx_bytes({n: h[_columnas_excel(h)] for n, h in hojas.items()}, mode=EXCEL_WRITER)
+
+def find_row_index(df: pd.DataFrame, folio=None, rut=None, index: RosterIndex | None = None):
+    """Busca por Folio y luego por RUT. Lanza DuplicateKeyError si la clave se repite."""
+    if index is None:
+        index = RosterIndex(df)
+    return index.find(folio=folio, rut=rut)
+
+@functools.lru_cache(maxsize=1)
+def zona_chile():
+    import pytz
+    return pytz.timezone('America/Santiago')
+
+def fecha_chile() -> str:
+    return datetime.now(zona_chile()).strftime("%Y-%m-%d %H:%M:%S")
+
+def hoy_chile():
+    return datetime.now(zona_chile()).date()
+
+def estado_fila(df: pd.DataFrame, idx) -> tuple:
+    return (df.at[idx, 'EntregadoStatus'], df.at[idx, 'Responsable'], df.at[idx, 'FechaEntrega'])
+
+def apply_entrega(df: pd.DataFrame, entry: dict, idx=None, index: RosterIndex | None = None, on_change=None):
+    """Marca la fila como entregada. Devuelve el índice o None si no existe.
+
+    `on_change(df, idx, antes, despues)` recibe el estado de la fila antes y
+    después del cambio.
+    """
+    if idx is None:
+        idx = find_row_index(df, folio=entry.get("folio"), rut=entry.get("rut"), index=index)
+    if idx is None:
+        return None
+    antes = estado_fila(df, idx) if on_change else None
+    asignar(df, idx, 'EntregadoStatus', ENTREGADA)
+    asignar(df, idx, 'Responsable', entry.get("responsable") or df.at[idx, 'Responsable'])
+    df.at[idx, 'FechaEntrega'] = entry["fecha"]
+    if on_change:
+        on_change(df, idx, antes, estado_fila(df, idx))
+    return idx
 
 # ---------------------------
-# Lógica de Autenticación
+# Cache del Roster
 # ---------------------------
-def get_roles():
-    admins = []
-    tutores = []
-    
-    excel_data = None
-    source = "N/A"
+# SharePoint no guarda metadatos: sin ellos no se puede validar el snapshot
+roster_snapshot = ParquetSnapshot(enabled=ROSTER_SNAPSHOT and snapshot_file.supports_metadata)
+dashboard_stats = DashboardAggregates()
+roster_search = RosterSearch()
+live_events = EventBroadcaster()
+roster_versions = RosterVersions()
+
+roster_set = RosterSet(
+    storage,
+    parse_sources(ROSTER_SOURCES),
+    download=download_excel_with_etag,
+    upload=upload_excel_bytes,
+    serialize=libro_to_excel_bytes,
+    parse_workers=ROSTER_PARSE_WORKERS,
+) if ROSTER_SOURCES.strip() else None
+
+def roster_etag():
+    """ETag del Excel del roster (compuesto si hay varias sedes)."""
+    return roster_set.etag() if roster_set else get_blob_etag(roster_file)
+
+def subir_roster(df: pd.DataFrame, etag):
+    """Sube el roster con If-Match. Con sedes, solo los archivos de las sedes que cambiaron."""
+    if roster_set:
+        return roster_set.save(df, etag, roster_set.cambiadas(df))
+    return upload_excel_bytes(roster_file, df_to_excel_bytes(df), etag=etag)
+
+def load_roster():
+    if roster_snapshot.enabled:
+        etag = roster_etag()
+        df = roster_snapshot.load(snapshot_file, etag)
+        if df is not None:
+            log.info("⚡ Roster cargado desde snapshot Parquet", extra={"ctx": {"etag": etag}})
+            if roster_set:
+                roster_set.registrar(df)
+            return df, etag
+
+    if roster_set:
+        # Las descargas ya se miden por archivo; el parseo en paralelo, como un todo
+        df, etag = roster_set.load()
+        metrics.observe("stage_seconds", roster_set.last_parse_seconds, stage="parse", sedes=len(roster_set.sources))
+        roster_set.registrar(df)
+        roster_snapshot.save(snapshot_file, df, etag)
+        return df, etag
+
+    data, etag = download_excel_with_etag(roster_file)
+    log.info("📥 Roster descargado y parseado", extra={"ctx": {"etag": etag}})
+    df = read_excel_from_bytes(data)
+    # El Excel se editó fuera del backend (o no había snapshot): regenerarlo
+    roster_snapshot.save(snapshot_file, df, etag)
+    return df, etag
+
+def _valor(v):
+    return "" if pd.isna(v) else v
+
+def registrar_cambio(df: pd.DataFrame, idx, antes: tuple, despues: tuple):
+    """Propaga el cambio de una fila ya visible en el roster del cache."""
+    delta = dashboard_stats.update(antes, despues)
+    if antes == despues:
+        return
+    roster_search.update(idx, {'EntregadoStatus': despues[0]})
+    publicar_entrega(idx, df.at[idx, 'Folio'], df.at[idx, 'RUT'], despues, delta, dashboard_stats.snapshot(hoy_chile()))
+
+def publicar_entrega(idx, folio, rut, despues: tuple, delta: dict, stats: dict):
+    version = roster_versions.touch(idx)
+    # Los clientes parchean su estado local en vez de recargar /alumnos
+    live_events.publish("entrega", {
+        "version": version,
+        "folio": _valor(folio),
+        "rut": _valor(rut),
+        "EntregadoStatus": _valor(despues[0]),
+        "Responsable": _valor(despues[1]),
+        "FechaEntrega": _valor(despues[2]),
+        "delta": delta,
+        "stats": stats,
+    })
+
+def apply_pendientes(df: pd.DataFrame, index: RosterIndex, on_change=None):
+    """Re-aplica las entregas del journal que aún no están en el blob."""
+    if not ENTREGAS_WRITE_BEHIND:
+        return
+    for entry in delivery_journal.pending():
+        try:
+            apply_entrega(df, entry, index=index, on_change=on_change)
+        except DuplicateKeyError as e:
+            log.warning(f"⚠️ [Journal] Entrega ambigua omitida: {e}")
+
+def on_roster_load(df: pd.DataFrame, index: RosterIndex):
+    # El Excel cambió (o es la primera carga): recalcular agregados completos
+    roster_versions.reset()
+    dashboard_stats.rebuild(df)
+    # Entregas aún no subidas deben seguir visibles tras recargar
+    apply_pendientes(df, index, on_change=lambda df, idx, antes, despues: dashboard_stats.update(antes, despues))
+    roster_search.rebuild(df)
+    if dashboard_stats.rebuilds > 1:
+        # Cambio externo: los clientes deben volver a pedir el roster
+        live_events.publish("recarga", {"total_registros": len(df), "version": roster_versions.current()})
+
+roster_cache = RosterCache(
+    loader=load_roster,
+    etag_getter=roster_etag,
+    ttl=ROSTER_CACHE_TTL,
+    build_index=RosterIndex,
+    after_load=on_roster_load,
+)
+
+def roster_con_version():
+    """Roster del cache y su versión, leídos bajo el mismo lock.
+
+    La versión se lee después de cargar (on_roster_load la reinicia). Los
+    cambios que entran al cache después quedan con una versión mayor y se
+    re-envían en el próximo ?since=.
+    """
+    with roster_cache.lock:
+        return roster_cache.get(), roster_versions.current()
+
+# Una sola descarga a la vez aunque varios requests encuentren el cache vencido
+roster_reload_lock = asyncio.Lock()
+
+async def load_roster_async(etag):
+    if roster_snapshot.enabled:
+        df = await roster_snapshot.load_async(azure_aio.blob(SNAPSHOT_BLOB_NAME), etag, run_cpu)
+        if df is not None:
+            log.info("⚡ Roster cargado desde snapshot Parquet", extra={"ctx": {"etag": etag, "aio": True}})
+            return df, etag
+
+    with metrics.span("download", blob=os.path.basename(EXCEL_BLOB_NAME)):
+        data, etag = await azure_aio.download_with_etag(EXCEL_BLOB_NAME)
+    metrics.inc("blob_bytes_total", len(data), blob=os.path.basename(EXCEL_BLOB_NAME), direction="download")
+    log.info("📥 Roster descargado y parseado", extra={"ctx": {"etag": etag, "aio": True}})
+    df = await run_cpu(read_excel_from_bytes, data)
+    await roster_snapshot.save_async(azure_aio.blob(SNAPSHOT_BLOB_NAME), df, etag, run_cpu)
+    return df, etag
+
+async def roster_actual():
+    """Roster del cache para endpoints async.
+
+    En modo AZURE_ASYNC la validación del ETag y la descarga se esperan en el
+    event loop; sin él se usa `roster_cache.get` en el threadpool.
+    """
+    if not azure_aio.enabled:
+        return await run_in_threadpool(roster_cache.get)
+    df = roster_cache.peek()
+    if df is not None:
+        return df
+    async with roster_reload_lock:
+        df = roster_cache.peek()
+        if df is not None:
+            return df
+        etag = await azure_aio.get_etag(EXCEL_BLOB_NAME)
+        df = roster_cache.revalidate(etag)
+        if df is not None:
+            return df
+        df, etag = await load_roster_async(etag)
+        # after_load reconstruye agregados y re-aplica el journal: también es CPU
+        return await run_cpu(roster_cache.load, df, etag)
+
+# ---------------------------
+# Subida con Concurrencia Optimista
+# ---------------------------
+upload_stats = {"uploads": 0, "attempts": 0, "conflicts": 0, "retries": 0, "reloads": 0, "failures": 0}
 
-    # 1. Intentar Azure
+def subir_lote(mutates: list) -> list:
+    """Lectura-modificación-escritura del roster con If-Match para varios commits.
+
+    Cada `mutate(df, índice)` aplica solo sus cambios sobre una copia del
+    roster y, si lanza, debe hacerlo antes de modificarla: el error es solo de
+    ese commit. Ante un 412 se vuelven a aplicar todos sobre el roster actual
+    (recargando el blob solo si lo editó alguien más) y se reintenta con
+    backoff exponencial acotado. Tras subir, la copia reemplaza al roster del
+    cache. Devuelve [(error, (df, resultado))] en el orden de `mutates`.
+    """
+    for attempt in range(UPLOAD_MAX_RETRIES + 1):
+        df, etag, index = roster_cache.snapshot(copy=True)
+        salidas = []
+        for mutate in mutates:
+            try:
+                salidas.append((None, mutate(df, index)))
+            except Exception as e:
+                salidas.append((e, None))
+        if all(error is not None for error, _ in salidas):
+            return salidas
+        upload_stats["attempts"] += 1
+        try:
+            new_etag = subir_roster(df, etag)
+        except StorageConflictError:
+            upload_stats["conflicts"] += 1
+            # Solo se descarta si el cache sigue en el ETag rechazado (edición
+            # ajena); si ya avanzó, el reintento parte del roster actual
+            if roster_cache.invalidate(etag):
+                upload_stats["reloads"] += 1
+            if attempt == UPLOAD_MAX_RETRIES:
+                break
+            upload_stats["retries"] += 1
+            delay = UPLOAD_RETRY_BASE * (2 ** attempt) * (0.5 + random.random())
+            log.warning(f"🔁 Conflicto al subir (412), reintento {attempt + 1}/{UPLOAD_MAX_RETRIES} en {delay:.2f}s")
+            time.sleep(delay)
+            continue
+        upload_stats["uploads"] += 1
+        with roster_cache.lock:
+            # Entregas encoladas mientras se subía
+            apply_pendientes(df, index)
+            roster_cache.set(df, new_etag, index)
+        roster_snapshot.save(snapshot_file, df, new_etag)
+        return [(error, None if error is not None else (df, resultado)) for error, resultado in salidas]
+    upload_stats["failures"] += 1
+    raise RuntimeError(f"El Excel cambió durante {UPLOAD_MAX_RETRIES + 1} intentos de subida")
+
+# Las entregas que llegan durante una subida viajan juntas en la siguiente
+roster_commits = GroupCommit(subir_lote)
+
+def commit_roster(mutate):
+    """Aplica `mutate(df, índice)` en la próxima subida del roster. Devuelve (df, resultado)."""
+    return roster_commits.submit(mutate)
+
+def get_upload_stats() -> dict:
+    attempts = upload_stats["attempts"]
+    return {
+        **upload_stats,
+        "conflict_rate": round(upload_stats["conflicts"] / attempts, 3) if attempts else 0.0,
+        "group_commit": roster_commits.stats(),
+    }
+
+# ---------------------------
+# Journal de Entregas (write-behind)
+# ---------------------------
+def flush_entregas(entries: list):
+    """Aplica un lote de entregas del journal y sube el Excel una sola vez."""
+    def aplicar_lote(df, index):
+        for entry in entries:
+            try:
+                if apply_entrega(df, entry, index=index) is None:
+                    log.warning("⚠️ [Journal] Entrega sin fila, se descarta", extra={"ctx": {"folio": entry.get('folio'), "rut": entry.get('rut')}})
+            except DuplicateKeyError as e:
+                log.warning(f"⚠️ [Journal] Entrega ambigua, se descarta: {e}")
+
+    commit_roster(aplicar_lote)
+
+delivery_journal = DeliveryJournal(
+    os.devnull if SPAWN_WORKER else JOURNAL_PATH,
+    apply_batch=flush_entregas,
+    flush_interval=JOURNAL_FLUSH_SECONDS,
+    max_batch=JOURNAL_FLUSH_MAX,
+)
+
+# ---------------------------
+# Roster en SQLite (ROSTER_STORE=sqlite)
+# ---------------------------
+roster_db = RosterDB(SQLITE_PATH) if ROSTER_STORE == "sqlite" and not SPAWN_WORKER else None
+roster_db_sync = {"checked": 0.0}
+roster_db_sync_lock = threading.Lock()
+roster_db_export_lock = threading.Lock()
+
+def sincronizar_db(forzar: bool = False):
+    """Importa el Excel a SQLite si cambió fuera del backend.
+
+    El ETag del blob se consulta a lo sumo cada ROSTER_CACHE_TTL segundos. Si
+    el almacenamiento no responde y la base ya tiene datos, se sigue sirviendo
+    desde la base. Comparte el lock con la subida de exportar_db: entre la
+    subida y marcar_exportado el ETag nuevo del blob todavía no es el de la
+    base, y se tomaría el cambio propio por uno externo.
+    """
+    if not forzar and time.monotonic() - roster_db_sync["checked"] < ROSTER_CACHE_TTL:
+        return
+    with roster_db_sync_lock:
+        if not forzar and time.monotonic() - roster_db_sync["checked"] < ROSTER_CACHE_TTL:
+            return
+        try:
+            etag = roster_etag()
+        except Exception as e:
+            if roster_db.vacia():
+                raise
+            log.warning(f"⚠️ [SQLite] No se pudo validar el Excel, se sirve la base local: {e}")
+            return
+        roster_db_sync["checked"] = time.monotonic()
+        if etag == roster_db.source_etag():
+            return
+        df, etag = load_roster()
+        primera = roster_db.vacia()
+        roster_db.importar(df, etag)
+        roster_versions.reset()
+        if not primera:
+            # Cambio externo: los clientes deben volver a pedir el roster
+            live_events.publish("recarga", {"total_registros": len(df), "version": roster_versions.current()})
+
+def iniciar_roster_db():
+    # Entregas que quedaron en el journal del modo write-behind van primero al Excel
+    if delivery_journal.depth():
+        delivery_journal.flush()
     try:
-        print(f"📥 Descargando {AUTH_BLOB_NAME}...")
-        data = download_excel_bytes(blob_client_auth)
-        excel_data = io.BytesIO(data)
-        source = "Azure"
+        sincronizar_db(forzar=True)
     except Exception as e:
-        print(f"   ⚠️ Azure falló ({e}). Buscando local...")
-        
-        # 2. Intentar Local
-        if os.path.exists(os.path.join(app_path, LOCAL_AUTH_FILE)):
+        log.error(f"❌ [SQLite] Importación inicial fallida: {e}")
+
+def exportar_db() -> int:
+    """Sube el Excel regenerado desde SQLite si hay entregas sin exportar.
+
+    Con If-Match sobre el ETag importado: si el Excel se editó afuera, se
+    reimporta (re-aplicando las entregas) y se reintenta. Devuelve cuántas
+    entregas quedaron incluidas.
+    """
+    with roster_db_export_lock:
+        for attempt in range(UPLOAD_MAX_RETRIES + 1):
+            if not roster_db.pendientes():
+                return 0
+            df, hasta = roster_db.exportar()
+            upload_stats["attempts"] += 1
             try:
-                with open(os.path.join(app_path, LOCAL_AUTH_FILE), "rb") as f:
-                    excel_data = io.BytesIO(f.read())
-                source = "Local"
-            except: pass
+                # Subida y ETag nuevo en la base sin que sincronizar_db vea el medio
+                with roster_db_sync_lock:
+                    new_etag = subir_roster(df, roster_db.source_etag())
+                    n = roster_db.marcar_exportado(new_etag, hasta)
+            except StorageConflictError:
+                upload_stats["conflicts"] += 1
+                if attempt == UPLOAD_MAX_RETRIES:
+                    break
+                upload_stats["retries"] += 1
+                log.warning(f"🔁 [SQLite] El Excel cambió afuera, se reimporta ({attempt + 1}/{UPLOAD_MAX_RETRIES})")
+                sincronizar_db(forzar=True)
+                continue
+            upload_stats["uploads"] += 1
+            roster_snapshot.save(snapshot_file, normalizar_roster(df), new_etag)
+            return n
+    upload_stats["failures"] += 1
+    raise RuntimeError(f"El Excel cambió durante {UPLOAD_MAX_RETRIES + 1} intentos de exportación")
+
+db_exporter = ExportScheduler(exportar_db, interval=SQLITE_EXPORT_SECONDS)
+
+roster_search_db = {"imports": None}
+roster_search_db_lock = threading.Lock()
+
+def sincronizar_busqueda_db():
+    """Reconstruye el índice de /alumnos/search si la base se (re)importó desde la última vez."""
+    with roster_search_db_lock:
+        if roster_search.rebuilds and roster_search_db["imports"] == roster_db.imports:
+            return
+        imports = roster_db.imports
+        df, _ = roster_db.exportar()
+        # Las filas de SQLite son las posiciones del DataFrame exportado
+        roster_search.rebuild(df)
+        roster_search_db["imports"] = imports
+
+def publicar_cambios_db(cambios: list):
+    """Eventos SSE de entregas registradas en SQLite: (fila, antes, después, fila actualizada)."""
+    cambios = [c for c in cambios if c[1] != c[2]]
+    if not cambios:
+        return
+    stats = roster_db.dashboard(hoy_chile())
+    for fila, antes, despues, updated in cambios:
+        roster_search.update(fila, {'EntregadoStatus': despues[0]})
+        publicar_entrega(fila, updated.get('Folio'), updated.get('RUT'), despues, delta_fila(antes, despues), stats)
+
+# ---------------------------
+# Lógica de Autenticación
+# ---------------------------
+def leer_roles(excel_data, source: str) -> Roles:
+    xls = pd.ExcelFile(excel_data)
+    log.debug(f"📄 Hojas encontradas ({source}): {xls.sheet_names}")
+
+    # Función genérica para buscar correos en una hoja
+    def get_emails_from_sheet(sheet_name):
+        # Buscar nombre de hoja flexible (ignorando mayúsculas)
+        real_name = next((s for s in xls.sheet_names if sheet_name.lower() in s.lower()), None)
+        if not real_name: return []
+        
+        df = pd.read_excel(xls, real_name, dtype=str)
+        # Buscar columna CORREO o EMAIL
+        col = next((c for c in df.columns if 'CORREO' in str(c).upper() or 'EMAIL' in str(c).upper()), None)
+        
+        if col:
+            return df[col].dropna().astype(str).str.strip().str.lower().tolist()
+        return []
+
+    admins = get_emails_from_sheet('Admins')
+    tutores = get_emails_from_sheet('Tutores')
     
-    if excel_data:
-        try:
-            xls = pd.ExcelFile(excel_data)
-            print(f"   📄 Hojas encontradas ({source}): {xls.sheet_names}")
-
-            # Función genérica para buscar correos en una hoja
-            def get_emails_from_sheet(sheet_name):
-                # Buscar nombre de hoja flexible (ignorando mayúsculas)
-                real_name = next((s for s in xls.sheet_names if sheet_name.lower() in s.lower()), None)
-                if not real_name: return []
-                
-                df = pd.read_excel(xls, real_name, dtype=str)
-                # Buscar columna CORREO o EMAIL
-                col = next((c for c in df.columns if 'CORREO' in str(c).upper() or 'EMAIL' in str(c).upper()), None)
-                
-                if col:
-                    return df[col].astype(str).str.strip().str.lower().dropna().tolist()
-                return []
-
-            admins = get_emails_from_sheet('Admins')
-            tutores = get_emails_from_sheet('Tutores')
-            
-            # Si no encuentra la hoja "Tutores", usa la primera hoja disponible por defecto
-            if not tutores and not admins and len(xls.sheet_names) > 0:
-                print("   ⚠️ No se encontraron hojas 'Admins'/'Tutores'. Usando primera hoja como Tutores.")
-                tutores = get_emails_from_sheet(xls.sheet_names[0])
-
-            print(f"   📊 Roles cargados: {len(admins)} Admins, {len(tutores)} Tutores")
-            
-        except Exception as e:
-            print(f"   ❌ Error procesando Excel: {e}")
+    # Si no encuentra la hoja "Tutores", usa la primera hoja disponible por defecto
+    if not tutores and not admins and len(xls.sheet_names) > 0:
+        log.warning("⚠️ No se encontraron hojas 'Admins'/'Tutores'. Usando primera hoja como Tutores.")
+        tutores = get_emails_from_sheet(xls.sheet_names[0])
+
+    return Roles(admins, tutores)
+
+def load_roles():
+    log.info(f"📥 Descargando {AUTH_BLOB_NAME}...")
+    with metrics.span("roles"):
+        data, etag = download_excel_with_etag(auth_file)
+        return leer_roles(io.BytesIO(data), "Azure"), etag
+
+def load_roles_local():
+    path = os.path.join(app_path, LOCAL_AUTH_FILE)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            return leer_roles(io.BytesIO(f.read()), "Local")
+    except Exception as e:
+        log.error(f"❌ Error procesando Excel local: {e}")
+        return None
 
-    return admins, tutores
+role_cache = RoleCache(
+    loader=load_roles,
+    etag_getter=lambda: get_blob_etag(auth_file),
+    fallback=load_roles_local,
+    ttl=ROLES_CACHE_TTL,
+)
+
+# ---------------------------
+# Precarga al arrancar
+# ---------------------------
+def precargar_roster_db():
+    iniciar_roster_db()
+    db_exporter.start()
+    if roster_db.vacia():
+        raise RuntimeError("No se pudo importar el Excel a SQLite")
+    sincronizar_busqueda_db()
+
+async def precargar_roster():
+    if roster_db:
+        await run_in_threadpool(precargar_roster_db)
+    else:
+        await roster_actual()
+
+def precargar_roles():
+    role_cache.get()
+    if role_cache.source is None:
+        raise RuntimeError(role_cache.last_error or "usuarios.xlsx no disponible")
+
+warmup = Warmup({"roster": precargar_roster, "roles": precargar_roles}, enabled=WARMUP)
 
 # ---------------------------
 # ENDPOINTS
@@ -218,137 +766,516 @@ def get_roles():
 @app.post("/login")
 def login(request: LoginRequest):
     email_input = request.email.strip().lower()
-    print(f"🔑 Login: {email_input}")
-    
-    admins, tutores = get_roles()
+    log.debug(f"🔑 Login: {email_input}")
     
-    # Verificar Admin
-    if email_input in admins:
-        print("   ✅ ADMIN")
-        return {"status": "ok", "role": "admin"}
-    
-    # Verificar Tutor
-    if email_input in tutores:
-        print("   ✅ TUTOR")
-        return {"status": "ok", "role": "tutor"}
-    
-    # Verificar si está en la lista combinada (fallback)
-    if email_input in admins + tutores:
-        print("   ✅ (Fallback) TUTOR")
-        return {"status": "ok", "role": "tutor"}
+    role = role_cache.role(email_input)
+    if role:
+        log.debug("✅ Login", extra={"ctx": {"email": email_input, "role": role}})
+        return {"status": "ok", "role": role}
 
-    print("   ⛔ Denegado")
+    log.debug("⛔ Login denegado", extra={"ctx": {"email": email_input}})
     raise HTTPException(status_code=401, detail="Correo no autorizado.")
 
+ALUMNOS_MAX_LIMIT = 5000
+
+def columnas_pedidas(fields, disponibles: list) -> list:
+    """Columnas de `fields` (separadas por coma) o todas; 400 si alguna no existe."""
+    if not fields:
+        return disponibles
+    columns = [c.strip() for c in fields.split(",") if c.strip()]
+    unknown = [c for c in columns if c not in disponibles]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Columnas desconocidas: {unknown}")
+    return columns
+
+def filtrar_alumnos(df: pd.DataFrame, estado=None, responsable=None, q=None, campus=None) -> pd.DataFrame:
+    mask = pd.Series(True, index=df.index)
+    if campus:
+        mask &= df[CAMPUS_COLUMN].astype(str).str.upper() == campus.strip().upper()
+    if estado:
+        mask &= df['EntregadoStatus'].astype(str).str.upper().str.startswith(estado.strip().upper())
+    if responsable:
+        mask &= df['Responsable'].astype(str).str.strip().str.upper() == responsable.strip().upper()
+    if q:
+        term = q.strip().lower()
+        rut_term = term.replace(".", "").replace(" ", "")
+        mask &= (
+            df['NOMBRE COMPLETO'].astype(str).str.lower().str.contains(term, regex=False)
+            | df['Folio'].astype(str).str.lower().str.contains(term, regex=False)
+            | df['RUT'].astype(str).str.replace(".", "", regex=False).str.lower().str.contains(rut_term, regex=False)
+        )
+    return df[mask]
+
+def armar_alumnos(df: pd.DataFrame, version: int, offset=0, limit=None, estado=None, responsable=None, q=None, fields=None, since=None, campus=None) -> dict:
+    full = True
+    if since is not None:
+        full, changed = roster_versions.changed_since(since)
+        if not full:
+            df = df.loc[[label for label in changed if label in df.index]]
+
+    columns = columnas_pedidas(fields, list(df.columns))
+    df = filtrar_alumnos(df, estado=estado, responsable=responsable, q=q, campus=campus)
+    total = len(df)
+    page = df.iloc[offset: offset + limit if limit else None]
+    next_offset = offset + len(page) if offset + len(page) < total else None
+    return {
+        "count": len(page),
+        "total": total,
+        "offset": offset,
+        "next_offset": next_offset,
+        "version": version,
+        "full": full,
+        "rows": page[columns].fillna("").to_dict(orient="records"),
+    }
+
+def armar_alumnos_db(version: int, offset=0, limit=None, estado=None, responsable=None, q=None, fields=None, since=None, campus=None) -> dict:
+    """Como `armar_alumnos`, con la página y el total consultados en SQLite."""
+    full, filas = True, None
+    if since is not None:
+        full, changed = roster_versions.changed_since(since)
+        if not full:
+            filas = changed
+
+    columns = columnas_pedidas(fields, roster_db.columnas()) if fields else None
+    rows, total = roster_db.consultar(
+        offset=offset, limit=limit, estado=estado, responsable=responsable, q=q, fields=columns, filas=filas,
+        campus=campus,
+    )
+    next_offset = offset + len(rows) if offset + len(rows) < total else None
+    return {
+        "count": len(rows),
+        "total": total,
+        "offset": offset,
+        "next_offset": next_offset,
+        "version": version,
+        "full": full,
+        "rows": rows,
+    }
+
 @app.get("/alumnos")
-def get_alumnos():
+async def get_alumnos(
+    offset: int = 0,
+    limit: int | None = None,
+    estado: str | None = None,
+    responsable: str | None = None,
+    q: str | None = None,
+    fields: str | None = None,
+    since: int | None = None,
+    campus: str | None = None,
+):
+    """Roster paginado y filtrado. Sin parámetros devuelve todas las filas.
+
+    `fields` proyecta columnas (separadas por coma), `since` devuelve solo
+    las filas cambiadas después de esa versión (`full=true` si hay que
+    resincronizar todo) y `campus` filtra por sede (con ROSTER_SOURCES).
+    """
+    if offset < 0 or (limit is not None and not 0 < limit <= ALUMNOS_MAX_LIMIT):
+        raise HTTPException(status_code=400, detail=f"offset >= 0 y 0 < limit <= {ALUMNOS_MAX_LIMIT}")
+    if campus and not roster_set:
+        raise HTTPException(status_code=400, detail="Filtro por sede sin ROSTER_SOURCES configurado")
     try:
-        df = read_excel_from_bytes(download_excel_bytes(blob_client_data))
-        return {"count": len(df), "rows": df.fillna("").to_dict(orient="records")}
+        if roster_db:
+            await run_in_threadpool(sincronizar_db)
+            # Tras la (re)importación, que reinicia las versiones; antes de la
+            # consulta: un cambio concurrente se re-envía en el próximo ?since=
+            version = roster_versions.current()
+            return await run_cpu(
+                armar_alumnos_db, version,
+                offset=offset, limit=limit, estado=estado, responsable=responsable, q=q, fields=fields, since=since,
+                campus=campus,
+            )
+        if azure_aio.enabled:
+            # La descarga, si hace falta, se espera en el event loop
+            await roster_actual()
+        df, version = await run_in_threadpool(roster_con_version)
+        return await run_cpu(
+            armar_alumnos, df, version,
+            offset=offset, limit=limit, estado=estado, responsable=responsable, q=q, fields=fields, since=since,
+            campus=campus,
+        )
+    except HTTPException: raise
     except Exception as e:
-        print(f"Error Azure: {e}")
+        log.exception(f"Error Azure: {e}")
         raise HTTPException(status_code=500, detail=f"Error cargando datos: {e}")
 
+SEARCH_MAX_LIMIT = 50
+
+def armar_busqueda(q, limit, estado=None, campus=None, fields=None) -> dict:
+    """Resultados de `roster_search` con las filas actuales del roster (DataFrame o SQLite)."""
+    if roster_db:
+        columns = columnas_pedidas(fields, roster_db.columnas())
+        resultados = roster_search.search(q, limit, estado=estado, campus=campus)
+        rows = [{c: fila[c] for c in columns} for fila in (roster_db.fila(label) for label, _, _ in resultados)]
+    else:
+        # Bajo el lock del cache: el índice corresponde a este DataFrame
+        with roster_cache.lock:
+            df = roster_cache.get()
+            columns = columnas_pedidas(fields, list(df.columns))
+            resultados = roster_search.search(q, limit, estado=estado, campus=campus)
+            rows = df.loc[[label for label, _, _ in resultados], columns].fillna("").to_dict(orient="records")
+    for row, (_, campo, puntaje) in zip(rows, resultados):
+        row["_match"] = campo
+        row["_score"] = puntaje
+    return {"q": q, "count": len(rows), "rows": rows}
+
+@app.get("/alumnos/search")
+async def search_alumnos(
+    q: str,
+    limit: int = 10,
+    estado: str | None = None,
+    campus: str | None = None,
+    fields: str | None = None,
+):
+    """Búsqueda para el mesón: prefijo de RUT (con o sin puntos/DV) o Folio, o
+    palabras del nombre sin importar tildes ni errores de tipeo menores.
+
+    Devuelve las `limit` mejores filas con `_match` (folio, rut o nombre) y
+    `_score` (1 = exacto); a igual puntaje, primero las pendientes.
+    """
+    if not 0 < limit <= SEARCH_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"0 < limit <= {SEARCH_MAX_LIMIT}")
+    if campus and not roster_set:
+        raise HTTPException(status_code=400, detail="Filtro por sede sin ROSTER_SOURCES configurado")
+    try:
+        if roster_db:
+            await run_in_threadpool(sincronizar_db)
+            await run_in_threadpool(sincronizar_busqueda_db)
+        else:
+            await roster_actual()
+        return await run_cpu(armar_busqueda, q, limit, estado=estado, campus=campus, fields=fields)
+    except HTTPException: raise
+    except Exception as e:
+        log.exception(f"Error búsqueda: {e}")
+        raise HTTPException(status_code=500, detail=f"Error buscando alumnos: {e}")
+
 @app.post("/entregar")
 def post_entregar(payload: EntregaRequest):
     if not (payload.folio or payload.rut):
         raise HTTPException(status_code=400, detail="Falta datos")
+    entry = {
+        "folio": payload.folio,
+        "rut": payload.rut,
+        "responsable": payload.responsable,
+        "fecha": fecha_chile(),
+    }
     try:
-        df = read_excel_from_bytes(download_excel_bytes(blob_client_data))
-        idx = find_row_index(df, folio=payload.folio, rut=payload.rut)
-        if idx is None:
-            raise HTTPException(status_code=404, detail="No encontrado")
+        if roster_db:
+            # Un UPDATE por índice en SQLite; el Excel se regenera después
+            sincronizar_db()
+            cambio = roster_db.entregar(entry)
+            if cambio is None:
+                raise HTTPException(status_code=404, detail="No encontrado")
+            publicar_cambios_db([cambio])
+            return {"status": "ok", "updated": cambio[3], "pendiente": True}
+
+        if ENTREGAS_WRITE_BEHIND:
+            # Se anota en el journal y se responde de inmediato; el hilo de
+            # fondo sube el Excel en lotes
+            def registrar(df, index):
+                idx = find_row_index(df, folio=payload.folio, rut=payload.rut, index=index)
+                if idx is None:
+                    return None
+                delivery_journal.append(entry)
+                apply_entrega(df, entry, idx, on_change=registrar_cambio)
+                return df.loc[idx].fillna("").to_dict()
+
+            updated = roster_cache.mutate(registrar)
+            if updated is None:
+                raise HTTPException(status_code=404, detail="No encontrado")
+            return {"status": "ok", "updated": updated, "pendiente": True}
 
-        chile_tz = pytz.timezone('America/Santiago')
-        fecha_entrega_chile = datetime.now(chile_tz).strftime("%Y-%m-%d %H:%M:%S")
+        cambios = []
 
-        df.at[idx, 'EntregadoStatus'] = 'ENTREGADA'
-        df.at[idx, 'Responsable'] = payload.responsable or df.at[idx, 'Responsable']
-        df.at[idx, 'FechaEntrega'] = fecha_entrega_chile
+        def aplicar(df, index):
+            cambios.clear()
+            idx = apply_entrega(df, entry, index=index, on_change=lambda *c: cambios.append(c))
+            if idx is None:
+                raise HTTPException(status_code=404, detail="No encontrado")
+            return idx
 
-        upload_excel_bytes(blob_client_data, df_to_excel_bytes(df))
+        df, idx = commit_roster(aplicar)
+        # El cambio es visible recién cuando la copia reemplaza al cache
+        for cambio in cambios:
+            registrar_cambio(*cambio)
         return {"status": "ok", "updated": df.loc[idx].fillna("").to_dict()}
+    except DuplicateKeyError as e:
+        raise HTTPException(status_code=409, detail=f"{e}: filas {e.rows}")
     except HTTPException: raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error entrega: {e}")
 
-@app.get("/dashboard/stats")
-def get_dashboard_stats():
+def resolver_lote(df: pd.DataFrame, index: RosterIndex, entries: list):
+    """Clasifica cada entrega del lote sin modificar el roster.
+
+    Devuelve (resultados, a_aplicar). Estados: 'entregada' (se aplicará),
+    'ya_entregada', 'no_encontrado', 'ambiguo' e 'invalido'. Una misma fila
+    repetida en el lote cuenta como entregada solo la primera vez.
+    """
+    resultados = []
+    a_aplicar = []
+    vistas = set()
+    for i, entry in enumerate(entries):
+        resultado = {"i": i, "folio": entry["folio"], "rut": entry["rut"]}
+        resultados.append(resultado)
+        if not (entry["folio"] or entry["rut"]):
+            resultado["status"] = "invalido"
+            continue
+        try:
+            idx = find_row_index(df, folio=entry["folio"], rut=entry["rut"], index=index)
+        except DuplicateKeyError as e:
+            resultado.update(status="ambiguo", detail=f"{e}: filas {e.rows}")
+            continue
+        if idx is None:
+            resultado["status"] = "no_encontrado"
+        elif idx in vistas or df.at[idx, 'EntregadoStatus'] == ENTREGADA:
+            resultado.update(status="ya_entregada", updated=df.loc[idx].fillna("").to_dict())
+        else:
+            vistas.add(idx)
+            resultado["status"] = "entregada"
+            a_aplicar.append((idx, entry, resultado))
+    return resultados, a_aplicar
+
+def resumen_lote(resultados: list) -> dict:
+    resumen = {}
+    for r in resultados:
+        resumen[r["status"]] = resumen.get(r["status"], 0) + 1
+    return resumen
+
+@app.post("/entregar/batch")
+def post_entregar_batch(payload: EntregaBatchRequest):
+    """Registra muchas entregas (p. ej. escaneos acumulados sin conexión) en un solo ciclo."""
+    if not payload.entregas:
+        raise HTTPException(status_code=400, detail="Lote vacío")
+    if len(payload.entregas) > ENTREGAS_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"Máximo {ENTREGAS_BATCH_MAX} entregas por lote")
+    fecha = fecha_chile()
+    entries = [
+        {"folio": e.folio, "rut": e.rut, "responsable": e.responsable, "fecha": fecha}
+        for e in payload.entregas
+    ]
     try:
-        df = read_excel_from_bytes(download_excel_bytes(blob_client_data))
-        
-        total_registros = len(df)
-        entregados = df[df['EntregadoStatus'] == 'ENTREGADA'].shape[0]
-        pendientes = total_registros - entregados
+        if roster_db:
+            sincronizar_db()
+            resultados, cambios = roster_db.entregar_lote(entries)
+            publicar_cambios_db(cambios)
+            return {"status": "ok", "resumen": resumen_lote(resultados), "resultados": resultados, "pendiente": True}
 
-        chile_tz = pytz.timezone('America/Santiago')
-        hoy_fecha = datetime.now(chile_tz).date()
-        
-        entregados_hoy = 0
-        historial_entregas = []
-        ranking_responsables = []
-
-        if 'Responsable' in df.columns and 'EntregadoStatus' in df.columns:
-            df_entregadas = df[df['EntregadoStatus'] == 'ENTREGADA'].copy()
-            df_entregadas['Responsable'] = df_entregadas['Responsable'].astype(str).str.upper().str.strip()
-            df_entregadas = df_entregadas[~df_entregadas['Responsable'].isin(['NAN', 'NONE', '', 'BLANK'])]
-            conteo_resp = df_entregadas['Responsable'].value_counts().head(5)
-            ranking_responsables = [{"nombre": str(n), "cantidad": int(c)} for n, c in conteo_resp.items()]
-
-        if 'FechaEntrega' in df.columns:
-            df['FechaEntrega'] = df['FechaEntrega'].astype(str).str.strip()
-            df.loc[df['FechaEntrega'].str.lower().isin(['nan', 'nat', 'none', '']), 'FechaEntrega'] = None
-            fechas_dt = pd.to_datetime(df['FechaEntrega'], errors='coerce', dayfirst=True)
-            entregados_hoy = df[fechas_dt.dt.date == hoy_fecha].shape[0]
-
-            fechas_validas = fechas_dt.dropna()
-            fecha_limite = hoy_fecha - timedelta(days=30)
-            fechas_ultimo_mes = fechas_validas[fechas_validas.dt.date >= fecha_limite]
-            
-            conteo_diario = fechas_ultimo_mes.dt.date.value_counts().sort_index()
-            historial_entregas = [{"fecha": str(f), "cantidad": int(c)} for f, c in conteo_diario.items()]
-
-        return {
-            "status": "ok",
-            "total_registros": total_registros,
-            "entregados_total": entregados,
-            "pendientes_total": pendientes,
-            "entregados_hoy": entregados_hoy,
-            "porcentaje_entregado": round((entregados / total_registros * 100), 1) if total_registros > 0 else 0,
-            "historial": historial_entregas,
-            "ranking": ranking_responsables
-        }
+        if ENTREGAS_WRITE_BEHIND:
+            def registrar_lote(df, index):
+                resultados, a_aplicar = resolver_lote(df, index, entries)
+                # Un solo fsync del journal para todo el lote
+                delivery_journal.append_many([entry for _, entry, _ in a_aplicar])
+                for idx, entry, resultado in a_aplicar:
+                    apply_entrega(df, entry, idx, on_change=registrar_cambio)
+                    resultado["updated"] = df.loc[idx].fillna("").to_dict()
+                return resultados
+
+            resultados = roster_cache.mutate(registrar_lote)
+            return {"status": "ok", "resumen": resumen_lote(resultados), "resultados": resultados, "pendiente": True}
+
+        resultados, a_aplicar = roster_cache.mutate(lambda df, index: resolver_lote(df, index, entries))
+        if not a_aplicar:
+            # Nada nuevo: no hace falta subir el Excel
+            return {"status": "ok", "resumen": resumen_lote(resultados), "resultados": resultados}
+
+        cambios = []
+
+        def aplicar_lote(df, index):
+            cambios.clear()
+            resultados, a_aplicar = resolver_lote(df, index, entries)
+            for idx, entry, _ in a_aplicar:
+                apply_entrega(df, entry, idx, on_change=lambda *c: cambios.append(c))
+            return resultados, a_aplicar
+
+        df, (resultados, a_aplicar) = commit_roster(aplicar_lote)
+        for cambio in cambios:
+            registrar_cambio(*cambio)
+        for idx, _, resultado in a_aplicar:
+            resultado["updated"] = df.loc[idx].fillna("").to_dict()
+        return {"status": "ok", "resumen": resumen_lote(resultados), "resultados": resultados}
+    except HTTPException: raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error entrega: {e}")
+
+@app.get("/entregar/cola")
+def get_entregas_cola():
+    return {
+        "status": "ok",
+        "write_behind": ENTREGAS_WRITE_BEHIND,
+        "journal": delivery_journal.stats(),
+        "sqlite": {"pendientes": roster_db.pendientes(), "export": db_exporter.stats()} if roster_db else None,
+        "uploads": get_upload_stats(),
+    }
+
+@app.get("/dashboard/stats")
+async def get_dashboard_stats():
+    try:
+        if roster_db:
+            await run_in_threadpool(sincronizar_db)
+            return {"status": "ok", **(await run_in_threadpool(roster_db.dashboard, hoy_chile()))}
+        # Valida el ETag; si el Excel cambió afuera, la recarga reconstruye los agregados
+        await roster_actual()
+        return {"status": "ok", **dashboard_stats.snapshot(hoy_chile())}
 
     except Exception as e:
-        print(f"Error Dashboard: {e}")
+        log.exception(f"Error Dashboard: {e}")
         raise HTTPException(status_code=500, detail=f"Error stats: {e}")
 
+@app.get("/eventos")
+async def get_eventos(request: Request):
+    """Stream SSE con cambios de filas ('entrega') y recargas del Excel ('recarga')."""
+    return StreamingResponse(
+        live_events.stream(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/cache/stats")
+def get_cache_stats():
+    return {
+        "status": "ok",
+        "roster": roster_cache.stats(),
+        "snapshot": roster_snapshot.stats(),
+        "dashboard": dashboard_stats.stats(),
+        "eventos": live_events.stats(),
+        "roles": role_cache.stats(),
+        "azure_aio": azure_aio.stats(),
+        "sqlite": roster_db.stats() if roster_db else None,
+        "sedes": roster_set.stats() if roster_set else None,
+        "busqueda": roster_search.stats(),
+    }
+
+@app.get("/ready")
+async def get_ready():
+    """200 con roster y roles precargados; 503 mientras se cargan o si la precarga falló."""
+    if not warmup.ready:
+        # Sin red al abrir la app: lo que falló se reintenta en las consultas siguientes
+        warmup.reintentar()
+    status = "ok" if warmup.ready else "cargando" if warmup.running else "error"
+    body = {"status": status, "import_seconds": IMPORT_SECONDS, **warmup.stats()}
+    if warmup.ready:
+        return body
+    return JSONResponse(body, status_code=503, headers={"Retry-After": "1"})
+
+def _ratio(stats: dict):
+    total = stats.get("hits", 0) + stats.get("misses", 0)
+    return stats["hits"] / total if total else None
+
+metrics.gauge("cache_hit_ratio", "Aciertos / consultas de cada cache", lambda: [
+    ({"cache": "roster"}, roster_cache.stats()["hit_ratio"]),
+    ({"cache": "snapshot"}, _ratio(roster_snapshot.stats())),
+    ({"cache": "roles"}, _ratio({"hits": role_cache.hits, "misses": role_cache.loads})),
+])
+metrics.gauge("roster_rows", "Filas del roster en memoria", lambda: [({}, roster_cache.stats()["rows"])])
+metrics.gauge("journal_queue_depth", "Entregas anotadas aún no subidas", lambda: [
+    ({}, roster_db.pendientes() if roster_db else delivery_journal.depth()),
+])
+metrics.gauge("startup_seconds", "Duración del arranque: import de main y precarga", lambda: [
+    ({"fase": "import"}, IMPORT_SECONDS),
+    ({"fase": "warmup"}, warmup.stats()["segundos"] if warmup.finished_at else None),
+])
+metrics.gauge("sse_subscribers", "Clientes conectados a /eventos", lambda: [({}, live_events.stats()["subscribers"])])
+
+@app.get("/metrics")
+def get_metrics():
+    """Métricas en formato de exposición de Prometheus."""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # --- NUEVO ENDPOINT PARA DESCARGA ---
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+async def abrir_descarga(start: int, length: int, etag):
+    """Descarga fijada al ETag leído; devuelve el iterador de chunks."""
+    if azure_aio.enabled:
+        from azure.core import MatchConditions
+        downloader = await azure_aio.blob(EXCEL_BLOB_NAME).download_blob(
+            offset=start, length=length, etag=etag, match_condition=MatchConditions.IfNotModified,
+        )
+        return downloader.chunks()
+    return await run_in_threadpool(roster_file.stream, start, length, etag)
+
+async def descargar_consolidado(request: Request):
+    """Con varias sedes no hay un único blob: se arma un libro con todas (columna Campus).
+
+    El llamador ya subió el journal, así el ETag del roster cubre las entregas
+    confirmadas. El libro se genera en cada pedido: no se atiende Range y se
+    responde completo con `Accept-Ranges: none`.
+    """
+    if roster_db:
+        await run_in_threadpool(exportar_db)
+        df, _ = await run_in_threadpool(roster_db.exportar)
+        etag = roster_db.source_etag()
+    else:
+        df, etag, _ = await run_in_threadpool(roster_cache.snapshot, True)
+    headers = {"ETag": etag, "Accept-Ranges": "none", "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    data = await run_cpu(df_to_excel_bytes, df)
+    headers["Content-Disposition"] = "attachment; filename=Reporte_TNE_Completo.xlsx"
+    return Response(data, media_type=XLSX_MEDIA_TYPE, headers=headers)
+
 @app.get("/download-excel")
-def download_excel_endpoint():
-    """Descarga el archivo Excel actual directamente desde Azure."""
+async def download_excel_endpoint(request: Request):
+    """Descarga el Excel actual desde el almacenamiento, reenviando los chunks a medida que llegan.
+
+    Soporta If-None-Match (304 si no cambió) y Range de un solo tramo (206).
+    Primero se suben las entregas pendientes del journal (o, con
+    ROSTER_STORE=sqlite, se exportan): el ETag y el archivo las incluyen.
+    """
     try:
-        # 1. Descargar bytes desde Azure
-        excel_bytes = download_excel_bytes(blob_client_data)
-        
-        # 2. Convertir a stream para que FastAPI lo envíe
-        data_stream = io.BytesIO(excel_bytes)
-        
-        # 3. Retornar como archivo adjunto
-        return StreamingResponse(
-            data_stream,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=Reporte_TNE_Completo.xlsx"}
-        )
+        if ENTREGAS_WRITE_BEHIND and not roster_db and delivery_journal.depth():
+            await run_in_threadpool(delivery_journal.flush)
+        if roster_set:
+            return await descargar_consolidado(request)
+        if roster_db:
+            await run_in_threadpool(exportar_db)
+        if azure_aio.enabled:
+            props = await azure_aio.blob(EXCEL_BLOB_NAME).get_blob_properties()
+        else:
+            props = await run_in_threadpool(roster_file.stat)
+        etag = props.etag
+        size = props.size
+        quoted = etag if str(etag).startswith('"') else f'"{etag}"'
+        headers = {
+            "ETag": quoted,
+            "Accept-Ranges": "bytes",
+            "Cache-Control": "no-cache",
+            "Content-Disposition": "attachment; filename=Reporte_TNE_Completo.xlsx",
+        }
+
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"ETag": quoted, "Cache-Control": "no-cache"})
+
+        try:
+            rango = parse_range(request.headers.get("range"), size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+
+        status_code = 200
+        start, length = 0, size
+        if rango is not None:
+            start, length = rango
+            status_code = 206
+            headers["Content-Range"] = f"bytes {start}-{start + length - 1}/{size}"
+        headers["Content-Length"] = str(length)
+
+        if length == 0:
+            return Response(status_code=status_code, headers=headers, media_type=XLSX_MEDIA_TYPE)
+        chunks = await abrir_descarga(start, length, etag)
+        metrics.inc("blob_bytes_total", length, blob=os.path.basename(EXCEL_BLOB_NAME), direction="download")
+        return StreamingResponse(chunks, status_code=status_code, media_type=XLSX_MEDIA_TYPE, headers=headers)
     except Exception as e:
-        print(f"Error descarga: {e}")
+        log.exception(f"Error descarga: {e}")
         raise HTTPException(status_code=500, detail=f"No se pudo descargar el archivo: {e}")
 
+IMPORT_SECONDS = round(time.perf_counter() - _T_IMPORT, 3)
+if not SPAWN_WORKER:
+    log.info(f"⏱️ Backend importado en {IMPORT_SECONDS}s")
+
 # ---------------------------
 # Ejecución Principal
 # ---------------------------
 if __name__ == "__main__":
-    port = int(os.getenv("PORT", 8000))
-    host = os.getenv("HOST", "127.0.0.1")
-    print(f"🚀 Servidor Local + Azure corriendo en http://{host}:{port}")
-    uvicorn.run(app, host=host, port=port)
\ No newline at end of file
+    multiprocessing.freeze_support()
+    import server
+    server.run(app, log)
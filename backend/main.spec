@@ -1,8 +1,10 @@
 # -*- mode: python ; coding: utf-8 -*-
 
 
+# server.py es un lanzador mínimo: los workers spawn de las sedes lo
+# re-ejecutan sin volver a importar main
 a = Analysis(
-    ['main.py'],
+    ['server.py'],
     pathex=[],
     binaries=[],
     datas=[('.env', '.')],
@@ -10,25 +12,26 @@ a = Analysis(
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    # Nada de esto se usa en el backend; solo agranda la carpeta y el análisis
+    excludes=['tkinter', 'matplotlib', 'IPython', 'pytest'],
     noarchive=False,
     optimize=0,
 )
 pyz = PYZ(a.pure)
 
+# onedir: en onefile cada arranque descomprime pandas/numpy/pyarrow en un
+# _MEIxxxx temporal antes de importar nada. Se distribuye la carpeta dist/main/.
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='main',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    # Las DLL comprimidas con UPX se descomprimen en cada carga (y alertan antivirus)
+    upx=False,
     console=True,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -36,3 +39,12 @@ exe = EXE(
     codesign_identity=None,
     entitlements_file=None,
 )
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='main',
+)
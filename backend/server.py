@@ -0,0 +1,26 @@
+# server.py
+# Punto de entrada del backend para el build de PyInstaller (`python main.py`
+# también sirve y termina en run()).
+#
+# No construye nada al importarse. El pool de sedes (ProcessPoolExecutor con
+# spawn) re-ejecuta el script de entrada como __mp_main__ en cada worker; aquí
+# el worker solo ve este archivo y main se importa bajo el guard.
+import multiprocessing
+import os
+
+
+def run(app, log):
+    import uvicorn
+
+    port = int(os.getenv("PORT", 8000))
+    host = os.getenv("HOST", "127.0.0.1")
+    log.info(f"🚀 Servidor Local + Azure corriendo en http://{host}:{port}")
+    uvicorn.run(app, host=host, port=port)
+
+
+if __name__ == "__main__":
+    # En el ejecutable los workers arrancan el mismo .exe: freeze_support los desvía antes de importar main
+    multiprocessing.freeze_support()
+    from main import app, log
+
+    run(app, log)
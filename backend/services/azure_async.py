@@ -0,0 +1,83 @@
+# services/azure_async.py
+import logging
+from importlib.util import find_spec
+
+# aiohttp y azure.storage.blob.aio pesan ~0.4 s al importar: se cargan en
+# start() y solo si AZURE_ASYNC está activo
+HAS_AIO = find_spec("aiohttp") is not None
+
+log = logging.getLogger("tne.azure")
+
+
+# Clientes de Azure Blob asíncronos (azure.storage.blob.aio) sobre una única
+# sesión aiohttp con pool de conexiones. Se crean al arrancar la app (dentro
+# del event loop) y se cierran al apagarla; las esperas de red ya no ocupan
+# hilos del threadpool de Starlette.
+class AsyncBlobStore:
+    def __init__(self, account_url: str, credential, container: str, enabled: bool = True, pool_size: int = 20):
+        self.enabled = enabled and HAS_AIO
+        self.account_url = account_url
+        self.container = container
+        self.pool_size = pool_size
+        self._credential = credential
+        self._session = None
+        self._service = None
+        self._container_client = None
+        self._blobs = {}
+        self.requests = 0
+        self.errors = 0
+
+    async def start(self):
+        if not self.enabled or self._service is not None:
+            return
+        import aiohttp
+        from azure.core.pipeline.transport import AioHttpTransport
+        from azure.storage.blob.aio import BlobServiceClient as AsyncBlobServiceClient
+        self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.pool_size))
+        transport = AioHttpTransport(session=self._session, session_owner=False)
+        self._service = AsyncBlobServiceClient(self.account_url, credential=self._credential, transport=transport)
+        self._container_client = self._service.get_container_client(self.container)
+        log.info(f"✅ Pool de {self.pool_size} conexiones listo")
+
+    async def close(self):
+        if self._service is not None:
+            await self._service.close()
+        if self._session is not None:
+            await self._session.close()
+        self._service = None
+        self._session = None
+        self._container_client = None
+        self._blobs.clear()
+
+    def blob(self, name: str):
+        """BlobClient aio (misma API que el sync, con await)."""
+        client = self._blobs.get(name)
+        if client is None:
+            client = self._blobs[name] = self._container_client.get_blob_client(name)
+        return client
+
+    async def get_etag(self, name: str) -> str:
+        try:
+            self.requests += 1
+            return (await self.blob(name).get_blob_properties()).etag
+        except Exception:
+            self.errors += 1
+            raise
+
+    async def download_with_etag(self, name: str):
+        try:
+            self.requests += 1
+            downloader = await self.blob(name).download_blob()
+            return await downloader.readall(), downloader.properties.etag
+        except Exception:
+            self.errors += 1
+            raise
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "started": self._service is not None,
+            "pool_size": self.pool_size,
+            "requests": self.requests,
+            "errors": self.errors,
+        }
@@ -0,0 +1,48 @@
+# services/blob_stream.py
+import re
+
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(ValueError):
+    """El Range pedido queda fuera del archivo (HTTP 416)."""
+
+
+def etag_matches(if_none_match: str | None, etag) -> bool:
+    """True si la cabecera If-None-Match incluye el ETag actual (o es '*')."""
+    if not if_none_match or not etag:
+        return False
+    current = str(etag).strip().removeprefix("W/").strip('"')
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/").strip('"') == current:
+            return True
+    return False
+
+
+def parse_range(header: str | None, size: int):
+    """(inicio, largo) de un Range 'bytes=a-b' simple, o None para el archivo completo.
+
+    Rangos múltiples o mal formados se ignoran (se responde 200 completo,
+    como permite el RFC). Lanza RangeNotSatisfiable si no hay bytes que enviar.
+    """
+    if not header:
+        return None
+    m = _RANGE.match(header.strip())
+    if not m or not any(m.groups()):
+        return None
+    start, end = m.groups()
+    if start == "":
+        # Sufijo: los últimos N bytes
+        length = min(int(end), size)
+        if length == 0:
+            raise RangeNotSatisfiable(header)
+        return size - length, length
+    start = int(start)
+    if end != "" and int(end) < start:
+        # "bytes=5-3" no es un rango válido (RFC 9110 §14.1.1): se ignora
+        return None
+    end = size - 1 if end == "" else min(int(end), size - 1)
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    return start, end - start + 1
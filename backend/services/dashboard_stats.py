@@ -0,0 +1,120 @@
+# services/dashboard_stats.py
+import threading
+from collections import Counter
+from datetime import timedelta
+import pandas as pd
+
+from services.roster_schema import ENTREGADA
+
+RESPONSABLES_VACIOS = {'NAN', 'NONE', '', 'BLANK'}
+_FECHAS_VACIAS = {'nan', 'nat', 'none', ''}
+
+
+def parse_fechas(values: pd.Series) -> pd.Series:
+    """Fechas de entrega como datetime. Primero ISO (lo que escribe el backend),
+    luego día/mes/año para lo ingresado a mano en el Excel."""
+    s = values.astype(str).str.strip()
+    s = s.mask(s.str.lower().isin(_FECHAS_VACIAS))
+    fechas = pd.to_datetime(s, format="ISO8601", errors="coerce")
+    resto = fechas.isna() & s.notna()
+    if resto.any():
+        fechas[resto] = pd.to_datetime(s[resto], format="mixed", dayfirst=True, errors="coerce")
+    return fechas
+
+
+def fecha_dia(value):
+    fecha = parse_fechas(pd.Series([value])).iloc[0]
+    return None if pd.isna(fecha) else fecha.date()
+
+
+def _responsable(value) -> str:
+    return str(value).upper().strip()
+
+
+def resumen_dashboard(total_registros: int, entregados: int, por_dia, por_responsable, hoy) -> dict:
+    """Respuesta de /dashboard/stats a partir de los conteos (fecha -> n, responsable -> n)."""
+    fecha_limite = hoy - timedelta(days=30)
+    historial = sorted((f, c) for f, c in por_dia.items() if f >= fecha_limite)
+    # Empates por nombre para que el orden no dependa del historial de cambios
+    ranking = sorted(por_responsable.items(), key=lambda rc: (-rc[1], rc[0]))[:5]
+    return {
+        "total_registros": total_registros,
+        "entregados_total": entregados,
+        "pendientes_total": total_registros - entregados,
+        "entregados_hoy": por_dia.get(hoy, 0),
+        "porcentaje_entregado": round((entregados / total_registros * 100), 1) if total_registros > 0 else 0,
+        "historial": [{"fecha": str(f), "cantidad": int(c)} for f, c in historial],
+        "ranking": [{"nombre": str(n), "cantidad": int(c)} for n, c in ranking],
+    }
+
+
+# Agregados del dashboard mantenidos en memoria: conteos por estado, por día de
+# entrega y por responsable. Se reconstruyen solo cuando el Excel se recarga y
+# se actualizan en O(1) con cada entrega registrada.
+class DashboardAggregates:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.total = 0
+        self.por_estado = Counter()
+        self.por_dia = Counter()
+        self.por_responsable = Counter()
+        self.rebuilds = 0
+        self.updates = 0
+
+    def rebuild(self, df: pd.DataFrame):
+        estados = df['EntregadoStatus'].astype(str)
+        fechas = parse_fechas(df['FechaEntrega']).dropna()
+        responsables = df.loc[estados == ENTREGADA, 'Responsable'].astype(str).str.upper().str.strip()
+        responsables = responsables[~responsables.isin(RESPONSABLES_VACIOS)]
+
+        with self._lock:
+            self.total = len(df)
+            self.por_estado = Counter(estados.value_counts().to_dict())
+            self.por_dia = Counter(fechas.dt.date.value_counts().to_dict())
+            self.por_responsable = Counter(responsables.value_counts().to_dict())
+            self.rebuilds += 1
+
+    def update(self, old: tuple, new: tuple) -> dict:
+        """Aplica el cambio de una fila. old/new = (estado, responsable, fecha).
+
+        Devuelve el delta aplicado a cada contador (para notificar clientes).
+        """
+        delta = {"por_estado": {}, "por_dia": {}, "por_responsable": {}}
+        if old == new:
+            return delta
+        with self._lock:
+            self._count(old, -1, delta)
+            self._count(new, +1, delta)
+            self.updates += 1
+        return {k: {key: d for key, d in v.items() if d} for k, v in delta.items()}
+
+    def _count(self, row: tuple, d: int, delta: dict):
+        estado, responsable, fecha = row
+        self._bump(self.por_estado, str(estado), d, delta["por_estado"])
+        dia = fecha_dia(fecha)
+        if dia is not None:
+            self._bump(self.por_dia, dia, d, delta["por_dia"])
+        resp = _responsable(responsable)
+        if estado == ENTREGADA and resp not in RESPONSABLES_VACIOS:
+            self._bump(self.por_responsable, resp, d, delta["por_responsable"])
+
+    @staticmethod
+    def _bump(counter: Counter, key, d: int, delta: dict):
+        counter[key] += d
+        if counter[key] <= 0:
+            del counter[key]
+        delta[str(key)] = delta.get(str(key), 0) + d
+
+    def snapshot(self, hoy) -> dict:
+        with self._lock:
+            return resumen_dashboard(
+                self.total, self.por_estado.get(ENTREGADA, 0), self.por_dia, self.por_responsable, hoy,
+            )
+
+    def stats(self) -> dict:
+        return {"rebuilds": self.rebuilds, "updates": self.updates}
+
+
+def delta_fila(old: tuple, new: tuple) -> dict:
+    """Delta de contadores que produce el cambio de una fila, sin acumularlo."""
+    return DashboardAggregates().update(old, new)
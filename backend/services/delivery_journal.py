@@ -0,0 +1,166 @@
+# services/delivery_journal.py
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+log = logging.getLogger("tne.journal")
+
+
+# Journal local (JSONL de solo-append) de entregas pendientes de subir.
+# Cada entrega se escribe y sincroniza a disco antes de responder; un hilo en
+# segundo plano aplica todas las pendientes al Excel en un solo ciclo
+# descarga/serialización/subida cada `flush_interval` segundos o al llegar a
+# `max_batch` entradas.
+class DeliveryJournal:
+    def __init__(self, path: str, apply_batch, flush_interval: float = 5.0, max_batch: int = 50):
+        # apply_batch(entries) aplica y sube el lote; si lanza excepción el lote queda pendiente
+        self.path = path
+        self._apply_batch = apply_batch
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pending = self._load()
+        self.flush_count = 0
+        self.flushed_total = 0
+        self.flush_errors = 0
+        self.last_flush_seconds = None
+        self.last_flush_size = 0
+        self.last_flush_at = None
+        self.last_error = None
+
+    # --- API pública ---
+    def append(self, entry: dict) -> dict:
+        return self.append_many([entry])[0]
+
+    def append_many(self, entries: list) -> list:
+        """Anota varias entregas con una sola escritura y un solo fsync."""
+        entries = [dict(e) for e in entries]
+        for entry in entries:
+            entry.setdefault("id", uuid.uuid4().hex)
+            entry.setdefault("ts", time.time())
+        if not entries:
+            return entries
+        lines = "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in entries)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            self._pending.extend(entries)
+            depth = len(self._pending)
+        if depth >= self.max_batch:
+            self._wake.set()
+        return entries
+
+    def pending(self) -> list:
+        with self._lock:
+            return list(self._pending)
+
+    def depth(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self) -> int:
+        """Aplica las entregas pendientes en un solo ciclo. Devuelve cuántas se subieron."""
+        with self._flush_lock:
+            batch = self.pending()
+            if not batch:
+                return 0
+            t0 = time.perf_counter()
+            try:
+                self._apply_batch(batch)
+            except Exception as e:
+                self.flush_errors += 1
+                self.last_error = str(e)
+                raise
+            self.last_flush_seconds = round(time.perf_counter() - t0, 3)
+            self.last_flush_size = len(batch)
+            self.last_flush_at = time.time()
+            self.flush_count += 1
+            self.flushed_total += len(batch)
+            self.last_error = None
+            self._remove({e["id"] for e in batch})
+            return len(batch)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="delivery-journal", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=30)
+        try:
+            self.flush()
+        except Exception as e:
+            log.error(f"❌ No se pudo vaciar al cerrar: {e}", extra={"ctx": {"pendientes": self.depth()}})
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.depth(),
+            "flush_count": self.flush_count,
+            "flushed_total": self.flushed_total,
+            "flush_errors": self.flush_errors,
+            "last_flush_seconds": self.last_flush_seconds,
+            "last_flush_size": self.last_flush_size,
+            "last_flush_at": self.last_flush_at,
+            "last_error": self.last_error,
+            "flush_interval": self.flush_interval,
+            "max_batch": self.max_batch,
+        }
+
+    # --- Internos ---
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                n = self.flush()
+                if n:
+                    log.info("💾 Lote de entregas subido", extra={"ctx": {"entregas": n, "segundos": self.last_flush_seconds}})
+            except Exception as e:
+                log.warning(f"⚠️ Error al subir lote: {e}", extra={"ctx": {"pendientes": self.depth()}})
+
+    def _load(self) -> list:
+        # Recupera entregas no subidas de una ejecución anterior
+        if not os.path.exists(self.path):
+            return []
+        entries = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # Línea truncada por un corte: se descarta
+                    continue
+        if entries:
+            log.info(f"📒 {len(entries)} entregas pendientes recuperadas de {self.path}")
+        return entries
+
+    def _remove(self, ids: set):
+        # Compacta el archivo dejando solo lo que sigue pendiente
+        with self._lock:
+            self._pending = [e for e in self._pending if e["id"] not in ids]
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                for e in self._pending:
+                    f.write(json.dumps(e, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
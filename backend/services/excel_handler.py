@@ -2,6 +2,7 @@
 import io
 import pandas as pd
 from datetime import datetime
+from services.roster_index import RosterIndex
 
 # lee bytes del excel y devuelve DataFrame normalizado
 def read_excel_from_bytes(bytes_data: bytes) -> pd.DataFrame:
@@ -20,26 +21,16 @@ def df_to_excel_bytes(df: pd.DataFrame) -> bytes:
     bio.seek(0)
     return bio.read()
 
-# buscar fila por folio o rut (case-insensitive)
-def find_row_index(df: pd.DataFrame, folio: str = None, rut: str = None):
-    if folio:
-        matches = df[df.apply(lambda r: str(r).strip() == folio if False else False, axis=1)]
-    # Implementamos búsquedas seguras:
-    if folio:
-        col_candidates = [c for c in df.columns if c.lower().replace(" ", "") in ("folio","n°defolio","n°defolio","nfolio","n°defolio")]
-        if col_candidates:
-            col = col_candidates[0]
-            idx = df.index[df[col].astype(str).str.strip() == str(folio).strip()]
-            if len(idx) > 0:
-                return idx[0], col
-    if rut:
-        col_candidates = [c for c in df.columns if c.lower().replace(" ", "") in ("rut","rut")]
-        if col_candidates:
-            col = col_candidates[0]
-            idx = df.index[df[col].astype(str).str.strip() == str(rut).strip()]
-            if len(idx) > 0:
-                return idx[0], col
-    return None, None
+# buscar fila por folio o rut usando el índice hash (Folio/RUT normalizados)
+def find_row_index(df: pd.DataFrame, folio: str = None, rut: str = None, index: RosterIndex = None):
+    folio_col = next((c for c in df.columns if c.lower().replace(" ", "") in ("folio","n°defolio","nfolio")), None)
+    rut_col = next((c for c in df.columns if c.lower().replace(" ", "") == "rut"), None)
+    if index is None:
+        index = RosterIndex(df, folio_col=folio_col or "", rut_col=rut_col or "", dv_col="DV")
+    idx, field = index.find_with_field(folio=folio, rut=rut)
+    if idx is None:
+        return None, None
+    return idx, folio_col if field == "folio" else rut_col
 
 # marcar como entregado y devolver bytes nuevos
 def mark_entregado_and_serialize(bytes_data: bytes, folio: str = None, rut: str = None, responsable: str = None):
@@ -0,0 +1,78 @@
+# services/excel_writer.py
+import io
+from importlib.util import find_spec
+
+import pandas as pd
+
+# xlsxwriter se importa al serializar: solo se detecta, así no suma al arranque
+HAS_XLSXWRITER = find_spec("xlsxwriter") is not None
+
+# Modos de serialización del roster a xlsx:
+#   xlsxwriter : streaming fila a fila (constant_memory), el más rápido
+#   write_only : openpyxl en modo write-only (sin grafo de celdas en memoria)
+#   openpyxl   : pd.ExcelWriter normal, como antes
+WRITER_MODES = ("xlsxwriter", "write_only", "openpyxl")
+
+
+def _filas(df: pd.DataFrame):
+    # Por columnas a listas de objetos Python; NaN/NA -> None (celda vacía)
+    cols = [df[c].astype(object).where(df[c].notna(), None).tolist() for c in df.columns]
+    return zip(*cols)
+
+
+def _xlsxwriter(hojas: dict) -> bytes:
+    import xlsxwriter
+    bio = io.BytesIO()
+    # Textos tal cual: "=..." no es fórmula ni los mails/URLs se convierten
+    wb = xlsxwriter.Workbook(bio, {
+        "constant_memory": True,
+        "strings_to_formulas": False,
+        "strings_to_urls": False,
+    })
+    negrita = wb.add_format({"bold": True})
+    for nombre, df in hojas.items():
+        ws = wb.add_worksheet(nombre)
+        ws.write_row(0, 0, [str(c) for c in df.columns], negrita)
+        for r, fila in enumerate(_filas(df), start=1):
+            ws.write_row(r, 0, fila)
+    wb.close()
+    return bio.getvalue()
+
+
+def _write_only(hojas: dict) -> bytes:
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    for nombre, df in hojas.items():
+        ws = wb.create_sheet(nombre)
+        ws.append([str(c) for c in df.columns])
+        for fila in _filas(df):
+            ws.append(fila)
+    bio = io.BytesIO()
+    wb.save(bio)
+    return bio.getvalue()
+
+
+def _openpyxl(hojas: dict) -> bytes:
+    bio = io.BytesIO()
+    with pd.ExcelWriter(bio, engine="openpyxl") as writer:
+        for nombre, df in hojas.items():
+            df.to_excel(writer, sheet_name=nombre or "Sheet1", index=False)
+    return bio.getvalue()
+
+
+def to_xlsx_bytes(df: pd.DataFrame, mode: str = "xlsxwriter") -> bytes:
+    """Serializa `df` (columnas en el orden dado, sin índice) como xlsx."""
+    return sheets_to_xlsx_bytes({None: df}, mode=mode)
+
+
+def sheets_to_xlsx_bytes(hojas: dict, mode: str = "xlsxwriter") -> bytes:
+    """Libro con una hoja por entrada de `hojas` (nombre -> DataFrame; None = nombre por defecto)."""
+    if mode == "xlsxwriter" and not HAS_XLSXWRITER:
+        mode = "write_only"
+    if mode == "xlsxwriter":
+        return _xlsxwriter(hojas)
+    if mode == "write_only":
+        return _write_only(hojas)
+    if mode == "openpyxl":
+        return _openpyxl(hojas)
+    raise ValueError(f"Modo de escritura desconocido: {mode} (opciones: {', '.join(WRITER_MODES)})")
@@ -1,12 +1,20 @@
 # services/graph_api.py
+import json
+import logging
 import os
+import threading
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from msal import ConfidentialClientApplication
 from dotenv import load_dotenv
 from typing import Optional
 
 load_dotenv()
 
+log = logging.getLogger("tne.graph")
+
 CLIENT_ID = os.getenv("CLIENT_ID")
 CLIENT_SECRET = os.getenv("CLIENT_SECRET")
 TENANT_ID = os.getenv("TENANT_ID")
@@ -14,80 +22,242 @@ SHAREPOINT_HOST = os.getenv("SHAREPOINT_HOST")
 SHAREPOINT_SITE_NAME = os.getenv("SHAREPOINT_SITE_NAME")
 SHAREPOINT_DRIVE_NAME = os.getenv("SHAREPOINT_DRIVE_NAME")
 EXCEL_FILE_PATH = os.getenv("EXCEL_FILE_PATH")
+# Archivo donde se recuerdan site/drive IDs entre ejecuciones
+GRAPH_ID_CACHE = os.getenv("GRAPH_ID_CACHE", "")
 
-AUTHORITY = f"https://login.microsoftonline.com/{TENANT_ID}"
 SCOPE = ["https://graph.microsoft.com/.default"]
 GRAPH_BASE = "https://graph.microsoft.com/v1.0"
 
-_app = ConfidentialClientApplication(CLIENT_ID, authority=AUTHORITY, client_credential=CLIENT_SECRET)
-_token_cache = None
-_site_id_cache = None
-_drive_id_cache = None
+# Renovar el token cuando le quede menos que esto
+TOKEN_MARGIN_SECONDS = 300
+# Sobre este tamaño se usa una sesión de subida por tramos
+SIMPLE_UPLOAD_MAX = 4 * 1024 * 1024
+# Los tramos deben ser múltiplos de 320 KiB
+UPLOAD_CHUNK = 10 * 320 * 1024
+
+
+class GraphConflictError(Exception):
+    """El archivo cambió en SharePoint desde el eTag indicado (HTTP 412)."""
+
+
+# Cliente de Microsoft Graph para un archivo de SharePoint.
+# Una sola requests.Session (keep-alive + pool de conexiones), token reutilizado
+# hasta poco antes de vencer y site/drive IDs resueltos una vez (y guardados en
+# disco si se indica `id_cache_path`).
+class GraphClient:
+    def __init__(self, client_id, client_secret, tenant_id, host, site_name, drive_name,
+                 id_cache_path: str = "", pool_size: int = 10, timeout: float = 60.0):
+        self.host = host
+        self.site_name = site_name
+        self.drive_name = drive_name
+        self.id_cache_path = id_cache_path
+        self.timeout = timeout
+        self._app = ConfidentialClientApplication(
+            client_id, authority=f"https://login.microsoftonline.com/{tenant_id}", client_credential=client_secret,
+        )
+        self._lock = threading.Lock()
+        self._token = None
+        self._token_expires = 0.0
+        self._site_id = None
+        self._drive_id = None
+        self.session = requests.Session()
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=("GET", "HEAD"), respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.token_requests = 0
+        self.requests = 0
+        self._load_ids()
+
+    # --- Autenticación ---
+    def access_token(self) -> str:
+        with self._lock:
+            if self._token and time.time() < self._token_expires - TOKEN_MARGIN_SECONDS:
+                return self._token
+            result = self._app.acquire_token_for_client(scopes=SCOPE)
+            self.token_requests += 1
+            if "access_token" not in result:
+                raise Exception(f"Could not obtain access token: {result}")
+            self._token = result["access_token"]
+            self._token_expires = time.time() + int(result.get("expires_in", 3600))
+            return self._token
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        headers = kwargs.pop("headers", {})
+        kwargs.setdefault("timeout", self.timeout)
+        for intento in range(2):
+            self.requests += 1
+            r = self.session.request(method, url, headers={**headers, "Authorization": f"Bearer {self.access_token()}"}, **kwargs)
+            if r.status_code == 401 and intento == 0:
+                # Token revocado o vencido antes de lo informado: pedir otro una vez
+                with self._lock:
+                    self._token = None
+                continue
+            break
+        if r.status_code == 412:
+            raise GraphConflictError(f"{method} {url}: el archivo cambió (412)")
+        r.raise_for_status()
+        return r
+
+    # --- Site / drive ---
+    def site_id(self) -> str:
+        if self._site_id:
+            return self._site_id
+        # endpoint: /sites/{host}:/sites/{siteName}
+        r = self._request("GET", f"{GRAPH_BASE}/sites/{self.host}:/sites/{self.site_name}")
+        self._site_id = r.json()["id"]
+        self._save_ids()
+        return self._site_id
+
+    def drive_id(self) -> str:
+        if self._drive_id:
+            return self._drive_id
+        site_id = self.site_id()
+        drives = self._request("GET", f"{GRAPH_BASE}/sites/{site_id}/drives").json().get("value", [])
+        for d in drives:
+            if (d.get("name") or "").lower() == (self.drive_name or "").lower():
+                self._drive_id = d["id"]
+                break
+        else:
+            # fallback: use default drive
+            self._drive_id = self._request("GET", f"{GRAPH_BASE}/sites/{site_id}/drive").json()["id"]
+        self._save_ids()
+        return self._drive_id
+
+    def _item_url(self, path: str) -> str:
+        return f"{GRAPH_BASE}/drives/{self.drive_id()}/root:/{path.lstrip('/')}:"
+
+    # --- Archivos ---
+    def item(self, path: str) -> dict:
+        """Metadatos del archivo (eTag, size, lastModifiedDateTime...)."""
+        return self._request("GET", self._item_url(path)).json()
+
+    def download(self, path: str) -> bytes:
+        return self._request("GET", self._item_url(path) + "/content").content
+
+    def download_with_etag(self, path: str):
+        item = self.item(path)
+        # Descarga fijada al eTag leído: si cambió en medio, 412
+        r = self._request("GET", self._item_url(path) + "/content", headers={"If-Match": item["eTag"]})
+        return r.content, item["eTag"]
+
+    def stream(self, path: str, offset: int = 0, length: Optional[int] = None, etag: Optional[str] = None,
+               chunk_size: int = 1024 * 1024):
+        headers = {"If-Match": etag} if etag else {}
+        if offset or length is not None:
+            end = "" if length is None else offset + length - 1
+            headers["Range"] = f"bytes={offset}-{end}"
+        # El GET se hace aquí y no al iterar: un 412 o 404 se lanza antes de que
+        # el endpoint haya enviado los headers de la respuesta
+        r = self._request("GET", self._item_url(path) + "/content", headers=headers, stream=True)
+        return self._iter_content(r, chunk_size)
+
+    @staticmethod
+    def _iter_content(r: requests.Response, chunk_size: int):
+        try:
+            yield from r.iter_content(chunk_size)
+        finally:
+            r.close()
+
+    def upload(self, path: str, data: bytes, etag: Optional[str] = None) -> str:
+        """Sube reemplazando el archivo; con `etag` solo si no cambió. Devuelve el nuevo eTag."""
+        headers = {"If-Match": etag} if etag else {}
+        if len(data) <= SIMPLE_UPLOAD_MAX:
+            r = self._request("PUT", self._item_url(path) + "/content", headers=headers, data=data)
+            return r.json().get("eTag")
+        return self._upload_session(path, data, headers)
+
+    def _upload_session(self, path: str, data: bytes, headers: dict) -> str:
+        body = {"item": {"@microsoft.graph.conflictBehavior": "replace"}}
+        session = self._request("POST", self._item_url(path) + "/createUploadSession", headers=headers, json=body).json()
+        upload_url = session["uploadUrl"]
+        total = len(data)
+        try:
+            for start in range(0, total, UPLOAD_CHUNK):
+                chunk = data[start:start + UPLOAD_CHUNK]
+                # La URL de la sesión ya está autorizada: no lleva Bearer
+                r = self.session.put(upload_url, data=chunk, timeout=self.timeout, headers={
+                    "Content-Length": str(len(chunk)),
+                    "Content-Range": f"bytes {start}-{start + len(chunk) - 1}/{total}",
+                })
+                self.requests += 1
+                if r.status_code == 412:
+                    raise GraphConflictError(f"{path}: el archivo cambió durante la subida (412)")
+                r.raise_for_status()
+        except Exception:
+            self.session.delete(upload_url, timeout=self.timeout)
+            raise
+        return r.json().get("eTag")
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "token_requests": self.token_requests,
+            "token_seconds_left": max(0, round(self._token_expires - time.time())) if self._token else 0,
+            "site_id": self._site_id,
+            "drive_id": self._drive_id,
+        }
+
+    # --- Cache persistente de IDs ---
+    def _cache_key(self) -> str:
+        return f"{self.host}|{self.site_name}|{self.drive_name}"
+
+    def _load_ids(self):
+        if not self.id_cache_path or not os.path.exists(self.id_cache_path):
+            return
+        try:
+            with open(self.id_cache_path, encoding="utf-8") as f:
+                ids = json.load(f).get(self._cache_key(), {})
+            self._site_id = ids.get("site_id")
+            self._drive_id = ids.get("drive_id")
+        except (OSError, ValueError) as e:
+            log.warning(f"⚠️ Cache de IDs ilegible ({e}), se vuelven a resolver")
+
+    def _save_ids(self):
+        if not self.id_cache_path:
+            return
+        try:
+            data = {}
+            if os.path.exists(self.id_cache_path):
+                with open(self.id_cache_path, encoding="utf-8") as f:
+                    data = json.load(f)
+            data[self._cache_key()] = {"site_id": self._site_id, "drive_id": self._drive_id}
+            tmp = self.id_cache_path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.id_cache_path)
+        except (OSError, ValueError) as e:
+            log.warning(f"⚠️ No se pudo guardar el cache de IDs: {e}")
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> GraphClient:
+    """Cliente compartido configurado desde las variables de entorno."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = GraphClient(
+                CLIENT_ID, CLIENT_SECRET, TENANT_ID,
+                SHAREPOINT_HOST, SHAREPOINT_SITE_NAME, SHAREPOINT_DRIVE_NAME,
+                id_cache_path=GRAPH_ID_CACHE,
+            )
+        return _client
+
 
 def get_access_token() -> str:
-    global _token_cache
-    result = _app.acquire_token_silent(SCOPE, account=None)
-    if not result:
-        result = _app.acquire_token_for_client(scopes=SCOPE)
-    if "access_token" not in result:
-        raise Exception(f"Could not obtain access token: {result}")
-    return result["access_token"]
+    return get_client().access_token()
 
 def get_site_id() -> str:
-    global _site_id_cache
-    if _site_id_cache:
-        return _site_id_cache
-    token = get_access_token()
-    headers = {"Authorization": f"Bearer {token}"}
-    # endpoint: /sites/{host}:/sites/{siteName}
-    url = f"{GRAPH_BASE}/sites/{SHAREPOINT_HOST}:/sites/{SHAREPOINT_SITE_NAME}"
-    r = requests.get(url, headers=headers)
-    r.raise_for_status()
-    _site_id_cache = r.json()["id"]
-    return _site_id_cache
+    return get_client().site_id()
 
 def get_drive_id() -> str:
-    global _drive_id_cache
-    if _drive_id_cache:
-        return _drive_id_cache
-    token = get_access_token()
-    headers = {"Authorization": f"Bearer {token}"}
-    site_id = get_site_id()
-    # list drives for the site, find the named drive
-    url = f"{GRAPH_BASE}/sites/{site_id}/drives"
-    r = requests.get(url, headers=headers)
-    r.raise_for_status()
-    drives = r.json().get("value", [])
-    for d in drives:
-        if d.get("name") == SHAREPOINT_DRIVE_NAME or d.get("name").lower() == SHAREPOINT_DRIVE_NAME.lower():
-            _drive_id_cache = d["id"]
-            return _drive_id_cache
-    # fallback: use default drive
-    url2 = f"{GRAPH_BASE}/sites/{site_id}/drive"
-    r2 = requests.get(url2, headers=headers)
-    r2.raise_for_status()
-    _drive_id_cache = r2.json()["id"]
-    return _drive_id_cache
+    return get_client().drive_id()
 
 def download_file_bytes() -> bytes:
-    token = get_access_token()
-    headers = {"Authorization": f"Bearer {token}"}
-    site_id = get_site_id()
-    drive_id = get_drive_id()
-    # GET /drives/{driveId}/root:/{path}:/content
-    path = EXCEL_FILE_PATH.lstrip("/")
-    url = f"{GRAPH_BASE}/drives/{drive_id}/root:/{path}:/content"
-    r = requests.get(url, headers=headers)
-    r.raise_for_status()
-    return r.content
+    return get_client().download(EXCEL_FILE_PATH)
 
 def upload_file_bytes(file_bytes: bytes) -> None:
-    token = get_access_token()
-    headers = {"Authorization": f"Bearer {token}"}
-    site_id = get_site_id()
-    drive_id = get_drive_id()
-    path = EXCEL_FILE_PATH.lstrip("/")
-    url = f"{GRAPH_BASE}/drives/{drive_id}/root:/{path}:/content"
-    r = requests.put(url, headers=headers, data=file_bytes)
-    r.raise_for_status()
-    return
+    get_client().upload(EXCEL_FILE_PATH, file_bytes)
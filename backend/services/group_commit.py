@@ -0,0 +1,81 @@
+# services/group_commit.py
+import threading
+
+
+class _Pendiente:
+    def __init__(self, fn):
+        self.fn = fn
+        self.evento = threading.Event()
+        self.lider = False
+        self.listo = False
+        self.resultado = None
+        self.error = None
+
+
+# Commit en grupo: los cambios que llegan mientras hay una subida en curso se
+# juntan y viajan en la siguiente, en un solo ciclo lectura-modificación-
+# escritura. Los requests concurrentes no se serializan de a uno detrás de
+# cada subida ni chocan entre sí con 412: esperan juntos una sola.
+# El primero en llegar lidera la ronda; al terminarla le pasa el turno al
+# primero de la cola, así nadie espera más que su propia ronda y la anterior.
+class GroupCommit:
+    def __init__(self, run_batch):
+        # run_batch(fns) -> [(error, resultado), ...] en el mismo orden; si lanza,
+        # la excepción se entrega a todos los commits del lote
+        self._run_batch = run_batch
+        self._lock = threading.Lock()
+        self._cola = []
+        self._ocupado = False
+        self.commits = 0
+        self.batches = 0
+        self.max_batch = 0
+
+    def submit(self, fn):
+        """Ejecuta `fn` dentro de la próxima ronda y devuelve su resultado (o lanza su error)."""
+        pendiente = _Pendiente(fn)
+        with self._lock:
+            self._cola.append(pendiente)
+            if not self._ocupado:
+                self._ocupado = True
+                pendiente.lider = True
+        while not pendiente.listo:
+            if pendiente.lider:
+                self._ronda()
+            else:
+                pendiente.evento.wait()
+                pendiente.evento.clear()
+        if pendiente.error is not None:
+            raise pendiente.error
+        return pendiente.resultado
+
+    def _ronda(self):
+        with self._lock:
+            lote, self._cola = self._cola, []
+            self.commits += len(lote)
+            self.batches += 1
+            self.max_batch = max(self.max_batch, len(lote))
+        try:
+            salidas = self._run_batch([p.fn for p in lote])
+        except Exception as e:
+            salidas = [(e, None)] * len(lote)
+        for p, (error, resultado) in zip(lote, salidas):
+            p.error, p.resultado, p.listo = error, resultado, True
+        with self._lock:
+            if self._cola:
+                siguiente = self._cola[0]
+                siguiente.lider = True
+                siguiente.evento.set()
+            else:
+                self._ocupado = False
+        for p in lote:
+            p.evento.set()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "commits": self.commits,
+                "batches": self.batches,
+                "max_batch": self.max_batch,
+                "avg_batch": round(self.commits / self.batches, 2) if self.batches else 0.0,
+                "queued": len(self._cola),
+            }
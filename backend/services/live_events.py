@@ -0,0 +1,82 @@
+# services/live_events.py
+import asyncio
+import itertools
+import json
+import threading
+
+
+# Difusión de eventos a los clientes conectados por Server-Sent Events.
+# `publish` puede llamarse desde cualquier hilo (endpoints sync, hilo del
+# journal); cada suscriptor recibe el evento en su propia cola asyncio.
+class EventBroadcaster:
+    def __init__(self, max_queue: int = 500, heartbeat: float = 15.0):
+        self.max_queue = max_queue
+        self.heartbeat = heartbeat
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        self.published = 0
+        self.overflows = 0
+
+    def subscribe(self) -> asyncio.Queue:
+        # Debe llamarse dentro del event loop que consumirá la cola
+        queue = asyncio.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    def publish(self, event: str, data: dict):
+        message = self._format(next(self._seq), event, data)
+        with self._lock:
+            targets = list(self._subscribers.items())
+            self.published += 1
+        for queue, loop in targets:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, message)
+            except RuntimeError:
+                # Loop cerrado: el cliente ya se fue
+                self.unsubscribe(queue)
+
+    def _deliver(self, queue: asyncio.Queue, message: str):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Cliente lento: se descarta su cola y se le pide recargar completo
+            self.overflows += 1
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(self._format(next(self._seq), "recarga", {"motivo": "cola llena"}))
+
+    @staticmethod
+    def _format(seq: int, event: str, data: dict) -> str:
+        payload = json.dumps(data, ensure_ascii=False, default=str)
+        return f"id: {seq}\nevent: {event}\ndata: {payload}\n\n"
+
+    async def stream(self, request):
+        """Generador SSE para un cliente; termina cuando se desconecta."""
+        queue = self.subscribe()
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=self.heartbeat)
+                    yield message
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    # Comentario SSE: mantiene viva la conexión en proxies
+                    yield ": ping\n\n"
+        finally:
+            self.unsubscribe(queue)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "published": self.published,
+                "overflows": self.overflows,
+            }
@@ -0,0 +1,41 @@
+# services/logs.py
+import json
+import logging
+
+
+# Campos estructurados: log.info("mensaje", extra={"ctx": {"clave": valor}})
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            "ts": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            **getattr(record, "ctx", {}),
+        }
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        ctx = getattr(record, "ctx", None)
+        if ctx:
+            line += " " + " ".join(f"{k}={v}" for k, v in ctx.items())
+        return line
+
+
+def configurar_logging(level: str = "INFO", formato: str = "text"):
+    """Logger raíz 'tne'. LOG_FORMAT=json para recolectores, text para consola."""
+    handler = logging.StreamHandler()
+    handler.setFormatter(JsonFormatter() if formato == "json" else TextFormatter())
+    logger = logging.getLogger("tne")
+    logger.handlers[:] = [handler]
+    logger.setLevel(level.upper())
+    logger.propagate = False
+    return logger
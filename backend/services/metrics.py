@@ -0,0 +1,111 @@
+# services/metrics.py
+import threading
+import time
+from contextlib import contextmanager
+
+# Segundos: desde lecturas del cache (ms) hasta ciclos completos de Excel
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(labels: tuple, extra: tuple = ()) -> str:
+    items = labels + extra
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+def _fmt_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Registro mínimo de métricas en formato de exposición de Prometheus.
+# Contadores e histogramas se actualizan desde cualquier hilo; los gauges se
+# calculan al momento del scrape a partir de los `stats()` de cada servicio.
+class Metrics:
+    def __init__(self, prefix: str = "tne"):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._meta = {}
+        self._counters = {}
+        self._histograms = {}
+        self._gauges = {}
+
+    def counter(self, name: str, help: str):
+        self._meta[name] = ("counter", help, None)
+        self._counters.setdefault(name, {})
+
+    def histogram(self, name: str, help: str, buckets=DEFAULT_BUCKETS):
+        self._meta[name] = ("histogram", help, tuple(buckets))
+        self._histograms.setdefault(name, {})
+
+    def gauge(self, name: str, help: str, fn):
+        """fn() -> lista de (labels: dict, valor), evaluada en cada scrape."""
+        self._meta[name] = ("gauge", help, None)
+        self._gauges[name] = fn
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        buckets = self._meta[name][2]
+        with self._lock:
+            series = self._histograms[name]
+            h = series.get(key)
+            if h is None:
+                h = series[key] = [[0] * len(buckets), 0.0, 0]
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    h[0][i] += 1
+            h[1] += value
+            h[2] += 1
+
+    @contextmanager
+    def span(self, stage: str, **labels):
+        """Mide la duración de una etapa en `stage_seconds`, aunque lance excepción."""
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe("stage_seconds", time.perf_counter() - t0, stage=stage, **labels)
+
+    def render(self) -> str:
+        lines = []
+        for name, (kind, help, buckets) in self._meta.items():
+            full = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {full} {help}")
+            lines.append(f"# TYPE {full} {kind}")
+            if kind == "counter":
+                with self._lock:
+                    series = list(self._counters[name].items())
+                for key, value in series:
+                    lines.append(f"{full}{_fmt_labels(key)} {_fmt_value(value)}")
+            elif kind == "histogram":
+                with self._lock:
+                    series = [(key, (list(h[0]), h[1], h[2])) for key, h in self._histograms[name].items()]
+                for key, (counts, total, count) in series:
+                    for bound, c in zip(buckets, counts):
+                        lines.append(f"{full}_bucket{_fmt_labels(key, (('le', _fmt_value(bound)),))} {c}")
+                    lines.append(f"{full}_bucket{_fmt_labels(key, (('le', '+Inf'),))} {count}")
+                    lines.append(f"{full}_sum{_fmt_labels(key)} {_fmt_value(total)}")
+                    lines.append(f"{full}_count{_fmt_labels(key)} {count}")
+            else:
+                try:
+                    samples = self._gauges[name]()
+                except Exception:
+                    samples = []
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    key = tuple(sorted(labels.items()))
+                    lines.append(f"{full}{_fmt_labels(key)} {_fmt_value(value)}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,123 @@
+# services/role_cache.py
+import logging
+import threading
+import time
+
+log = logging.getLogger("tne.roles")
+
+
+class Roles:
+    """Correos autorizados por rol, en minúsculas, como frozensets."""
+
+    def __init__(self, admins=(), tutores=()):
+        self.admins = frozenset(admins)
+        self.tutores = frozenset(tutores)
+
+    def role(self, email: str):
+        if email in self.admins:
+            return "admin"
+        if email in self.tutores:
+            return "tutor"
+        return None
+
+
+# Cache en memoria de usuarios.xlsx para /login.
+# La primera consulta carga bloqueando; luego, vencido el TTL, se valida el
+# ETag en un hilo de fondo mientras se sigue respondiendo con la última copia
+# buena. Si Azure falla y nunca hubo copia, se usa el archivo local.
+class RoleCache:
+    def __init__(self, loader, etag_getter, fallback=None, ttl: float = 60.0):
+        # loader() -> (Roles, etag) ; etag_getter() -> etag actual del blob
+        # fallback() -> Roles desde el usuarios.xlsx local
+        self._loader = loader
+        self._etag_getter = etag_getter
+        self._fallback = fallback
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._roles = None
+        self._etag = None
+        self.source = None
+        self._checked_at = 0.0
+        self._refreshing = False
+        self.hits = 0
+        self.loads = 0
+        self.revalidations = 0
+        self.errors = 0
+        self.last_error = None
+
+    def get(self) -> Roles:
+        with self._lock:
+            roles = self._roles
+            stale = time.monotonic() - self._checked_at >= self.ttl
+            if roles is not None:
+                self.hits += 1
+                if stale and not self._refreshing:
+                    self._refreshing = True
+                    threading.Thread(target=self._background_refresh, name="role-cache", daemon=True).start()
+                return roles
+        # Sin copia todavía: la primera carga bloquea
+        self.refresh()
+        with self._lock:
+            return self._roles or Roles()
+
+    def role(self, email: str):
+        return self.get().role(email)
+
+    def refresh(self):
+        with self._refresh_lock:
+            try:
+                if self._roles is not None and self._etag is not None and self._etag_getter() == self._etag:
+                    self.revalidations += 1
+                    self._mark_checked()
+                    return
+                roles, etag = self._loader()
+                self.loads += 1
+                self._store(roles, etag, "Azure")
+            except Exception as e:
+                self.errors += 1
+                self.last_error = str(e)
+                log.warning(f"⚠️ Azure falló ({e})")
+                if self._roles is None and self._fallback is not None:
+                    roles = self._fallback()
+                    if roles is not None:
+                        self._store(roles, None, "Local")
+                        return
+                # Se mantiene la última copia buena hasta el próximo TTL
+                self._mark_checked()
+
+    def stats(self) -> dict:
+        with self._lock:
+            roles = self._roles
+            return {
+                "hits": self.hits,
+                "loads": self.loads,
+                "revalidations": self.revalidations,
+                "errors": self.errors,
+                "last_error": self.last_error,
+                "ttl": self.ttl,
+                "etag": self._etag,
+                "source": self.source,
+                "admins": len(roles.admins) if roles is not None else 0,
+                "tutores": len(roles.tutores) if roles is not None else 0,
+                "age_seconds": round(time.monotonic() - self._checked_at, 1) if roles is not None else None,
+            }
+
+    def _background_refresh(self):
+        try:
+            self.refresh()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _store(self, roles: Roles, etag, source: str):
+        with self._lock:
+            self._roles = roles
+            self._etag = etag
+            self.source = source
+            self._checked_at = time.monotonic()
+        log.info("📊 Roles cargados", extra={"ctx": {"source": source, "admins": len(roles.admins), "tutores": len(roles.tutores)}})
+
+    def _mark_checked(self):
+        with self._lock:
+            self._checked_at = time.monotonic()
@@ -0,0 +1,142 @@
+# services/roster_cache.py
+import threading
+import time
+
+
+# Cache en memoria del DataFrame normalizado del roster.
+# Se valida contra el ETag del blob: si el blob no cambió, una consulta de
+# propiedades (HEAD) basta y no se vuelve a descargar ni parsear el Excel.
+class RosterCache:
+    def __init__(self, loader, etag_getter, ttl: float = 10.0, build_index=None, after_load=None):
+        # loader() -> (DataFrame, etag) ; etag_getter() -> etag actual del blob
+        # build_index(df) -> índice de búsqueda, reconstruido en cada carga
+        # after_load(df, índice) -> se ejecuta solo tras descargar y parsear
+        self._loader = loader
+        self._etag_getter = etag_getter
+        self._build_index = build_index
+        self._after_load = after_load
+        self.ttl = ttl
+        # Reentrante: permite agrupar lecturas y `set` en una misma sección
+        self.lock = threading.RLock()
+        self._df = None
+        self._etag = None
+        self.index = None
+        self._checked_at = 0.0
+        self._loaded_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.invalidations = 0
+
+    def get(self):
+        """Devuelve el DataFrame compartido (para modificarlo usar `mutate` o .copy())."""
+        with self.lock:
+            df = self.peek()
+            if df is not None:
+                return df
+            # Fuera del TTL: validar con una consulta barata de propiedades
+            if self._df is not None:
+                df = self.revalidate(self._etag_getter())
+                if df is not None:
+                    return df
+            return self.load(*self._loader())
+
+    def peek(self):
+        """DataFrame si está dentro del TTL (sin consultar a Azure), si no None."""
+        with self.lock:
+            if self._df is not None and time.monotonic() - self._checked_at < self.ttl:
+                self.hits += 1
+                return self._df
+            return None
+
+    def revalidate(self, etag):
+        """Extiende el TTL si `etag` es el cacheado y devuelve el DataFrame, si no None."""
+        with self.lock:
+            if self._df is None or etag != self._etag:
+                return None
+            self._checked_at = time.monotonic()
+            self.hits += 1
+            self.revalidations += 1
+            return self._df
+
+    def load(self, df, etag):
+        """Guarda un roster recién descargado y parseado, y ejecuta after_load."""
+        with self.lock:
+            self.misses += 1
+            self._store(df, etag)
+            if self._after_load is not None:
+                self._after_load(self._df, self.index)
+            return self._df
+
+    def snapshot(self, copy: bool = False):
+        """(df, etag, índice) consistentes entre sí.
+
+        Con `copy=True` el DataFrame se copia dentro del lock, así la copia no
+        ve a medias una entrega que se esté aplicando sobre el compartido.
+        """
+        with self.lock:
+            df = self.get()
+            return (df.copy() if copy else df), self._etag, self.index
+
+    def mutate(self, fn):
+        """Ejecuta fn(df, índice) sobre el DataFrame compartido bajo el lock del cache."""
+        with self.lock:
+            df = self.get()
+            return fn(df, self.index)
+
+    def set(self, df, etag, index=None):
+        """Reemplaza el contenido tras una subida propia (evita re-parsear).
+
+        `index` permite reutilizar el índice cuando `df` es una copia del
+        DataFrame cacheado con las mismas filas.
+        """
+        with self.lock:
+            if etag is None:
+                self._invalidate()
+            else:
+                self._store(df, etag, index)
+
+    def invalidate(self, etag=None):
+        """Descarta el roster. Con `etag`, solo si el cacheado sigue siendo ese.
+
+        Devuelve True si se descartó: tras un 412 de una subida propia
+        concurrente el cache ya apunta al ETag nuevo y no hace falta recargar.
+        """
+        with self.lock:
+            if etag is not None and etag != self._etag:
+                return False
+            self._invalidate()
+            return True
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "revalidations": self.revalidations,
+                "invalidations": self.invalidations,
+                "hit_ratio": round(self.hits / total, 3) if total else 0.0,
+                "ttl": self.ttl,
+                "etag": self._etag,
+                "rows": len(self._df) if self._df is not None else 0,
+                "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._df is not None else None,
+                "index": self.index.stats() if self.index is not None else None,
+            }
+
+    def _store(self, df, etag, index=None):
+        now = time.monotonic()
+        if index is None and self._build_index is not None:
+            index = self._build_index(df)
+        self._df = df
+        self._etag = etag
+        self.index = index
+        self._checked_at = now
+        self._loaded_at = now
+
+    def _invalidate(self):
+        self._df = None
+        self._etag = None
+        self.index = None
+        self._checked_at = 0.0
+        self.invalidations += 1
@@ -0,0 +1,483 @@
+# services/roster_db.py
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import date
+
+import pandas as pd
+
+from services.dashboard_stats import RESPONSABLES_VACIOS, fecha_dia, parse_fechas, resumen_dashboard
+from services.roster_index import DuplicateKeyError, normalize_folio, normalize_rut, normalize_rut_dv, rut_dv_key
+from services.roster_schema import ENTREGADA
+
+log = logging.getLogger("tne.sqlite")
+
+# Columnas internas: claves normalizadas para búsquedas y agregados por índice
+_CLAVES = ("_k_folio", "_k_rut", "_k_rut_dv", "_k_dia", "_k_resp")
+_INDICES = {
+    "ix_folio": "_k_folio",
+    "ix_rut": "_k_rut",
+    "ix_rut_dv": "_k_rut_dv",
+    "ix_dia": "_k_dia",
+    # Cubre el ranking (estado + responsable) y los filtros por estado
+    "ix_estado_resp": '"EntregadoStatus", _k_resp',
+    "ix_resp": "_k_resp",
+}
+# Tope de filas informadas en un DuplicateKeyError
+_MAX_DUPLICADAS = 20
+
+
+def _q(nombre: str) -> str:
+    return '"' + str(nombre).replace('"', '""') + '"'
+
+
+def _texto(value):
+    if value is None or value is pd.NA or (isinstance(value, float) and pd.isna(value)):
+        return None
+    return str(value)
+
+
+def _clave_resp(value) -> str:
+    return "" if value is None else str(value).upper().strip()
+
+
+def _dia(value):
+    dia = fecha_dia(value)
+    return dia.isoformat() if dia else None
+
+
+def _lower(value):
+    # lower() de SQLite solo conoce ASCII: "Ñ" no pasaría a "ñ"
+    return None if value is None else value.lower()
+
+
+# Roster en SQLite (modo WAL) como fuente de verdad en caliente.
+# El Excel se importa una vez (o cuando cambia afuera) y desde ahí /alumnos,
+# /entregar y /dashboard/stats son consultas por índice y updates de una fila.
+# Cada entrega queda además en la tabla `entregas` hasta que el Excel
+# exportado la incluye: si el blob se editó afuera, se reimporta y se
+# re-aplican, igual que el journal del modo write-behind.
+class RosterDB:
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._conns = []
+        self._conns_lock = threading.Lock()
+        # SQLite admite un solo escritor: se serializan acá en vez de esperar busy_timeout
+        self._write_lock = threading.Lock()
+        self.imports = 0
+        self.updates = 0
+        self.queries = 0
+        self.exports = 0
+        self.last_import_seconds = None
+        with self._write_lock:
+            self._conn().executescript("""
+                CREATE TABLE IF NOT EXISTS meta (clave TEXT PRIMARY KEY, valor TEXT);
+                CREATE TABLE IF NOT EXISTS entregas (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    folio TEXT, rut TEXT, responsable TEXT, fecha TEXT NOT NULL
+                );
+            """)
+        self._columnas = self._meta("columnas")
+        self._columnas = json.loads(self._columnas) if self._columnas else []
+
+    # --- Conexiones ---
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Una conexión por hilo: en WAL los lectores no bloquean al escritor
+            conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # FULL: cada entrega confirmada sobrevive a un corte de luz, como el fsync del journal
+            conn.execute("PRAGMA synchronous=FULL")
+            conn.create_function("lower_u", 1, _lower, deterministic=True)
+            self._local.conn = conn
+            with self._conns_lock:
+                self._conns.append(conn)
+        return conn
+
+    def close(self):
+        with self._conns_lock:
+            for conn in self._conns:
+                conn.close()
+            self._conns.clear()
+        self._local = threading.local()
+
+    def _meta(self, clave: str, conn=None):
+        row = (conn or self._conn()).execute("SELECT valor FROM meta WHERE clave = ?", (clave,)).fetchone()
+        return row[0] if row else None
+
+    @staticmethod
+    def _set_meta(conn, clave: str, valor):
+        conn.execute("INSERT OR REPLACE INTO meta (clave, valor) VALUES (?, ?)", (clave, valor))
+
+    # --- Estado ---
+    def columnas(self) -> list:
+        return list(self._columnas)
+
+    def vacia(self) -> bool:
+        return not self._columnas
+
+    def source_etag(self):
+        """ETag del Excel que refleja la base (último importado o exportado)."""
+        return self._meta("source_etag")
+
+    def pendientes(self) -> int:
+        """Entregas registradas que el Excel todavía no tiene."""
+        return self._conn().execute("SELECT COUNT(*) FROM entregas").fetchone()[0]
+
+    # --- Importación / exportación ---
+    def importar(self, df: pd.DataFrame, etag) -> int:
+        """Reemplaza el roster por `df` y re-aplica las entregas no exportadas.
+
+        Devuelve cuántas entregas pendientes se re-aplicaron.
+        """
+        t0 = time.perf_counter()
+        columnas = [str(c) for c in df.columns]
+        valores = df.astype(object).where(df.notna(), None)
+        folios = [normalize_folio(v) for v in df["Folio"].tolist()]
+        ruts = df["RUT"].tolist()
+        dvs = df["DigitoVerificador"].tolist()
+        dias = parse_fechas(df["FechaEntrega"]).dt.date.tolist()
+        filas = [
+            (
+                i, folios[i], normalize_rut(ruts[i]), rut_dv_key(ruts[i], dvs[i]),
+                None if pd.isna(dias[i]) else dias[i].isoformat(), _clave_resp(_texto(resp)),
+                *(_texto(v) for v in row),
+            )
+            for i, (resp, row) in enumerate(zip(df["Responsable"].tolist(), valores.itertuples(index=False, name=None)))
+        ]
+        definicion = ", ".join(["fila INTEGER PRIMARY KEY", *(f"{c} TEXT" for c in _CLAVES), *(f"{_q(c)} TEXT" for c in columnas)])
+        marcas = ", ".join("?" * (1 + len(_CLAVES) + len(columnas)))
+
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute("DROP TABLE IF EXISTS alumnos")
+                conn.execute(f"CREATE TABLE alumnos ({definicion})")
+                conn.executemany(f"INSERT INTO alumnos VALUES ({marcas})", filas)
+                # Índices después de la carga masiva: una sola pasada ordenada
+                for nombre, cols in _INDICES.items():
+                    conn.execute(f"CREATE INDEX {nombre} ON alumnos ({cols})")
+                self._set_meta(conn, "columnas", json.dumps(columnas, ensure_ascii=False))
+                self._set_meta(conn, "source_etag", etag)
+                reaplicadas = 0
+                for entry in conn.execute("SELECT folio, rut, responsable, fecha FROM entregas ORDER BY id").fetchall():
+                    try:
+                        if self._aplicar(conn, dict(zip(("folio", "rut", "responsable", "fecha"), entry))):
+                            reaplicadas += 1
+                    except DuplicateKeyError as e:
+                        log.warning(f"⚠️ [SQLite] Entrega ambigua omitida al reimportar: {e}")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            self._columnas = columnas
+        self.imports += 1
+        self.last_import_seconds = round(time.perf_counter() - t0, 3)
+        log.info("🗄️ Roster importado a SQLite", extra={"ctx": {
+            "filas": len(filas), "segundos": self.last_import_seconds, "reaplicadas": reaplicadas,
+        }})
+        return reaplicadas
+
+    def exportar(self):
+        """(DataFrame con las columnas del Excel, id de la última entrega incluida)."""
+        conn = self._conn()
+        # Una sola transacción de lectura: filas y entregas del mismo instante
+        conn.execute("BEGIN")
+        try:
+            hasta = conn.execute("SELECT COALESCE(MAX(id), 0) FROM entregas").fetchone()[0]
+            cols = ", ".join(_q(c) for c in self._columnas)
+            rows = conn.execute(f"SELECT {cols} FROM alumnos ORDER BY fila").fetchall()
+        finally:
+            conn.execute("COMMIT")
+        return pd.DataFrame(rows, columns=self._columnas), hasta
+
+    def marcar_exportado(self, etag, hasta: int) -> int:
+        """El Excel con ETag `etag` ya incluye las entregas hasta `hasta`. Devuelve cuántas eran."""
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            n = conn.execute("DELETE FROM entregas WHERE id <= ?", (hasta,)).rowcount
+            self._set_meta(conn, "source_etag", etag)
+            conn.execute("COMMIT")
+        self.exports += 1
+        return n
+
+    # --- Búsqueda ---
+    def _buscar(self, conn, campo: str, clave: str):
+        if not clave:
+            return None
+        filas = [r[0] for r in conn.execute(
+            f"SELECT fila FROM alumnos WHERE _k_{campo} = ? LIMIT {_MAX_DUPLICADAS + 1}", (clave,)
+        )]
+        if len(filas) > 1:
+            raise DuplicateKeyError(campo, clave, filas)
+        return filas[0] if filas else None
+
+    def _find(self, conn, folio=None, rut=None):
+        # Mismo orden que RosterIndex.find: Folio, RUT y luego RUT+DV sin guion
+        if folio:
+            fila = self._buscar(conn, "folio", normalize_folio(folio))
+            if fila is not None:
+                return fila
+        if rut:
+            fila = self._buscar(conn, "rut", normalize_rut(rut))
+            if fila is None and "-" not in str(rut):
+                fila = self._buscar(conn, "rut_dv", normalize_rut_dv(rut))
+            return fila
+        return None
+
+    def find(self, folio=None, rut=None):
+        return self._find(self._conn(), folio=folio, rut=rut)
+
+    def _fila(self, conn, fila: int) -> dict:
+        cols = ", ".join(_q(c) for c in self._columnas)
+        row = conn.execute(f"SELECT {cols} FROM alumnos WHERE fila = ?", (fila,)).fetchone()
+        return {c: ("" if v is None else v) for c, v in zip(self._columnas, row)}
+
+    def fila(self, fila: int) -> dict:
+        return self._fila(self._conn(), fila)
+
+    # --- Entregas ---
+    def _estado(self, conn, fila: int) -> tuple:
+        return conn.execute(
+            'SELECT "EntregadoStatus", "Responsable", "FechaEntrega" FROM alumnos WHERE fila = ?', (fila,)
+        ).fetchone()
+
+    def _aplicar(self, conn, entry: dict, fila=None):
+        """Marca la fila como entregada. Devuelve (fila, antes, después) o None."""
+        if fila is None:
+            fila = self._find(conn, folio=entry.get("folio"), rut=entry.get("rut"))
+        if fila is None:
+            return None
+        antes = self._estado(conn, fila)
+        responsable = entry.get("responsable") or antes[1]
+        conn.execute(
+            'UPDATE alumnos SET "EntregadoStatus" = ?, "Responsable" = ?, "FechaEntrega" = ?, _k_dia = ?, _k_resp = ? '
+            "WHERE fila = ?",
+            (ENTREGADA, responsable, entry["fecha"], _dia(entry["fecha"]), _clave_resp(responsable), fila),
+        )
+        return fila, antes, (ENTREGADA, responsable, entry["fecha"])
+
+    def _anotar(self, conn, entry: dict):
+        conn.execute(
+            "INSERT INTO entregas (folio, rut, responsable, fecha) VALUES (?, ?, ?, ?)",
+            (entry.get("folio"), entry.get("rut"), entry.get("responsable"), entry["fecha"]),
+        )
+
+    def entregar(self, entry: dict):
+        """Registra una entrega en una transacción.
+
+        Devuelve (fila, antes, después, fila actualizada) o None si no existe.
+        Lanza DuplicateKeyError si el Folio/RUT se repite.
+        """
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cambio = self._aplicar(conn, entry)
+                if cambio is None:
+                    conn.execute("ROLLBACK")
+                    return None
+                self._anotar(conn, entry)
+                updated = self._fila(conn, cambio[0])
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        self.updates += 1
+        return (*cambio, updated)
+
+    def entregar_lote(self, entries: list):
+        """Registra un lote en una sola transacción (un solo fsync).
+
+        Devuelve (resultados, cambios) con los mismos estados que
+        `resolver_lote`; `cambios` son tuplas (fila, antes, después, fila actualizada).
+        """
+        resultados = []
+        cambios = []
+        vistas = set()
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for i, entry in enumerate(entries):
+                    resultado = {"i": i, "folio": entry["folio"], "rut": entry["rut"]}
+                    resultados.append(resultado)
+                    if not (entry["folio"] or entry["rut"]):
+                        resultado["status"] = "invalido"
+                        continue
+                    try:
+                        fila = self._find(conn, folio=entry["folio"], rut=entry["rut"])
+                    except DuplicateKeyError as e:
+                        resultado.update(status="ambiguo", detail=f"{e}: filas {e.rows}")
+                        continue
+                    if fila is None:
+                        resultado["status"] = "no_encontrado"
+                    elif fila in vistas or self._estado(conn, fila)[0] == ENTREGADA:
+                        resultado.update(status="ya_entregada", updated=self._fila(conn, fila))
+                    else:
+                        vistas.add(fila)
+                        cambio = self._aplicar(conn, entry, fila)
+                        self._anotar(conn, entry)
+                        updated = self._fila(conn, fila)
+                        resultado.update(status="entregada", updated=updated)
+                        cambios.append((*cambio, updated))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        self.updates += len(cambios)
+        return resultados, cambios
+
+    # --- Consultas ---
+    def consultar(self, offset=0, limit=None, estado=None, responsable=None, q=None, fields=None, filas=None, campus=None):
+        """(filas de la página, total filtrado) con los filtros de /alumnos."""
+        where, params = [], []
+        if filas is not None:
+            if not filas:
+                return [], 0
+            where.append(f"fila IN ({', '.join('?' * len(filas))})")
+            params.extend(filas)
+        if estado:
+            term = estado.strip().upper()
+            where.append('substr(upper("EntregadoStatus"), 1, ?) = ?')
+            params.extend([len(term), term])
+        if campus:
+            where.append('upper("Campus") = ?')
+            params.append(campus.strip().upper())
+        if responsable:
+            where.append("_k_resp = ?")
+            params.append(responsable.strip().upper())
+        if q:
+            term = q.strip().lower()
+            rut_term = term.replace(".", "").replace(" ", "")
+            where.append(
+                '(instr(lower_u("NOMBRE COMPLETO"), ?) > 0 OR instr(lower_u("Folio"), ?) > 0 '
+                'OR instr(lower_u(replace("RUT", \'.\', \'\')), ?) > 0)'
+            )
+            params.extend([term, term, rut_term])
+        sql_where = f" WHERE {' AND '.join(where)}" if where else ""
+
+        columnas = fields or self._columnas
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            total = conn.execute(f"SELECT COUNT(*) FROM alumnos{sql_where}", params).fetchone()[0]
+            pagina = conn.execute(
+                f"SELECT {', '.join(_q(c) for c in columnas)} FROM alumnos{sql_where} ORDER BY fila LIMIT ? OFFSET ?",
+                [*params, -1 if limit is None else limit, offset],
+            ).fetchall()
+        finally:
+            conn.execute("COMMIT")
+        self.queries += 1
+        rows = [{c: ("" if v is None else v) for c, v in zip(columnas, row)} for row in pagina]
+        return rows, total
+
+    def dashboard(self, hoy: date) -> dict:
+        """Mismo resultado que DashboardAggregates.snapshot, con consultas por índice."""
+        conn = self._conn()
+        conn.execute("BEGIN")
+        try:
+            total = conn.execute("SELECT COUNT(*) FROM alumnos").fetchone()[0]
+            entregados = conn.execute(
+                'SELECT COUNT(*) FROM alumnos WHERE "EntregadoStatus" = ?', (ENTREGADA,)
+            ).fetchone()[0]
+            desde = date.fromordinal(hoy.toordinal() - 30).isoformat()
+            por_dia = {
+                date.fromisoformat(d): n
+                for d, n in conn.execute(
+                    "SELECT _k_dia, COUNT(*) FROM alumnos WHERE _k_dia >= ? GROUP BY _k_dia", (desde,)
+                )
+            }
+            vacios = sorted(RESPONSABLES_VACIOS)
+            por_responsable = dict(conn.execute(
+                f'SELECT _k_resp, COUNT(*) FROM alumnos WHERE "EntregadoStatus" = ? '
+                f"AND _k_resp NOT IN ({', '.join('?' * len(vacios))}) GROUP BY _k_resp",
+                (ENTREGADA, *vacios),
+            ).fetchall())
+        finally:
+            conn.execute("COMMIT")
+        self.queries += 1
+        return resumen_dashboard(total, entregados, por_dia, por_responsable, hoy)
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "rows": self._conn().execute("SELECT COUNT(*) FROM alumnos").fetchone()[0] if self._columnas else 0,
+            "pendientes": self.pendientes(),
+            "source_etag": self.source_etag(),
+            "imports": self.imports,
+            "last_import_seconds": self.last_import_seconds,
+            "updates": self.updates,
+            "queries": self.queries,
+            "exports": self.exports,
+        }
+
+
+# Regenera el Excel desde SQLite en segundo plano cada `interval` segundos si
+# hay entregas sin exportar (y al detenerse, para no dejar nada afuera).
+class ExportScheduler:
+    def __init__(self, export, interval: float = 30.0):
+        # export() -> cantidad de entregas incluidas en el Excel subido
+        self._export = export
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.runs = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_export_at = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sqlite-export", daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=60)
+        self._once()
+
+    def _once(self):
+        try:
+            n = self._export()
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            log.warning(f"⚠️ [SQLite] No se pudo exportar el Excel: {e}")
+            return
+        self.runs += 1
+        self.last_error = None
+        if n:
+            self.last_export_at = time.time()
+            log.info("💾 Excel regenerado desde SQLite", extra={"ctx": {"entregas": n}})
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            self._once()
+
+    def stats(self) -> dict:
+        return {
+            "interval": self.interval,
+            "runs": self.runs,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "last_export_at": self.last_export_at,
+        }
@@ -0,0 +1,130 @@
+# services/roster_index.py
+import logging
+import re
+import pandas as pd
+
+log = logging.getLogger("tne.indice")
+
+_RUT_SEPARATORS = re.compile(r"[\s.\-]")
+
+
+class DuplicateKeyError(ValueError):
+    """El Folio/RUT buscado aparece en más de una fila del roster."""
+
+    def __init__(self, field: str, key: str, rows: list):
+        self.field = field
+        self.key = key
+        self.rows = rows
+        super().__init__(f"{field} '{key}' duplicado en {len(rows)} filas")
+
+
+def _is_blank(value) -> bool:
+    return value is None or value is pd.NA or (isinstance(value, float) and pd.isna(value)) or str(value).strip().lower() in ("", "nan", "none")
+
+
+def normalize_folio(value) -> str:
+    if _is_blank(value):
+        return ""
+    s = str(value).strip().upper()
+    # Excel a veces entrega los folios numéricos como float ("1234.0")
+    if s.endswith(".0") and s[:-2].isdigit():
+        s = s[:-2]
+    return s
+
+
+def normalize_rut(value) -> str:
+    """Cuerpo del RUT sin puntos, espacios ni DV: '12.345.678-5' -> '12345678'."""
+    if _is_blank(value):
+        return ""
+    s = str(value).strip().upper()
+    if s.endswith(".0") and s[:-2].isdigit():
+        s = s[:-2]
+    if "-" in s:
+        s = s.rsplit("-", 1)[0]
+    return _RUT_SEPARATORS.sub("", s).lstrip("0")
+
+
+def normalize_rut_dv(value) -> str:
+    # RUT ingresado con DV pero sin guion: "12.345.678 5" -> "123456785"
+    if _is_blank(value):
+        return ""
+    return _RUT_SEPARATORS.sub("", str(value).strip().upper()).lstrip("0")
+
+
+def rut_dv_key(rut, dv) -> str:
+    """Clave RUT+DV sin guion de una fila ("" si el RUT ya trae DV o falta el DV)."""
+    body = normalize_rut(rut)
+    dv = "" if _is_blank(dv) else str(dv).strip().upper()
+    if body and dv and "-" not in str(rut):
+        return body + dv
+    return ""
+
+
+# Índice hash Folio -> fila y RUT -> fila, construido una vez por carga del
+# DataFrame. Las entregas no modifican Folio/RUT, así que el índice sigue
+# siendo válido para copias del mismo DataFrame.
+class RosterIndex:
+    def __init__(self, df: pd.DataFrame, folio_col: str = "Folio", rut_col: str = "RUT", dv_col: str = "DigitoVerificador"):
+        self.folio = {}
+        self.rut = {}
+        self.rut_dv = {}
+        self.duplicates = {"folio": {}, "rut": {}, "rut_dv": {}}
+
+        labels = df.index.tolist()
+        if folio_col in df.columns:
+            for label, value in zip(labels, df[folio_col].tolist()):
+                self._add("folio", normalize_folio(value), label)
+        if rut_col in df.columns:
+            dvs = df[dv_col].tolist() if dv_col in df.columns else [None] * len(labels)
+            for label, value, dv in zip(labels, df[rut_col].tolist(), dvs):
+                self._add("rut", normalize_rut(value), label)
+                # También RUT+DV sin guion ("123456785")
+                self._add("rut_dv", rut_dv_key(value, dv), label)
+
+        for field in ("folio", "rut"):
+            if self.duplicates[field]:
+                log.warning(f"⚠️ {len(self.duplicates[field])} {field.upper()} duplicados en el roster")
+
+    def _add(self, field: str, key: str, label):
+        if not key:
+            return
+        table = getattr(self, field)
+        if key in table:
+            rows = self.duplicates[field].setdefault(key, [table[key]])
+            if label not in rows:
+                rows.append(label)
+        else:
+            table[key] = label
+
+    def _lookup(self, field: str, key: str):
+        if key in self.duplicates[field]:
+            raise DuplicateKeyError(field, key, self.duplicates[field][key])
+        return getattr(self, field).get(key)
+
+    def find_with_field(self, folio=None, rut=None):
+        """Devuelve (índice, 'folio'|'rut') o (None, None). Lanza DuplicateKeyError."""
+        if folio:
+            idx = self._lookup("folio", normalize_folio(folio))
+            if idx is not None:
+                return idx, "folio"
+        if rut:
+            idx = self._lookup("rut", normalize_rut(rut))
+            if idx is None and "-" not in str(rut):
+                idx = self._lookup("rut_dv", normalize_rut_dv(rut))
+            if idx is not None:
+                return idx, "rut"
+        return None, None
+
+    def find(self, folio=None, rut=None):
+        return self.find_with_field(folio=folio, rut=rut)[0]
+
+    def stats(self) -> dict:
+        return {
+            "folios": len(self.folio),
+            "ruts": len(self.rut),
+            "duplicate_folios": len(self.duplicates["folio"]),
+            "duplicate_ruts": len(self.duplicates["rut"]),
+            "duplicates": {
+                field: dict(list(self.duplicates[field].items())[:20]) for field in ("folio", "rut")
+            },
+        }
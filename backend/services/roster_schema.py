@@ -0,0 +1,133 @@
+# services/roster_schema.py
+import io
+import numpy as np
+import pandas as pd
+
+COLUMN_MAPPING = {
+    'RUT': 'RUT', 'N° DE FOLIO': 'Folio', 'FOLIO': 'Folio', 'Folio': 'Folio',
+    'NOMBRE': 'NOMBRE COMPLETO', 'NOMBRE COMPLETO': 'NOMBRE COMPLETO',
+    'MAIL': 'Mail', 'Mail': 'Mail',
+    'ESTADO DE ENTREGA': 'EntregadoStatus', 'ENTREGADO': 'EntregadoStatus', 'EntregadoStatus': 'EntregadoStatus',
+    'FECHA DE ENTREGA': 'FechaEntrega', 'FechaEntrega': 'FechaEntrega',
+    'RESPONSABLE': 'Responsable', 'Responsable': 'Responsable',
+    'DV': 'DigitoVerificador', 'DigitoVerificador': 'DigitoVerificador',
+    'N° DE GUIA DESPACHO': 'GuiaDespacho', 'GuiaDespacho': 'GuiaDespacho',
+    'N° DE GUIA': 'NumeroGuia', 'NumeroGuia': 'NumeroGuia'
+}
+
+REQUIRED_COLUMNS = [
+    'Folio', 'RUT', 'DigitoVerificador', 'GuiaDespacho', 'NumeroGuia',
+    'NOMBRE COMPLETO', 'Mail', 'Responsable', 'FechaEntrega', 'EntregadoStatus'
+]
+
+ENTREGADA = 'ENTREGADA'
+PENDIENTE = 'PENDIENTE DE ENTREGA'
+
+_ESTADOS = {
+    **dict.fromkeys(['TRUE', 'SI', 'X', '1', 'ENTREGADA'], ENTREGADA),
+    **dict.fromkeys(['FALSE', 'NO', '0', '', 'NAN'], PENDIENTE),
+}
+
+# Columnas de pocos valores distintos: categóricas ("" incluido para que fillna("") funcione)
+CATEGORICAL_COLUMNS = ('EntregadoStatus', 'Responsable')
+# Claves de búsqueda: strings compactos (Arrow) en vez de objetos Python
+KEY_COLUMNS = ('Folio', 'RUT')
+
+try:
+    import pyarrow  # noqa: F401
+    KEY_DTYPE = pd.StringDtype("pyarrow")
+except ImportError:
+    KEY_DTYPE = pd.StringDtype()
+
+# Valores que pandas/Excel dejan en celdas vacías al pasarlas a texto
+TEXTOS_VACIOS = ("", "NAN", "NONE")
+
+
+def columna_texto(col: pd.Series) -> pd.Series:
+    """Columna como texto en mayúsculas, "" si está vacía (vectorizado, strings Arrow)."""
+    s = col.astype(KEY_DTYPE).fillna("").str.strip().str.upper()
+    return s.mask(s.isin(TEXTOS_VACIOS), "")
+
+
+def normalizar_estado(value) -> str:
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return PENDIENTE
+    s = str(value).strip().upper()
+    return _ESTADOS.get(s, s)
+
+
+def _texto(value) -> str:
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return ""
+    return str(value)
+
+
+def categorica(values: pd.Series, normalizar, extra=()) -> pd.Categorical:
+    """Normaliza una sola vez cada valor distinto y arma la categórica por códigos."""
+    codes, uniques = pd.factorize(values)
+    nombres = [normalizar(u) for u in uniques]
+    vacio = normalizar(None)
+    categorias = list(dict.fromkeys([*extra, vacio, *nombres]))
+    pos = {c: i for i, c in enumerate(categorias)}
+    # El código -1 (NaN) toma el último elemento: la categoría de vacío
+    mapa = np.array([pos[n] for n in nombres] + [pos[vacio]], dtype=np.int32)
+    return pd.Categorical.from_codes(mapa[codes], categories=categorias)
+
+
+def normalizar_roster(df: pd.DataFrame) -> pd.DataFrame:
+    """Renombra columnas, agrega las faltantes y fija tipos compactos.
+
+    FechaEntrega se deja como texto: lo escrito a mano en el Excel debe
+    volver al Excel tal cual (los agregados la parsean al reconstruirse).
+    """
+    columnas = [str(c).strip() for c in df.columns]
+    df.columns = [COLUMN_MAPPING.get(c, c) for c in columnas]
+
+    faltantes = {col: '' for col in REQUIRED_COLUMNS if col not in df.columns}
+    if faltantes:
+        df = df.assign(**faltantes)
+
+    df['EntregadoStatus'] = categorica(df['EntregadoStatus'], normalizar_estado, extra=(ENTREGADA, PENDIENTE, ''))
+    df['Responsable'] = categorica(df['Responsable'], _texto)
+    for col in KEY_COLUMNS:
+        df[col] = df[col].fillna('').astype(KEY_DTYPE)
+    return df
+
+
+def asignar(df: pd.DataFrame, idx, col: str, value):
+    """df.at[idx, col] = value, agregando la categoría si la columna es categórica."""
+    serie = df[col]
+    if isinstance(serie.dtype, pd.CategoricalDtype) and value not in serie.cat.categories:
+        df[col] = serie.cat.add_categories([value])
+    df.at[idx, col] = value
+
+
+def leer_roster(data: bytes, sheet=None) -> pd.DataFrame:
+    """Parsea y normaliza un roster (xlsx, o CSV si no es un libro).
+
+    `sheet` elige la hoja por nombre; sin ella se lee la primera. Es una
+    función de módulo para poder correrla en un ProcessPoolExecutor.
+    """
+    if sheet is not None:
+        return normalizar_roster(pd.read_excel(io.BytesIO(data), sheet_name=sheet, dtype=str, engine="openpyxl"))
+    try:
+        df = pd.read_excel(io.BytesIO(data), dtype=str, engine="openpyxl")
+    except:
+        try:
+            df = pd.read_csv(io.BytesIO(data), sep=',', encoding='utf-8', dtype=str)
+        except:
+            df = pd.read_csv(io.BytesIO(data), sep=';', encoding='latin1', dtype=str)
+
+    return normalizar_roster(df)
+
+
+def unir_rosters(partes: list, columna: str) -> pd.DataFrame:
+    """Concatena rosters ya normalizados [(valor, df)] agregando `columna` con el valor de cada uno."""
+    df = pd.concat([parte.assign(**{columna: valor}) for valor, parte in partes], ignore_index=True)
+    # concat de categóricas con categorías distintas deja objetos: se vuelven a armar
+    df['EntregadoStatus'] = categorica(df['EntregadoStatus'], normalizar_estado, extra=(ENTREGADA, PENDIENTE, ''))
+    df['Responsable'] = categorica(df['Responsable'], _texto)
+    df[columna] = categorica(df[columna], _texto)
+    for col in KEY_COLUMNS:
+        df[col] = df[col].fillna('').astype(KEY_DTYPE)
+    return df
@@ -0,0 +1,276 @@
+# services/roster_search.py
+import difflib
+import heapq
+import logging
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+
+import pandas as pd
+
+from services.roster_index import normalize_folio, normalize_rut, normalize_rut_dv, rut_dv_key
+from services.roster_schema import ENTREGADA, PENDIENTE, TEXTOS_VACIOS, columna_texto
+
+log = logging.getLogger("tne.busqueda")
+
+_MARCAS = re.compile(r"[\u0300-\u036f]")
+_TOKEN = re.compile(r"\w+")
+_SEPARADORES = re.compile(r"[\s.\-]")
+_ID = re.compile(r"\d+K?")
+# Campo de cada posición de claves_id()
+_CAMPOS = ("folio", "rut", "rut")
+# Prefijos muy cortos ("1") calzan con casi todo el roster: se corta el barrido
+_MAX_CANDIDATOS_ID = 2000
+# Tokens de 4+ letras sin coincidencia por prefijo se buscan con difflib
+_MIN_FUZZY = 4
+_FUZZY_CUTOFF = 0.75
+
+
+def plegar(texto) -> str:
+    """Mayúsculas sin tildes ni diéresis: 'Núñez Pérez' -> 'NUNEZ PEREZ'."""
+    return _MARCAS.sub("", unicodedata.normalize("NFKD", str(texto))).upper()
+
+
+def tokens_nombre(nombre) -> list:
+    if nombre is None or nombre is pd.NA or (isinstance(nombre, float) and pd.isna(nombre)):
+        return []
+    plegado = plegar(nombre)
+    return [] if plegado.strip() in TEXTOS_VACIOS else _TOKEN.findall(plegado)
+
+
+def claves_id(folio, rut, dv) -> tuple:
+    """Claves de búsqueda por prefijo de una fila: (folio, cuerpo del RUT, RUT con DV), "" si no hay."""
+    cuerpo = normalize_rut(rut)
+    completo = ""
+    if cuerpo:
+        # RUT con DV ("123456785"), venga el DV en su columna o en el mismo RUT
+        completo = rut_dv_key(rut, dv) or (normalize_rut_dv(rut) if "-" in str(rut) else "")
+    return normalize_folio(folio), cuerpo, completo if completo != cuerpo else ""
+
+
+def _claves_columnas(folio: pd.Series, rut: pd.Series, dv: pd.Series):
+    """claves_id() vectorizado: listas de folios, cuerpos de RUT y RUT con DV."""
+    folios = columna_texto(folio).str.replace(r"^(\d+)\.0$", r"\1", regex=True)
+    rut = columna_texto(rut).str.replace(r"^(\d+)\.0$", r"\1", regex=True)
+    con_guion = rut.str.contains("-", regex=False)
+    cuerpos = rut.str.replace(r"-[^-]*$", "", regex=True).str.replace(_SEPARADORES.pattern, "", regex=True).str.lstrip("0")
+    dv = columna_texto(dv)
+    completos = (cuerpos + dv).where(dv != "", "")
+    completos = completos.mask(con_guion, rut.str.replace(_SEPARADORES.pattern, "", regex=True).str.lstrip("0"))
+    completos = completos.where((cuerpos != "") & (completos != cuerpos), "")
+    return folios.tolist(), cuerpos.tolist(), completos.tolist()
+
+
+# Índice de búsqueda para el mesón: prefijos de RUT (solo dígitos, con o sin
+# DV) y Folio en una lista ordenada (bisect), y tokens de NOMBRE COMPLETO sin
+# tildes en un índice invertido con su vocabulario ordenado para prefijos.
+# Se construye al cargar el roster y cada entrega lo actualiza en O(log n):
+# los pendientes salen antes que los ya entregados cuando empatan.
+class RosterSearch:
+    def __init__(self, folio_col: str = "Folio", rut_col: str = "RUT", dv_col: str = "DigitoVerificador",
+                 nombre_col: str = "NOMBRE COMPLETO", estado_col: str = "EntregadoStatus", campus_col: str = "Campus"):
+        self.cols = {"folio": folio_col, "rut": rut_col, "dv": dv_col, "nombre": nombre_col,
+                     "estado": estado_col, "campus": campus_col}
+        self._lock = threading.Lock()
+        self._claves = []      # [(clave, fila, campo)] ordenada
+        self._tokens = {}      # token -> {filas}
+        self._vocab = []       # tokens ordenados
+        self._por_fila = {}    # fila -> (claves_id, tokens)
+        self._pos = {}         # fila -> posición en el roster (desempate estable)
+        self._entregadas = set()
+        self._campus = {}
+        self.rebuilds = 0
+        self.updates = 0
+        self.searches = 0
+        self.last_build_seconds = None
+        self.last_search_ms = None
+
+    # --- Construcción ---
+    def rebuild(self, df: pd.DataFrame):
+        t0 = time.perf_counter()
+        c = self.cols
+        n = len(df)
+        labels = df.index.tolist()
+
+        def columna(nombre):
+            return df[nombre] if nombre in df.columns else pd.Series(None, index=df.index, dtype=object)
+
+        # Plegado vectorizado: NFKD y sin marcas combinantes, igual que plegar()
+        nombres = columna(c["nombre"]).astype(object).where(columna(c["nombre"]).notna(), "").astype(str)
+        nombres = nombres.str.normalize("NFKD").str.replace(_MARCAS.pattern, "", regex=True).str.upper()
+        toks = [_TOKEN.findall(nombre) for nombre in nombres.mask(nombres.str.strip().isin(TEXTOS_VACIOS), "").tolist()]
+
+        columnas_id = _claves_columnas(columna(c["folio"]), columna(c["rut"]), columna(c["dv"]))
+        claves = [
+            (k, label, campo)
+            for campo, valores in zip(_CAMPOS, columnas_id)
+            for k, label in zip(valores, labels) if k
+        ]
+        claves.sort()
+        tokens = {}
+        for label, ts in zip(labels, toks):
+            for t in set(ts):
+                tokens.setdefault(t, set()).add(label)
+        por_fila = dict(zip(labels, zip(zip(*columnas_id), toks)))
+
+        estados = df[c["estado"]].astype(str).str.upper() if c["estado"] in df.columns else pd.Series("", index=df.index)
+        entregadas = set(df.index[estados == ENTREGADA].tolist())
+        campus = dict(zip(labels, columna_texto(df[c["campus"]]).tolist())) if c["campus"] in df.columns else {}
+
+        with self._lock:
+            self._claves = claves
+            self._tokens = tokens
+            self._vocab = sorted(tokens)
+            self._por_fila = por_fila
+            self._pos = {label: i for i, label in enumerate(labels)}
+            self._entregadas = entregadas
+            self._campus = campus
+            self.rebuilds += 1
+            self.last_build_seconds = round(time.perf_counter() - t0, 3)
+        log.info("🔎 Índice de búsqueda construido", extra={"ctx": {
+            "filas": n, "claves": len(claves), "tokens": len(tokens), "segundos": self.last_build_seconds,
+        }})
+
+    def update(self, label, fila: dict):
+        """Re-indexa una fila modificada con sus valores nuevos (columna -> valor).
+
+        Basta con las columnas que cambiaron; Folio, RUT y DV van siempre juntos.
+        """
+        c = self.cols
+        with self._lock:
+            if label not in self._pos:
+                return
+            self.updates += 1
+            if c["estado"] in fila:
+                if str(fila[c["estado"]]).upper() == ENTREGADA:
+                    self._entregadas.add(label)
+                else:
+                    self._entregadas.discard(label)
+            if c["campus"] in fila and self._campus:
+                self._campus[label] = str(fila[c["campus"]]).strip().upper()
+            ids_antes, toks_antes = self._por_fila[label]
+            ids, toks = ids_antes, toks_antes
+            if c["folio"] in fila or c["rut"] in fila:
+                ids = claves_id(fila.get(c["folio"]), fila.get(c["rut"]), fila.get(c["dv"]))
+            if c["nombre"] in fila:
+                toks = tokens_nombre(fila[c["nombre"]])
+            if ids != ids_antes:
+                for k, campo in zip(ids_antes, _CAMPOS):
+                    i = bisect_left(self._claves, (k, label, campo))
+                    if k and i < len(self._claves) and self._claves[i] == (k, label, campo):
+                        del self._claves[i]
+                for k, campo in zip(ids, _CAMPOS):
+                    if k:
+                        insort(self._claves, (k, label, campo))
+            if toks != toks_antes:
+                for t in set(toks_antes) - set(toks):
+                    filas = self._tokens.get(t)
+                    if filas is not None:
+                        filas.discard(label)
+                        if not filas:
+                            del self._tokens[t]
+                            del self._vocab[bisect_left(self._vocab, t)]
+                for t in set(toks) - set(toks_antes):
+                    if t not in self._tokens:
+                        self._tokens[t] = set()
+                        insort(self._vocab, t)
+                    self._tokens[t].add(label)
+            self._por_fila[label] = (ids, toks)
+
+    # --- Consulta ---
+    def _buscar_id(self, termino: str) -> dict:
+        # fila -> (puntaje, campo): exacto 1.0, prefijo según cuánto de la clave cubre
+        candidatos = {}
+        for prefijo in dict.fromkeys((termino, termino.lstrip("0"))):
+            if not prefijo:
+                continue
+            i = bisect_left(self._claves, (prefijo,))
+            for clave, label, campo in self._claves[i:i + _MAX_CANDIDATOS_ID]:
+                if not clave.startswith(prefijo):
+                    break
+                puntaje = len(prefijo) / len(clave)
+                if puntaje > candidatos.get(label, (0,))[0]:
+                    candidatos[label] = (puntaje, campo)
+        return candidatos
+
+    def _prefijo_vocab(self, token: str) -> list:
+        i = bisect_left(self._vocab, token)
+        j = i
+        while j < len(self._vocab) and self._vocab[j].startswith(token):
+            j += 1
+        return self._vocab[i:j]
+
+    def _buscar_token(self, token: str) -> dict:
+        # fila -> puntaje del token: exacto 1.0, prefijo 0.5-1.0, aproximado 0.5 x similitud
+        coincidencias = [(1.0 if t == token else 0.5 + 0.5 * len(token) / len(t), t) for t in self._prefijo_vocab(token)]
+        if not coincidencias and len(token) >= _MIN_FUZZY:
+            # Errores de tipeo: solo contra el vocabulario con la misma inicial
+            coincidencias = [
+                (0.5 * difflib.SequenceMatcher(None, token, t).ratio(), t)
+                for t in difflib.get_close_matches(token, self._prefijo_vocab(token[0]), n=5, cutoff=_FUZZY_CUTOFF)
+            ]
+        puntajes = {}
+        # De menor a mayor puntaje: cada fila queda con el de su mejor palabra
+        for puntaje, t in sorted(coincidencias):
+            puntajes.update(dict.fromkeys(self._tokens[t], puntaje))
+        return puntajes
+
+    def _buscar_nombre(self, tokens: list) -> dict:
+        # Todas las palabras deben aparecer; el puntaje es el promedio
+        por_token = sorted((self._buscar_token(t) for t in dict.fromkeys(tokens)), key=len)
+        if not por_token or not por_token[0]:
+            return {}
+        if len(por_token) == 1:
+            return {label: (p, "nombre") for label, p in por_token[0].items()}
+        comunes = set(por_token[0]).intersection(*por_token[1:])
+        return {label: (sum(d[label] for d in por_token) / len(por_token), "nombre") for label in comunes}
+
+    def search(self, q: str, limit: int = 10, estado: str | None = None, campus: str | None = None) -> list:
+        """[(fila, campo, puntaje)] de mayor a menor puntaje; 'campo' es folio, rut o nombre."""
+        t0 = time.perf_counter()
+        compacto = _SEPARADORES.sub("", plegar(q or "").strip())
+        with self._lock:
+            if not compacto:
+                candidatos = {}
+            elif _ID.fullmatch(compacto):
+                candidatos = self._buscar_id(compacto)
+            else:
+                candidatos = self._buscar_nombre(tokens_nombre(q))
+                if not candidatos and any(ch.isdigit() for ch in compacto):
+                    # Folios alfanuméricos ("A1234")
+                    candidatos = self._buscar_id(compacto)
+
+            if estado:
+                termino = estado.strip().upper()
+                quiere_entregadas = ENTREGADA.startswith(termino)
+                quiere_pendientes = PENDIENTE.startswith(termino)
+                candidatos = {
+                    label: v for label, v in candidatos.items()
+                    if (quiere_entregadas and label in self._entregadas) or (quiere_pendientes and label not in self._entregadas)
+                }
+            if campus:
+                campus = campus.strip().upper()
+                candidatos = {label: v for label, v in candidatos.items() if self._campus.get(label) == campus}
+
+            # Empates: pendientes primero (los que vienen a retirar), luego orden del roster
+            mejores = heapq.nsmallest(limit, candidatos.items(), key=lambda item: (
+                -item[1][0], item[0] in self._entregadas, self._pos[item[0]],
+            ))
+            self.searches += 1
+        self.last_search_ms = round((time.perf_counter() - t0) * 1000, 2)
+        return [(label, campo, round(puntaje, 3)) for label, (puntaje, campo) in mejores]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "filas": len(self._pos),
+                "claves": len(self._claves),
+                "tokens": len(self._tokens),
+                "rebuilds": self.rebuilds,
+                "updates": self.updates,
+                "searches": self.searches,
+                "last_build_seconds": self.last_build_seconds,
+                "last_search_ms": self.last_search_ms,
+            }
@@ -0,0 +1,110 @@
+# services/roster_snapshot.py
+import io
+import logging
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (motor de pandas para Parquet)
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+log = logging.getLogger("tne.snapshot")
+
+
+def _clean_etag(etag) -> str:
+    # Los metadatos de Azure viajan como cabeceras: sin comillas
+    return str(etag or "").strip('"')
+
+
+# Copia columnar (Parquet) del roster ya normalizado, guardada como blob
+# junto al Excel. El Excel sigue siendo la fuente de verdad: el snapshot solo
+# se usa si su metadato `source_etag` coincide con el ETag actual del Excel.
+class ParquetSnapshot:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled and HAS_PYARROW
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+        self.last_error = None
+
+    def load(self, file, source_etag):
+        """DataFrame del snapshot si corresponde a `source_etag`, si no None."""
+        if not self.enabled:
+            return None
+        try:
+            if file.stat().metadata.get("source_etag") != _clean_etag(source_etag):
+                self.misses += 1
+                return None
+            data, _ = file.download()
+            df = pd.read_parquet(io.BytesIO(data))
+            self.hits += 1
+            return df
+        except Exception as e:
+            # Snapshot inexistente o ilegible: se cae al Excel
+            self.misses += 1
+            self.last_error = str(e)
+            return None
+
+    async def load_async(self, client, source_etag, run_cpu):
+        """Como `load` con un BlobClient aio; el parseo va a `run_cpu`."""
+        if not self.enabled:
+            return None
+        try:
+            props = await client.get_blob_properties()
+            if (props.metadata or {}).get("source_etag") != _clean_etag(source_etag):
+                self.misses += 1
+                return None
+            data = await (await client.download_blob()).readall()
+            df = await run_cpu(pd.read_parquet, io.BytesIO(data))
+            self.hits += 1
+            return df
+        except Exception as e:
+            self.misses += 1
+            self.last_error = str(e)
+            return None
+
+    def save(self, file, df: pd.DataFrame, source_etag) -> bool:
+        if not self.enabled or not source_etag:
+            return False
+        try:
+            file.upload(self._to_parquet(df), metadata={"source_etag": _clean_etag(source_etag)})
+            self.writes += 1
+            return True
+        except Exception as e:
+            self._save_failed(e)
+            return False
+
+    async def save_async(self, client, df: pd.DataFrame, source_etag, run_cpu) -> bool:
+        if not self.enabled or not source_etag:
+            return False
+        try:
+            data = await run_cpu(self._to_parquet, df)
+            await client.upload_blob(data, overwrite=True, metadata={"source_etag": _clean_etag(source_etag)})
+            self.writes += 1
+            return True
+        except Exception as e:
+            self._save_failed(e)
+            return False
+
+    @staticmethod
+    def _to_parquet(df: pd.DataFrame) -> bytes:
+        bio = io.BytesIO()
+        df.to_parquet(bio, index=True)
+        return bio.getvalue()
+
+    def _save_failed(self, e: Exception):
+        self.errors += 1
+        self.last_error = str(e)
+        log.warning(f"⚠️ No se pudo guardar el Parquet: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "errors": self.errors,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,205 @@
+# services/roster_sources.py
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+
+import pandas as pd
+
+from services.roster_schema import REQUIRED_COLUMNS, leer_roster, unir_rosters
+from services.storage import StorageConflictError
+
+log = logging.getLogger("tne.sedes")
+
+CAMPUS_COLUMN = "Campus"
+_COLUMNAS_ENTREGA = ("EntregadoStatus", "Responsable", "FechaEntrega")
+
+
+@dataclass(frozen=True)
+class RosterSource:
+    campus: str
+    blob: str
+    # Hoja del libro; None = la primera
+    sheet: str | None = None
+
+
+def parse_sources(spec: str) -> list:
+    """Lee ROSTER_SOURCES: "Sede=ruta/archivo.xlsx#Hoja; Otra=ruta/otro.xlsx".
+
+    Entradas separadas por ';' o salto de línea. Sin "Sede=" la sede es el
+    nombre de la hoja o, si no hay hoja, el del archivo sin extensión.
+    """
+    sources = []
+    for entrada in spec.replace("\n", ";").split(";"):
+        entrada = entrada.strip()
+        if not entrada:
+            continue
+        campus, _, ruta = entrada.rpartition("=")
+        blob, _, sheet = ruta.strip().partition("#")
+        blob, sheet = blob.strip(), sheet.strip() or None
+        campus = campus.strip() or sheet or os.path.splitext(os.path.basename(blob))[0]
+        sources.append(RosterSource(campus, blob, sheet))
+    campuses = [s.campus for s in sources]
+    if len(set(campuses)) != len(campuses):
+        raise ValueError(f"ROSTER_SOURCES tiene sedes repetidas: {campuses}")
+    return sources
+
+
+def _sin_comillas(etag) -> str:
+    return str(etag or "").strip('"')
+
+
+# Varios rosters (un archivo o una hoja por sede) vistos como uno solo, con
+# la columna `Campus`. Los archivos se descargan en paralelo (hilos, es I/O) y
+# las hojas se parsean en un ProcessPoolExecutor acotado: openpyxl es CPU puro
+# y con el GIL los hilos no escalan. Así la carga tarda lo que el roster más
+# grande y no la suma de todos.
+# El ETag del conjunto combina los de cada archivo en orden ("a|b|c"); al
+# guardar solo se suben los archivos cuyas sedes cambiaron, cada uno con su If-Match.
+class RosterSet:
+    def __init__(self, storage, sources: list, download, upload, serialize, parse_workers: int = 0):
+        # download(file) -> (bytes, etag) ; upload(file, bytes, etag=) -> etag nuevo
+        # serialize({hoja: DataFrame}) -> bytes del libro
+        self.sources = sources
+        self.blobs = list(dict.fromkeys(s.blob for s in sources))
+        self.files = {blob: storage.file(blob) for blob in self.blobs}
+        self._download = download
+        self._upload = upload
+        self._serialize = serialize
+        self.parse_workers = parse_workers
+        self._io = ThreadPoolExecutor(max_workers=max(1, len(self.blobs)), thread_name_prefix="tne-sedes-io")
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # Columnas originales de cada sede, para no escribir las de otras
+        self._columnas = {}
+        self._guardadas = {}
+        self.loads = 0
+        self.saves = 0
+        self.files_uploaded = 0
+        self.last_download_seconds = None
+        self.last_parse_seconds = None
+
+    # --- ETag compuesto ---
+    def _componer(self, etags: dict) -> str:
+        return '"' + "|".join(_sin_comillas(etags[b]) for b in self.blobs) + '"'
+
+    def _separar(self, etag) -> dict:
+        partes = _sin_comillas(etag).split("|") if etag else []
+        if len(partes) != len(self.blobs):
+            return {}
+        return {b: f'"{p}"' for b, p in zip(self.blobs, partes)}
+
+    def etag(self) -> str:
+        etags = self._io.map(lambda blob: self.files[blob].stat().etag, self.blobs)
+        return self._componer(dict(zip(self.blobs, etags)))
+
+    # --- Carga ---
+    def _executor(self):
+        workers = min(self.parse_workers, len(self.sources))
+        if workers <= 1:
+            # Con un solo proceso no hay paralelismo y se paga el pickle del DataFrame
+            return None
+        with self._pool_lock:
+            if self._pool is None:
+                # spawn en todas las plataformas: igual que en Windows (build de escritorio)
+                # y sin heredar locks de los hilos del servidor
+                self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._pool
+
+    def _parsear(self, datos: dict) -> list:
+        pool = self._executor()
+        if pool is None:
+            return [leer_roster(datos[s.blob], s.sheet) for s in self.sources]
+        try:
+            futuros = [pool.submit(leer_roster, datos[s.blob], s.sheet) for s in self.sources]
+            return [f.result() for f in futuros]
+        except BrokenProcessPool:
+            # Un worker murió (p. ej. sin memoria): se recrea el pool en la próxima carga
+            with self._pool_lock:
+                self._pool = None
+            raise
+
+    def load(self):
+        """(DataFrame unido con la columna Campus, ETag compuesto)."""
+        t0 = time.perf_counter()
+        descargas = dict(zip(self.blobs, self._io.map(lambda blob: self._download(self.files[blob]), self.blobs)))
+        t1 = time.perf_counter()
+        partes = self._parsear({blob: data for blob, (data, _) in descargas.items()})
+        for source, df in zip(self.sources, partes):
+            self._columnas[source.campus] = list(df.columns)
+        df = unir_rosters([(s.campus, parte) for s, parte in zip(self.sources, partes)], CAMPUS_COLUMN)
+        self.loads += 1
+        self.last_download_seconds = round(t1 - t0, 3)
+        self.last_parse_seconds = round(time.perf_counter() - t1, 3)
+        log.info("🏫 Rosters de sedes cargados", extra={"ctx": {
+            "sedes": len(self.sources), "archivos": len(self.blobs), "filas": len(df),
+            "descarga_s": self.last_download_seconds, "parseo_s": self.last_parse_seconds,
+        }})
+        return df, self._componer({blob: etag for blob, (_, etag) in descargas.items()})
+
+    # --- Guardado ---
+    @staticmethod
+    def _huellas(df: pd.DataFrame) -> dict:
+        # Hash por fila (con su posición) de las columnas que cambian las entregas, sumado por sede
+        cols = df[list(_COLUMNAS_ENTREGA)].astype(object).fillna("").astype(str)
+        hashes = pd.util.hash_pandas_object(cols, index=True)
+        return hashes.groupby(df[CAMPUS_COLUMN].astype(str).values).sum().to_dict()
+
+    def registrar(self, df: pd.DataFrame):
+        """Recuerda el contenido de cada sede tal como está en el almacenamiento."""
+        self._guardadas = self._huellas(df)
+
+    def cambiadas(self, df: pd.DataFrame) -> set:
+        """Sedes cuyo contenido difiere del último cargado o subido."""
+        return {campus for campus, h in self._huellas(df).items() if self._guardadas.get(campus) != h}
+
+    def save(self, df: pd.DataFrame, etag, campuses=None) -> str:
+        """Sube los archivos de las sedes en `campuses` (None = todas).
+
+        Devuelve el ETag compuesto nuevo. Lanza StorageConflictError si algún
+        archivo cambió desde `etag`.
+        """
+        etags = self._separar(etag)
+        if etag and not etags:
+            # ETag de otra configuración de sedes: hay que recargar
+            raise StorageConflictError(f"ETag compuesto inválido: {etag}")
+        por_sede = {str(c): parte for c, parte in df.groupby(CAMPUS_COLUMN, observed=True, sort=False)}
+        for blob in self.blobs:
+            sources = [s for s in self.sources if s.blob == blob]
+            if campuses is not None and not any(s.campus in campuses for s in sources):
+                continue
+            hojas = {}
+            for s in sources:
+                parte = por_sede.get(s.campus, df.iloc[0:0])
+                columnas = self._columnas.get(s.campus) or [
+                    # Cargado desde el snapshot: se omiten las columnas que solo tienen otras sedes
+                    c for c in parte.columns if c != CAMPUS_COLUMN and (c in REQUIRED_COLUMNS or parte[c].notna().any())
+                ]
+                hojas[s.sheet] = parte[[c for c in columnas if c in parte.columns]]
+            # Un libro con varias sedes se reescribe entero (solo con sus hojas configuradas)
+            etags[blob] = self._upload(self.files[blob], self._serialize(hojas), etag=etags.get(blob))
+            self.files_uploaded += 1
+        self._guardadas = self._huellas(df)
+        self.saves += 1
+        return self._componer(etags) if len(etags) == len(self.blobs) else None
+
+    def close(self):
+        self._io.shutdown(wait=False)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "sedes": [s.campus for s in self.sources],
+            "archivos": len(self.blobs),
+            "parse_workers": self.parse_workers,
+            "loads": self.loads,
+            "saves": self.saves,
+            "files_uploaded": self.files_uploaded,
+            "last_download_seconds": self.last_download_seconds,
+            "last_parse_seconds": self.last_parse_seconds,
+        }
@@ -0,0 +1,40 @@
+# services/roster_versions.py
+import threading
+import time
+
+
+# Revisión monótona del roster para sincronización incremental (?since=).
+# Cada cambio de fila sube la versión y la registra en la fila; una recarga
+# completa del Excel fija una nueva versión base que obliga a los clientes
+# con una versión anterior a resincronizar todo.
+class RosterVersions:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Arranca en milisegundos epoch para seguir creciendo entre reinicios
+        self.version = int(time.time() * 1000)
+        self.base = self.version
+        self._rows = {}
+
+    def reset(self) -> int:
+        with self._lock:
+            self.version += 1
+            self.base = self.version
+            self._rows.clear()
+            return self.version
+
+    def touch(self, label) -> int:
+        with self._lock:
+            self.version += 1
+            self._rows[label] = self.version
+            return self.version
+
+    def changed_since(self, since: int):
+        """(completo, filas). completo=True si el cliente debe resincronizar todo."""
+        with self._lock:
+            if since < self.base or since > self.version:
+                return True, None
+            return False, sorted(label for label, v in self._rows.items() if v > since)
+
+    def current(self) -> int:
+        with self._lock:
+            return self.version
@@ -0,0 +1,360 @@
+# services/storage.py
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+
+log = logging.getLogger("tne.storage")
+
+STORAGE_BACKENDS = ("azure", "sharepoint", "local")
+
+
+class StorageConflictError(Exception):
+    """El archivo cambió desde el ETag con el que se pidió escribir o leer (412)."""
+
+
+class StorageNotFoundError(Exception):
+    """El archivo no existe en el almacenamiento."""
+
+
+@dataclass
+class FileStat:
+    etag: str
+    size: int
+    metadata: dict = field(default_factory=dict)
+
+
+# Interfaz común de un archivo en el almacenamiento (Excel, snapshot, usuarios).
+# Todas las implementaciones usan ETags opacos: `upload(..., etag=)` y
+# `stream(..., etag=)` lanzan StorageConflictError si el archivo cambió.
+class StorageFile(ABC):
+    name = ""
+    # Si guarda metadatos junto al archivo (lo necesita el snapshot Parquet)
+    supports_metadata = True
+
+    @abstractmethod
+    def stat(self) -> FileStat:
+        ...
+
+    @abstractmethod
+    def download(self):
+        """(bytes, etag) leídos de forma consistente."""
+
+    @abstractmethod
+    def upload(self, data: bytes, etag: str | None = None, metadata: dict | None = None) -> str:
+        """Reemplaza el archivo (con `etag`, solo si no cambió). Devuelve el nuevo ETag."""
+
+    @abstractmethod
+    def stream(self, offset: int = 0, length: int | None = None, etag: str | None = None):
+        """Iterador de chunks del tramo pedido.
+
+        El archivo se abre (y el ETag se valida) al llamar, no al iterar: los
+        errores llegan antes de que el endpoint envíe los headers.
+        """
+
+
+# --- Azure Blob ---
+class AzureFile(StorageFile):
+    def __init__(self, storage, name: str):
+        self._storage = storage
+        self._blob = None
+        self.name = name
+
+    @property
+    def _client(self):
+        if self._blob is None:
+            self._blob = self._storage.container().get_blob_client(self.name)
+        return self._blob
+
+    def stat(self) -> FileStat:
+        from azure.core.exceptions import ResourceNotFoundError
+        try:
+            props = self._client.get_blob_properties()
+        except ResourceNotFoundError as e:
+            raise StorageNotFoundError(self.name) from e
+        return FileStat(props.etag, props.size, dict(props.metadata or {}))
+
+    def download(self):
+        from azure.core.exceptions import ResourceNotFoundError
+        try:
+            downloader = self._client.download_blob()
+        except ResourceNotFoundError as e:
+            raise StorageNotFoundError(self.name) from e
+        return downloader.readall(), downloader.properties.etag
+
+    def upload(self, data: bytes, etag: str | None = None, metadata: dict | None = None) -> str:
+        from azure.core import MatchConditions
+        from azure.core.exceptions import ResourceModifiedError
+        kwargs = {"overwrite": True}
+        if etag:
+            kwargs.update(etag=etag, match_condition=MatchConditions.IfNotModified)
+        if metadata is not None:
+            kwargs["metadata"] = metadata
+        try:
+            result = self._client.upload_blob(data, **kwargs)
+        except ResourceModifiedError as e:
+            raise StorageConflictError(self.name) from e
+        return (result or {}).get("etag")
+
+    def stream(self, offset: int = 0, length: int | None = None, etag: str | None = None):
+        from azure.core import MatchConditions
+        from azure.core.exceptions import ResourceModifiedError
+        kwargs = {"offset": offset, "length": length}
+        if etag:
+            kwargs.update(etag=etag, match_condition=MatchConditions.IfNotModified)
+        try:
+            downloader = self._client.download_blob(**kwargs)
+        except ResourceModifiedError as e:
+            raise StorageConflictError(self.name) from e
+        return downloader.chunks()
+
+
+# El SDK (azure.storage.blob) se importa y el cliente se crea en el primer
+# uso, no al importar main: el servidor abre el puerto antes.
+class AzureStorage:
+    def __init__(self, account_name: str, container: str, credential):
+        self._account_url = f"https://{account_name}.blob.core.windows.net"
+        self._container_name = container
+        self._credential = credential
+        self._container = None
+        self._lock = threading.Lock()
+        self.description = f"Azure Blob {container}"
+
+    def container(self):
+        with self._lock:
+            if self._container is None:
+                from azure.storage.blob import BlobServiceClient
+                service = BlobServiceClient(account_url=self._account_url, credential=self._credential)
+                self._container = service.get_container_client(self._container_name)
+            return self._container
+
+    def file(self, name: str) -> AzureFile:
+        return AzureFile(self, name)
+
+
+# --- SharePoint (Microsoft Graph) ---
+class SharePointFile(StorageFile):
+    supports_metadata = False
+
+    def __init__(self, client, path: str):
+        self._client = client
+        self.name = path
+
+    def stat(self) -> FileStat:
+        import requests
+        try:
+            item = self._client.item(self.name)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                raise StorageNotFoundError(self.name) from e
+            raise
+        return FileStat(item["eTag"], int(item.get("size", 0)))
+
+    def download(self):
+        from services.graph_api import GraphConflictError
+        try:
+            return self._client.download_with_etag(self.name)
+        except GraphConflictError as e:
+            raise StorageConflictError(self.name) from e
+
+    def upload(self, data: bytes, etag: str | None = None, metadata: dict | None = None) -> str:
+        from services.graph_api import GraphConflictError
+        try:
+            return self._client.upload(self.name, data, etag=etag)
+        except GraphConflictError as e:
+            raise StorageConflictError(self.name) from e
+
+    def stream(self, offset: int = 0, length: int | None = None, etag: str | None = None):
+        import requests
+        from services.graph_api import GraphConflictError
+        try:
+            return self._client.stream(self.name, offset=offset, length=length, etag=etag)
+        except GraphConflictError as e:
+            raise StorageConflictError(self.name) from e
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                raise StorageNotFoundError(self.name) from e
+            raise
+
+
+class SharePointStorage:
+    def __init__(self, base_path: str = ""):
+        from services.graph_api import get_client
+        self._client = get_client()
+        self._base = base_path.strip("/")
+        self.description = f"SharePoint {self._client.site_name}/{self._client.drive_name}"
+
+    def file(self, name: str) -> SharePointFile:
+        return SharePointFile(self._client, f"{self._base}/{name}" if self._base else name)
+
+
+# --- Disco local ---
+_local_lock = threading.Lock()
+
+
+def _etag_local(st: os.stat_result) -> str:
+    # os.replace crea un inode nuevo en cada escritura: inode+mtime+tamaño identifican la versión
+    return f'"{st.st_ino:x}-{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+
+class LocalFile(StorageFile):
+    def __init__(self, root: str, name: str):
+        self.name = name
+        self.path = os.path.join(root, *name.split("/"))
+        self._meta_path = self.path + ".meta.json"
+
+    def _metadata(self) -> dict:
+        try:
+            with open(self._meta_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def stat(self) -> FileStat:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError as e:
+            raise StorageNotFoundError(self.name) from e
+        return FileStat(_etag_local(st), st.st_size, self._metadata())
+
+    def _open(self):
+        try:
+            return open(self.path, "rb")
+        except FileNotFoundError as e:
+            raise StorageNotFoundError(self.name) from e
+
+    def download(self):
+        with self._open() as f:
+            # El ETag sale del mismo descriptor: corresponde a los bytes leídos
+            st = os.fstat(f.fileno())
+            return f.read(), _etag_local(st)
+
+    def upload(self, data: bytes, etag: str | None = None, metadata: dict | None = None) -> str:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        sufijo = f"{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp = self._escribir_tmp(f"{self.path}.{sufijo}", data)
+        meta_tmp = None
+        if metadata is not None:
+            meta_tmp = self._escribir_tmp(f"{self._meta_path}.{sufijo}", json.dumps(metadata).encode("utf-8"))
+        with _local_lock:
+            if etag:
+                try:
+                    actual = _etag_local(os.stat(self.path))
+                except FileNotFoundError:
+                    actual = None
+                if actual != etag:
+                    for t in (tmp, meta_tmp):
+                        if t:
+                            os.remove(t)
+                    raise StorageConflictError(self.name)
+            self._replace(tmp, self.path)
+            # Los metadatos van después de los datos: nunca describen un archivo que aún no está
+            if meta_tmp:
+                self._replace(meta_tmp, self._meta_path)
+            return _etag_local(os.stat(self.path))
+
+    @staticmethod
+    def _escribir_tmp(tmp: str, data: bytes) -> str:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        return tmp
+
+    def _replace(self, tmp: str, destino: str, intentos: int = 20):
+        # En Windows no se puede reemplazar un archivo abierto por otro lector
+        for intento in range(intentos):
+            try:
+                os.replace(tmp, destino)
+                return
+            except PermissionError:
+                if intento == intentos - 1:
+                    os.remove(tmp)
+                    raise
+                log.debug(f"{self.name} en uso, reintentando reemplazo")
+                time.sleep(0.05)
+
+    def stream(self, offset: int = 0, length: int | None = None, etag: str | None = None, chunk_size: int = 1024 * 1024):
+        # No es streaming real: el tramo pedido se lee completo a memoria y el
+        # archivo se cierra antes de responder. En Windows un lector abierto
+        # durante toda la transferencia bloquearía el os.replace de una subida
+        # o de un flush concurrente
+        with self._open() as f:
+            st = os.fstat(f.fileno())
+            if etag and _etag_local(st) != etag:
+                raise StorageConflictError(self.name)
+            end = st.st_size if length is None else min(st.st_size, offset + length)
+            data = b""
+            if offset < end:
+                f.seek(offset)
+                data = f.read(end - offset)
+        return self._chunks(data, chunk_size)
+
+    @staticmethod
+    def _chunks(data: bytes, chunk_size: int):
+        view = memoryview(data)
+        for i in range(0, len(data), chunk_size):
+            yield bytes(view[i:i + chunk_size])
+
+
+class LocalStorage:
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self.description = f"disco local {root}"
+
+    def file(self, name: str) -> LocalFile:
+        return LocalFile(self.root, name)
+
+
+# --- Sin almacenamiento ---
+class StorageUnavailableError(Exception):
+    """El almacenamiento configurado no se pudo inicializar."""
+
+
+# Reemplazo cuando crear_storage falla (p. ej. SharePoint sin credenciales):
+# main se importa igual y cada acceso lanza el error original.
+class UnavailableFile(StorageFile):
+    supports_metadata = False
+
+    def __init__(self, name: str, error: str):
+        self.name = name
+        self._error = error
+
+    def _fallar(self):
+        raise StorageUnavailableError(self._error)
+
+    def stat(self) -> FileStat:
+        self._fallar()
+
+    def download(self):
+        self._fallar()
+
+    def upload(self, data: bytes, etag: str | None = None, metadata: dict | None = None) -> str:
+        self._fallar()
+
+    def stream(self, offset: int = 0, length: int | None = None, etag: str | None = None):
+        self._fallar()
+
+
+class UnavailableStorage:
+    def __init__(self, backend: str, error: Exception):
+        self.error = f"Almacenamiento {backend} no disponible: {error}"
+        self.description = f"{backend} (no disponible)"
+
+    def file(self, name: str) -> UnavailableFile:
+        return UnavailableFile(name, self.error)
+
+
+def crear_storage(backend: str, **config):
+    """Construye el almacenamiento configurado (STORAGE_BACKEND)."""
+    if backend == "azure":
+        return AzureStorage(config["account_name"], config["container"], config["credential"])
+    if backend == "sharepoint":
+        return SharePointStorage(config.get("base_path", ""))
+    if backend == "local":
+        return LocalStorage(config["root"])
+    raise ValueError(f"STORAGE_BACKEND desconocido: {backend} (opciones: {', '.join(STORAGE_BACKENDS)})")
@@ -0,0 +1,109 @@
+# services/warmup.py
+import asyncio
+import logging
+import time
+
+from fastapi.concurrency import run_in_threadpool
+
+log = logging.getLogger("tne.warmup")
+
+PENDIENTE = "pendiente"
+CARGANDO = "cargando"
+LISTO = "listo"
+ERROR = "error"
+
+
+# Precarga al arrancar: las tareas (roster, roles, ...) corren a la vez en
+# segundo plano mientras el servidor ya acepta conexiones, así el primer
+# /login o /alumnos no paga descarga + parseo. /ready expone el estado para
+# que el front muestre "cargando" en vez de quedar esperando un request.
+# Las tareas son funciones bloqueantes (van al threadpool) o corrutinas.
+class Warmup:
+    def __init__(self, tasks: dict, enabled: bool = True):
+        self.tasks = tasks
+        self.enabled = enabled
+        self.estado = dict.fromkeys(tasks, PENDIENTE)
+        self.segundos = {}
+        self.errores = {}
+        self.runs = 0
+        self.started_at = None
+        self.finished_at = None
+        self._task = None
+
+    def start(self):
+        """Lanza (o relanza, solo las que fallaron) las tareas. Requiere event loop."""
+        if not self.enabled or self.running:
+            return
+        nombres = [n for n, e in self.estado.items() if e != LISTO]
+        if not nombres:
+            return
+        self.runs += 1
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self._task = asyncio.create_task(self._run(nombres))
+
+    def reintentar(self, espera: float = 5.0):
+        """Relanza lo que falló si la última corrida terminó hace al menos `espera` segundos."""
+        if self.finished_at is not None and time.monotonic() - self.finished_at >= espera:
+            self.start()
+
+    async def stop(self):
+        if self.running:
+            # Los hilos en curso terminan solos; solo se deja de esperarlos
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def ready(self) -> bool:
+        # Sin precarga todo se carga en el primer request: no hay nada que esperar
+        if not self.enabled:
+            return True
+        return all(e == LISTO for e in self.estado.values())
+
+    async def _run(self, nombres: list):
+        await asyncio.gather(*(self._una(n) for n in nombres))
+        self.finished_at = time.monotonic()
+        total = round(self.finished_at - self.started_at, 3)
+        if self.ready:
+            log.info("🔥 Precarga lista", extra={"ctx": {"segundos": total, **self.segundos}})
+        else:
+            log.warning("⚠️ Precarga incompleta", extra={"ctx": {"segundos": total, "errores": self.errores}})
+
+    async def _una(self, nombre: str):
+        fn = self.tasks[nombre]
+        self.estado[nombre] = CARGANDO
+        t0 = time.perf_counter()
+        try:
+            if asyncio.iscoroutinefunction(fn):
+                await fn()
+            else:
+                await run_in_threadpool(fn)
+        except Exception as e:
+            self.estado[nombre] = ERROR
+            self.errores[nombre] = str(e)
+            log.warning(f"⚠️ Precarga de {nombre} fallida: {e}")
+        else:
+            self.estado[nombre] = LISTO
+            self.errores.pop(nombre, None)
+        finally:
+            self.segundos[nombre] = round(time.perf_counter() - t0, 3)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "running": self.running,
+            "runs": self.runs,
+            "componentes": {
+                n: {"estado": e, "segundos": self.segundos.get(n), "error": self.errores.get(n)}
+                for n, e in self.estado.items()
+            },
+            "segundos": round((self.finished_at or time.monotonic()) - self.started_at, 3) if self.started_at else None,
+        }
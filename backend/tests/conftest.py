@@ -0,0 +1,109 @@
+# tests/conftest.py
+import io
+import itertools
+import os
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from services.storage import FileStat, StorageConflictError, StorageFile, StorageNotFoundError
+
+_etags = itertools.count(1)
+
+
+# Archivo en memoria con ETag, If-Match (412) y latencia de subida opcional
+class MemoryFile(StorageFile):
+    def __init__(self, name: str, latency: float = 0.0):
+        self.name = name
+        self.latency = latency
+        self.data = None
+        self.etag = None
+        self.metadata = {}
+        self.uploads = 0
+        self._lock = threading.Lock()
+
+    def stat(self) -> FileStat:
+        with self._lock:
+            if self.data is None:
+                raise StorageNotFoundError(self.name)
+            return FileStat(self.etag, len(self.data), dict(self.metadata))
+
+    def download(self):
+        with self._lock:
+            if self.data is None:
+                raise StorageNotFoundError(self.name)
+            return self.data, self.etag
+
+    def upload(self, data: bytes, etag: str | None = None, metadata: dict | None = None) -> str:
+        if self.latency:
+            # Tiempo en vuelo: la comparación del ETag ocurre al llegar
+            time.sleep(self.latency)
+        with self._lock:
+            if etag and etag != self.etag:
+                raise StorageConflictError(self.name)
+            self.data = bytes(data)
+            self.etag = f'"{next(_etags)}"'
+            if metadata is not None:
+                self.metadata = dict(metadata)
+            self.uploads += 1
+            return self.etag
+
+    def stream(self, offset: int = 0, length: int | None = None, etag: str | None = None):
+        with self._lock:
+            if self.data is None:
+                raise StorageNotFoundError(self.name)
+            if etag and etag != self.etag:
+                raise StorageConflictError(self.name)
+            data = self.data[offset:None if length is None else offset + length]
+        return iter([data])
+
+
+def roster_xlsx(filas: int) -> bytes:
+    """Excel con las columnas originales de la planilla (sin normalizar)."""
+    df = pd.DataFrame({
+        'N° DE FOLIO': [str(100000 + i) for i in range(filas)],
+        'RUT': [str(10_000_000 + i * 7) for i in range(filas)],
+        'DV': [str(i % 10) for i in range(filas)],
+        'NOMBRE COMPLETO': [f'ALUMNO {i}' for i in range(filas)],
+        'ESTADO DE ENTREGA': ['PENDIENTE DE ENTREGA'] * filas,
+        'RESPONSABLE': [''] * filas,
+        'FECHA DE ENTREGA': [None] * filas,
+    })
+    buf = io.BytesIO()
+    df.to_excel(buf, index=False)
+    return buf.getvalue()
+
+
+@pytest.fixture(scope="session")
+def main(tmp_path_factory):
+    """main importado una vez con almacenamiento en memoria; el entorno se restaura al terminar el import."""
+    tmp = tmp_path_factory.mktemp("backend")
+    antes = set(os.environ)
+    with pytest.MonkeyPatch.context() as mp:
+        for nombre, valor in {
+            "STORAGE_BACKEND": "local",
+            "LOCAL_STORAGE_DIR": str(tmp / "storage"),
+            "JOURNAL_PATH": str(tmp / "entregas_journal.jsonl"),
+            "SQLITE_PATH": str(tmp / "roster.db"),
+            "ROSTER_STORE": "excel",
+            "ROSTER_SOURCES": "",
+            "ENTREGAS_WRITE_BEHIND": "0",
+            # Sin revalidar el ETag dentro de una prueba: el cache queda viejo a propósito
+            "ROSTER_CACHE_TTL": "300",
+            "UPLOAD_RETRY_BASE": "0.01",
+            "LOG_LEVEL": "WARNING",
+        }.items():
+            mp.setenv(nombre, valor)
+        import main
+    # load_dotenv de main agrega las variables de backend/.env
+    for nombre in set(os.environ) - antes:
+        del os.environ[nombre]
+
+    main.roster_file = MemoryFile(main.EXCEL_BLOB_NAME)
+    main.snapshot_file = MemoryFile(main.SNAPSHOT_BLOB_NAME)
+    main.auth_file = MemoryFile(main.AUTH_BLOB_NAME)
+    main.roster_file.upload(roster_xlsx(50))
+    main.roster_cache.get()
+    return main
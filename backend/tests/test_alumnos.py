@@ -0,0 +1,15 @@
+# tests/test_alumnos.py
+from fastapi.testclient import TestClient
+
+
+def test_version_de_la_primera_carga_sirve_para_since(main):
+    # Próximo /alumnos con el cache vacío: la carga reinicia las versiones
+    main.roster_cache.invalidate()
+    client = TestClient(main.app)
+
+    completo = client.get("/alumnos").json()
+    assert completo["full"] is True and completo["count"] == 50
+
+    delta = client.get("/alumnos", params={"since": completo["version"]}).json()
+    assert delta["full"] is False
+    assert delta["count"] == 0
@@ -0,0 +1,139 @@
+# tests/test_commit_roster.py
+"""commit_roster contra el almacenamiento en memoria de tests/conftest.py."""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.roster_schema import asignar
+from services.storage import StorageConflictError
+
+
+@pytest.fixture
+def eventos(main, monkeypatch):
+    publicados = []
+    monkeypatch.setattr(main.live_events, "publish", lambda evento, data: publicados.append(evento))
+    return publicados
+
+
+def marcar(folio: str, responsable: str):
+    def mutate(df, index):
+        idx = index.find(folio=folio)
+        asignar(df, idx, 'Responsable', responsable)
+        return idx
+    return mutate
+
+
+def responsables(main, folios) -> dict:
+    data, _ = main.download_excel_with_etag(main.roster_file)
+    df = main.read_excel_from_bytes(data).set_index('Folio')
+    return {f: df.at[f, 'Responsable'] for f in folios}
+
+
+def contadores(main) -> dict:
+    return {**main.upload_stats, "misses": main.roster_cache.misses}
+
+
+def delta(antes: dict, despues: dict) -> dict:
+    return {k: despues[k] - antes[k] for k in ("uploads", "conflicts", "reloads", "failures", "misses")}
+
+
+def test_412_por_edicion_ajena_recarga_y_reaplica(main, eventos):
+    # Alguien edita el Excel afuera: el cache queda con el ETag viejo
+    data, etag = main.download_excel_with_etag(main.roster_file)
+    df = main.read_excel_from_bytes(data)
+    asignar(df, df.index[df['Folio'] == "100001"][0], 'Responsable', "EXTERNO")
+    main.upload_excel_bytes(main.roster_file, main.df_to_excel_bytes(df), etag=etag)
+
+    antes = contadores(main)
+    main.commit_roster(marcar("100002", "PROPIO"))
+
+    assert delta(antes, contadores(main)) == {"uploads": 1, "conflicts": 1, "reloads": 1, "failures": 0, "misses": 1}
+    # Se conservan el cambio ajeno y el propio, en el blob y en el cache
+    assert responsables(main, ["100001", "100002"]) == {"100001": "EXTERNO", "100002": "PROPIO"}
+    cache = main.roster_cache.get().set_index('Folio')
+    assert cache.at["100001", 'Responsable'] == "EXTERNO"
+    assert eventos == ["recarga"]
+
+
+def test_412_con_cache_ya_actualizado_no_recarga(main, eventos, monkeypatch):
+    subir = main.subir_roster
+    intentos = []
+
+    def subir_tras_otra_subida(df, etag):
+        if not intentos:
+            # Otra subida propia ganó la carrera y ya movió el cache al ETag nuevo
+            otro, _, index = main.roster_cache.snapshot(copy=True)
+            marcar("100003", "OTRA")(otro, index)
+            main.roster_cache.set(otro, subir(otro, etag), index)
+        intentos.append(etag)
+        return subir(df, etag)
+
+    monkeypatch.setattr(main, "subir_roster", subir_tras_otra_subida)
+    antes = contadores(main)
+    main.commit_roster(marcar("100004", "PROPIO"))
+
+    assert len(intentos) == 2
+    assert delta(antes, contadores(main)) == {"uploads": 1, "conflicts": 1, "reloads": 0, "failures": 0, "misses": 0}
+    assert responsables(main, ["100003", "100004"]) == {"100003": "OTRA", "100004": "PROPIO"}
+    assert eventos == []
+
+
+def test_subidas_propias_concurrentes_no_chocan(main, eventos):
+    folios = [str(100010 + i) for i in range(8)]
+    antes = contadores(main)
+    with ThreadPoolExecutor(max_workers=len(folios)) as pool:
+        list(pool.map(lambda f: main.commit_roster(marcar(f, f"TUTOR {f}")), folios))
+
+    cambios = delta(antes, contadores(main))
+    assert 1 <= cambios.pop("uploads") <= len(folios)
+    assert cambios == {"conflicts": 0, "reloads": 0, "failures": 0, "misses": 0}
+    assert responsables(main, folios) == {f: f"TUTOR {f}" for f in folios}
+    assert eventos == []
+
+
+def test_error_de_un_commit_no_afecta_al_lote(main):
+    def falla(df, index):
+        raise LookupError("sin fila")
+
+    salidas = main.subir_lote([marcar("100020", "BIEN"), falla])
+    assert isinstance(salidas[1][0], LookupError)
+    assert salidas[0][0] is None
+    assert responsables(main, ["100020"]) == {"100020": "BIEN"}
+
+
+def test_entregar_en_paralelo_se_superponen(main, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    latencia = 0.2
+    monkeypatch.setattr(main.roster_file, "latency", latencia)
+    folios = [str(100030 + i) for i in range(8)]
+    subidas = main.roster_file.uploads
+    client = TestClient(main.app)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(folios)) as pool:
+        respuestas = list(pool.map(
+            lambda f: client.post("/entregar", json={"folio": f, "responsable": f"TUTOR {f}"}), folios,
+        ))
+    segundos = time.perf_counter() - t0
+
+    assert [r.status_code for r in respuestas] == [200] * len(folios)
+    # De a una serían 8 subidas de 0.2 s; agrupadas, unas pocas rondas
+    assert main.roster_file.uploads - subidas < len(folios)
+    assert segundos < len(folios) * latencia / 2
+    assert responsables(main, folios) == {f: f"TUTOR {f}" for f in folios}
+    assert all(r.json()["updated"]["EntregadoStatus"] == "ENTREGADA" for r in respuestas)
+
+
+def test_conflicto_persistente_falla(main, monkeypatch):
+    def siempre_412(df, etag):
+        raise StorageConflictError("roster")
+
+    monkeypatch.setattr(main, "subir_roster", siempre_412)
+    monkeypatch.setattr(main, "UPLOAD_MAX_RETRIES", 2)
+    antes = contadores(main)
+    with pytest.raises(RuntimeError):
+        main.commit_roster(marcar("100005", "NADIE"))
+    assert delta(antes, contadores(main))["failures"] == 1
+    assert main.upload_stats["conflicts"] - antes["conflicts"] == 3
@@ -0,0 +1,68 @@
+# tests/test_delivery_journal.py
+import json
+
+import pytest
+
+from services.delivery_journal import DeliveryJournal
+
+
+def entregas(n: int) -> list:
+    return [{"folio": str(1000 + i), "responsable": "tutor", "fecha": "2025-03-01 10:00:00"} for i in range(n)]
+
+
+def test_recupera_pendientes_tras_reinicio(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    anotadas = DeliveryJournal(path, apply_batch=lambda lote: None).append_many(entregas(3))
+
+    # Nuevo proceso: el lote llega completo y en orden al primer flush
+    aplicadas = []
+    journal = DeliveryJournal(path, apply_batch=aplicadas.extend)
+    assert [e["id"] for e in journal.pending()] == [e["id"] for e in anotadas]
+    assert journal.flush() == 3
+    assert [e["folio"] for e in aplicadas] == ["1000", "1001", "1002"]
+
+    assert journal.depth() == 0
+    assert DeliveryJournal(path, apply_batch=lambda lote: None).depth() == 0
+
+
+def test_descarta_linea_truncada(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    DeliveryJournal(str(path), apply_batch=lambda lote: None).append_many(entregas(2))
+    # Corte de luz a mitad de una escritura
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"folio": "99", "respons')
+
+    journal = DeliveryJournal(str(path), apply_batch=lambda lote: None)
+    assert [e["folio"] for e in journal.pending()] == ["1000", "1001"]
+
+
+def test_flush_fallido_conserva_el_lote(tmp_path):
+    path = tmp_path / "journal.jsonl"
+
+    def falla(lote):
+        raise RuntimeError("Azure no responde")
+
+    journal = DeliveryJournal(str(path), apply_batch=falla)
+    journal.append_many(entregas(2))
+    with pytest.raises(RuntimeError):
+        journal.flush()
+    assert journal.depth() == 2
+    assert journal.stats()["flush_errors"] == 1
+    # Sigue en disco para el próximo arranque
+    lineas = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(l)["folio"] for l in lineas] == ["1000", "1001"]
+
+
+def test_flush_solo_quita_lo_subido(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = None
+
+    def aplicar(lote):
+        # Una entrega nueva llega mientras se sube el lote
+        journal.append({"folio": "nueva", "fecha": "2025-03-01 10:00:00"})
+
+    journal = DeliveryJournal(path, apply_batch=aplicar)
+    journal.append_many(entregas(2))
+    assert journal.flush() == 2
+    assert [e["folio"] for e in journal.pending()] == ["nueva"]
+    assert [e["folio"] for e in DeliveryJournal(path, apply_batch=aplicar).pending()] == ["nueva"]
@@ -0,0 +1,37 @@
+# tests/test_exportar_db.py
+"""exportar_db/sincronizar_db (ROSTER_STORE=sqlite) contra el almacenamiento en memoria."""
+import threading
+
+from services.roster_db import RosterDB
+
+
+def test_sincronizar_durante_la_subida_no_reimporta(main, monkeypatch, tmp_path):
+    publicados = []
+    monkeypatch.setattr(main.live_events, "publish", lambda evento, data: publicados.append(evento))
+    db = RosterDB(str(tmp_path / "roster.db"))
+    monkeypatch.setattr(main, "roster_db", db)
+    main.sincronizar_db(forzar=True)
+    imports = db.imports
+    db.entregar({"folio": "100040", "responsable": "TUTOR", "fecha": "2025-03-01 10:00:00"})
+
+    subir = main.subir_roster
+    lectores = []
+
+    def subir_y_validar(df, etag):
+        nuevo = subir(df, etag)
+        # Un request valida el blob entre la subida y marcar_exportado
+        lector = threading.Thread(target=main.sincronizar_db, kwargs={"forzar": True})
+        lector.start()
+        lector.join(0.2)
+        lectores.append(lector)
+        return nuevo
+
+    monkeypatch.setattr(main, "subir_roster", subir_y_validar)
+    assert main.exportar_db() == 1
+    lectores[0].join()
+
+    # El cambio propio no se toma por una edición externa
+    assert db.imports == imports
+    assert db.source_etag() == main.roster_file.etag
+    assert publicados == []
+    db.close()
@@ -0,0 +1,40 @@
+# tests/test_group_commit.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services.group_commit import GroupCommit
+
+
+def test_agrupa_los_que_llegan_durante_una_ronda():
+    liberar = threading.Event()
+    lotes = []
+
+    def run_batch(fns):
+        lotes.append(len(fns))
+        if len(lotes) == 1:
+            liberar.wait(2)
+        return [(None, fn()) for fn in fns]
+
+    grupo = GroupCommit(run_batch)
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        primero = pool.submit(grupo.submit, lambda: 0)
+        while not lotes:
+            pass
+        resto = [pool.submit(grupo.submit, lambda i=i: i) for i in range(1, 6)]
+        while grupo.stats()["queued"] < 5:
+            pass
+        liberar.set()
+        assert [primero.result()] + [f.result() for f in resto] == [0, 1, 2, 3, 4, 5]
+    assert lotes == [1, 5]
+
+
+def test_error_del_lote_llega_a_todos():
+    def run_batch(fns):
+        raise RuntimeError("sin almacenamiento")
+
+    grupo = GroupCommit(run_batch)
+    with pytest.raises(RuntimeError):
+        grupo.submit(lambda: None)
+    assert grupo.stats() == {"commits": 1, "batches": 1, "max_batch": 1, "avg_batch": 1.0, "queued": 0}
@@ -0,0 +1,85 @@
+# tests/test_roster_index.py
+import pandas as pd
+import pytest
+
+from services.roster_index import (
+    DuplicateKeyError,
+    RosterIndex,
+    normalize_folio,
+    normalize_rut,
+    normalize_rut_dv,
+    rut_dv_key,
+)
+
+
+@pytest.mark.parametrize("valor, esperado", [
+    ("12345", "12345"),
+    (12345.0, "12345"),
+    ("1234.0", "1234"),
+    (" a-77 ", "A-77"),
+    (None, ""),
+    (float("nan"), ""),
+    (pd.NA, ""),
+    ("nan", ""),
+])
+def test_normalize_folio(valor, esperado):
+    assert normalize_folio(valor) == esperado
+
+
+@pytest.mark.parametrize("valor, esperado", [
+    ("12.345.678-5", "12345678"),
+    ("12345678-K", "12345678"),
+    ("12 345 678", "12345678"),
+    ("012345678", "12345678"),
+    (12345678.0, "12345678"),
+    ("", ""),
+    (None, ""),
+])
+def test_normalize_rut(valor, esperado):
+    assert normalize_rut(valor) == esperado
+
+
+def test_normalize_rut_dv():
+    assert normalize_rut_dv("12.345.678 5") == "123456785"
+    assert normalize_rut_dv("12345678k") == "12345678K"
+
+
+def test_rut_dv_key():
+    assert rut_dv_key("12.345.678", "k") == "12345678K"
+    # El RUT ya trae el DV, o falta el DV: no hay clave combinada
+    assert rut_dv_key("12345678-5", "5") == ""
+    assert rut_dv_key("12345678", None) == ""
+
+
+@pytest.fixture
+def roster():
+    return pd.DataFrame({
+        "Folio": ["1001", 1002.0, None, "1004"],
+        "RUT": ["12.345.678", "9876543-2", "11111111", "22.222.222"],
+        "DigitoVerificador": ["5", None, "1", "K"],
+    }, index=[10, 20, 30, 40])
+
+
+def test_find_por_folio_y_rut(roster):
+    index = RosterIndex(roster)
+    assert index.find_with_field(folio="1001") == (10, "folio")
+    assert index.find(folio="1002") == 20
+    assert index.find_with_field(rut="12345678-5") == (10, "rut")
+    assert index.find(rut="9.876.543-2") == 20
+    # RUT con DV sin guion, con el DV en su columna
+    assert index.find(rut="123456785") == 10
+    assert index.find(rut="22222222k") == 40
+    # Folio desconocido: se cae al RUT
+    assert index.find_with_field(folio="999", rut="11111111") == (30, "rut")
+    assert index.find(folio="999") is None
+
+
+def test_duplicados(roster):
+    roster.loc[50] = ["1001", "33333333", "3"]
+    index = RosterIndex(roster)
+    with pytest.raises(DuplicateKeyError) as e:
+        index.find(folio="1001.0")
+    assert e.value.field == "folio"
+    assert e.value.rows == [10, 50]
+    # Las claves no duplicadas siguen funcionando
+    assert index.find(rut="33333333") == 50
@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from "react";
 import axios from "axios";
+import { aplicarCambio, aplicarEntrega, useEventosRoster } from "../services/eventos";
 
 function Alumnos() {
   const [alumnos, setAlumnos] = useState([]);
@@ -22,6 +23,13 @@ function Alumnos() {
     fetchAlumnos();
   }, []);
 
+  // --- ACTUALIZACIONES EN VIVO (SSE) ---
+  useEventosRoster(
+    "http://127.0.0.1:8000",
+    (cambio) => setAlumnos((prev) => aplicarCambio(prev, cambio)),
+    () => fetchAlumnos()
+  );
+
   const handleEntregar = async (folio, rut) => {
     if (!responsable) {
       alert("Ingrese el responsable que entrega");
@@ -31,7 +39,8 @@ function Alumnos() {
       const payload = { folio, rut, responsable };
       const res = await axios.post("http://127.0.0.1:8000/entregar", payload);
       alert("Marcado como entregado ✅");
-      fetchAlumnos(); // actualizar tabla
+      // actualizar solo la fila entregada (el resto llega por /eventos)
+      setAlumnos((prev) => aplicarEntrega(prev, res.data.updated));
     } catch (err) {
       console.error(err);
       alert("Error al marcar como entregado");
@@ -1,4 +1,5 @@
-import React, { useEffect, useState, useMemo } from "react";
+import React, { useEffect, useState } from "react";
+import { aplicarCambio, aplicarEntrega, useEventosRoster } from "../services/eventos";
 
 // URL del Backend
 const API_URL = "https://tne-registro.onrender.com";
@@ -6,6 +7,8 @@ const API_URL = "https://tne-registro.onrender.com";
 export default function Dashboard() {
   const [alumnos, setAlumnos] = useState([]);
   const [busqueda, setBusqueda] = useState("");
+  // Resultados de /alumnos/search (null = sin búsqueda, se muestra todo)
+  const [resultados, setResultados] = useState(null);
   const [responsable, setResponsable] = useState("");
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
@@ -33,6 +36,16 @@ export default function Dashboard() {
     fetchAlumnos();
   }, []);
 
+  // --- ACTUALIZACIONES EN VIVO (SSE) ---
+  useEventosRoster(
+    API_URL,
+    (cambio) => {
+      setAlumnos((prev) => aplicarCambio(prev, cambio));
+      setResultados((prev) => prev && aplicarCambio(prev, cambio));
+    },
+    () => fetchAlumnos()
+  );
+
   // --- LÓGICA DE ENTREGA ---
   const marcarEntregado = async (folio, rut) => {
     if (!responsable.trim()) {
@@ -53,13 +66,9 @@ export default function Dashboard() {
       const data = await res.json();
       if (res.ok) {
         setSuccess(`✅ ¡Entrega registrada para ${data.updated["NOMBRE COMPLETO"]}!`);
-        setAlumnos((prev) =>
-          prev.map((a) =>
-            a.Folio === data.updated.Folio || a.RUT === data.updated.RUT
-              ? { ...a, ...data.updated }
-              : a
-          )
-        );
+        const actualizar = (prev) => aplicarEntrega(prev, data.updated);
+        setAlumnos(actualizar);
+        setResultados((prev) => prev && actualizar(prev));
         setTimeout(() => setSuccess(null), 3000);
       } else {
         setError(`Error: ${data.detail || "Desconocido"}`);
@@ -70,16 +79,29 @@ export default function Dashboard() {
     }
   };
 
-  // --- LÓGICA DE FILTRADO ---
-  const filtrados = useMemo(() => {
-    const term = busqueda.toLowerCase();
-    return alumnos.filter(
-      (a) =>
-        (a.Folio && a.Folio.toLowerCase().includes(term)) ||
-        (a.RUT && a.RUT.toLowerCase().includes(term)) || 
-        (a["NOMBRE COMPLETO"] && a["NOMBRE COMPLETO"].toLowerCase().includes(term))
-    );
-  }, [alumnos, busqueda]);
+  // --- BÚSQUEDA EN EL SERVIDOR (RUT/Folio por prefijo, nombre sin tildes) ---
+  useEffect(() => {
+    const term = busqueda.trim();
+    if (!term) {
+      setResultados(null);
+      return;
+    }
+    const ctrl = new AbortController();
+    const espera = setTimeout(async () => {
+      try {
+        const res = await fetch(`${API_URL}/alumnos/search?q=${encodeURIComponent(term)}&limit=50`, { signal: ctrl.signal });
+        if (res.ok) setResultados((await res.json()).rows);
+      } catch (err) {
+        if (err.name !== "AbortError") console.error(err);
+      }
+    }, 150);
+    return () => {
+      clearTimeout(espera);
+      ctrl.abort();
+    };
+  }, [busqueda]);
+
+  const filtrados = resultados ?? alumnos;
 
   return (
     <div style={{ fontFamily: "'Segoe UI', sans-serif", backgroundColor: "#f3f4f6", minHeight: "100vh", padding: "40px 20px", color: "#1f2937" }}>
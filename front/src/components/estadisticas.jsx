@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { BarChart, Bar, XAxis, YAxis, CartesianGrid, Tooltip, ResponsiveContainer } from 'recharts';
+import { useEventosRoster } from '../services/eventos';
 
 const API_BASE_URL = 'https://tne-registro.onrender.com'; 
 
@@ -19,26 +20,34 @@ const Estadisticas = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
 
+  const fetchDashboardStats = async () => {
+    try {
+      setLoading(true);
+      const response = await fetch(`${API_BASE_URL}/dashboard/stats`);
+      if (!response.ok) throw new Error(`Error conexión: ${response.status}`);
+      const data = await response.json();
+      if (data.status !== 'ok') throw new Error('El backend no devolvió un estado OK');
+      setStats(data);
+      setError(null);
+    } catch (err) {
+      console.error("Error cargando dashboard:", err);
+      setError("No se pudieron cargar los datos. Revisa que 'python main.py' esté corriendo.");
+    } finally {
+      setLoading(false);
+    }
+  };
+
   useEffect(() => {
-    const fetchDashboardStats = async () => {
-      try {
-        setLoading(true);
-        const response = await fetch(`${API_BASE_URL}/dashboard/stats`);
-        if (!response.ok) throw new Error(`Error conexión: ${response.status}`);
-        const data = await response.json();
-        if (data.status !== 'ok') throw new Error('El backend no devolvió un estado OK');
-        setStats(data);
-        setError(null);
-      } catch (err) {
-        console.error("Error cargando dashboard:", err);
-        setError("No se pudieron cargar los datos. Revisa que 'python main.py' esté corriendo.");
-      } finally {
-        setLoading(false);
-      }
-    };
     fetchDashboardStats();
   }, []); 
 
+  // Actualizaciones en vivo: cada entrega trae las estadísticas ya recalculadas
+  useEventosRoster(
+    API_BASE_URL,
+    (cambio) => setStats((prev) => (prev ? { ...prev, ...cambio.stats } : prev)),
+    () => fetchDashboardStats()
+  );
+
   if (loading) return <div style={{ padding: '40px', textAlign: 'center', color: '#666' }}>Cargando datos de Azure... ☁️</div>;
   if (error) return <div style={{ padding: '40px', color: 'red', fontWeight: 'bold', textAlign: 'center' }}>⚠️ {error}</div>;
   if (!stats) return null; 
@@ -1,4 +1,5 @@
 import React, { useEffect, useState } from "react";
+import { aplicarCambio, aplicarEntrega, useEventosRoster } from "../services/eventos";
 
 const Dashboard = () => {
   const [alumnos, setAlumnos] = useState([]);
@@ -25,6 +26,13 @@ const Dashboard = () => {
     fetchAlumnos();
   }, []);
 
+  // --- ACTUALIZACIONES EN VIVO (SSE) ---
+  useEventosRoster(
+    "http://127.0.0.1:8000",
+    (cambio) => setAlumnos((prev) => aplicarCambio(prev, cambio)),
+    () => fetchAlumnos()
+  );
+
   const handleEntregar = async (folio, rut) => {
     if (!userEmail) {
       alert("No hay usuario logueado");
@@ -40,7 +48,7 @@ const Dashboard = () => {
       const data = await res.json();
       if (res.ok) {
         alert(`Marcado como entregado: ${folio || rut}`);
-        fetchAlumnos();
+        setAlumnos((prev) => aplicarEntrega(prev, data.updated));
       } else {
         alert("Error: " + data.detail);
       }
@@ -0,0 +1,28 @@
+// src/services/eventos.js
+import { useEffect } from "react";
+
+// Misma fila: por Folio, o por RUT si no viene Folio (un valor vacío nunca coincide)
+const mismaFila = (a, folio, rut) => (folio ? a.Folio === folio : Boolean(rut) && a.RUT === rut);
+
+// Aplica un evento "entrega" del backend (SSE) sobre la lista local
+export const aplicarCambio = (prev, cambio) =>
+  prev.map((a) =>
+    mismaFila(a, cambio.folio, cambio.rut)
+      ? { ...a, EntregadoStatus: cambio.EntregadoStatus, Responsable: cambio.Responsable, FechaEntrega: cambio.FechaEntrega }
+      : a
+  );
+
+// Reemplaza la fila que devolvió POST /entregar (`updated`)
+export const aplicarEntrega = (prev, updated) =>
+  prev.map((a) => (mismaFila(a, updated.Folio, updated.RUT) ? { ...a, ...updated } : a));
+
+// Suscripción a /eventos: "entrega" trae el cambio de una fila y "recarga"
+// avisa que el Excel cambió afuera (hay que volver a pedir /alumnos)
+export function useEventosRoster(apiUrl, onEntrega, onRecarga) {
+  useEffect(() => {
+    const eventos = new EventSource(`${apiUrl}/eventos`);
+    eventos.addEventListener("entrega", (e) => onEntrega(JSON.parse(e.data)));
+    eventos.addEventListener("recarga", () => onRecarga());
+    return () => eventos.close();
+  }, [apiUrl]);
+}